@@ -0,0 +1,145 @@
+"""
+Time-bucketed aggregation and visual downsampling for long histories.
+
+rollup_aggregate_query() buckets in SQL (GROUP BY on a truncated timestamp)
+over the pre-aggregated hourly/daily rollup table, so only one row per
+(city, bucket) leaves the database and the cost is O(buckets) instead of
+O(rows). lttb() is a Largest-Triangle-Three-Buckets
+downsampler for when the raw shape of a series matters more than bucket
+statistics. SQLAlchemy and pandas are imported by the functions that use
+them, so the in-memory development app can downsample without loading either.
+"""
+import numpy as np
+
+BUCKETS = ('hour', 'day', 'week')
+METRICS = (('temperature', 'Temperature'), ('humidity', 'Humidity'), ('wind_speed', 'WindSpeed'))
+BUCKET_HOURS = {'hour': 1, 'day': 24, 'week': 24 * 7}
+
+
+def bucket_expression(column, bucket, dialect_name):
+    """SQL expression truncating `column` to the start of its hour/day/week (weeks start Monday)"""
+    from sqlalchemy import func
+
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}', expected one of {', '.join(BUCKETS)}")
+    if dialect_name == 'postgresql':
+        return func.date_trunc(bucket, column)
+    if bucket == 'hour':
+        return func.strftime('%Y-%m-%d %H:00:00', column)
+    if bucket == 'day':
+        return func.strftime('%Y-%m-%d 00:00:00', column)
+    # 'weekday 0' moves forward to Sunday, so step back six days to the Monday
+    return func.strftime('%Y-%m-%d 00:00:00', column, 'weekday 0', '-6 days')
+
+
+def choose_bucket(start, end, max_points):
+    """Smallest bucket that keeps a start..end span within max_points buckets"""
+    span_hours = max((end - start).total_seconds() / 3600, 0)
+    for bucket in BUCKETS:
+        if span_hours / BUCKET_HOURS[bucket] <= max_points:
+            return bucket
+    return BUCKETS[-1]
+
+
+def rollup_aggregate_query(session, rollup_model, bucket, user_id, city=None, date_from=None, date_to=None,
+                           by_city=True):
+    """min/mean/max per bucket (and per city unless by_city is False) from the rollup table, oldest bucket first
+
+    Hour buckets read hourly rollups; day and week buckets merge daily ones.
+    Date filters select whole buckets.
+    """
+    from sqlalchemy import func, literal_column
+
+    source = 'hour' if bucket == 'hour' else 'day'
+    if bucket == source:
+        # Rollup buckets are already hour/day starts; grouping on the column itself lets the
+        # (user_id, granularity[, city], bucket) indexes deliver the groups in order, with no sort
+        bucket_col = rollup_model.bucket.label('bucket')
+    else:
+        bucket_col = bucket_expression(rollup_model.bucket, bucket, session.get_bind().dialect.name).label('bucket')
+    total = func.sum(rollup_model.count)
+    columns = [bucket_col, total.label('count')]
+    for name, _ in METRICS:
+        columns += [func.min(getattr(rollup_model, f'{name}_min')).label(f'{name}_min'),
+                    (func.sum(getattr(rollup_model, f'{name}_sum')) / total).label(f'{name}_mean'),
+                    func.max(getattr(rollup_model, f'{name}_max')).label(f'{name}_max')]
+    group_by = [bucket_col]
+    if by_city:
+        columns.insert(0, rollup_model.city)
+        group_by.insert(0, rollup_model.city)
+    query = session.query(*columns).filter(rollup_model.user_id == user_id,
+                                           rollup_model.granularity == source)
+    if city:
+        query = query.filter(rollup_model.city == city)
+    if date_from:
+        query = query.filter(rollup_model.bucket >= floor_bucket(date_from, source))
+    if date_to:
+        query = query.filter(rollup_model.bucket <= date_to)
+    return query.group_by(*group_by).order_by(*group_by[:-1], literal_column('bucket'))
+
+
+def floor_bucket(moment, bucket):
+    """Start of the hour/day containing `moment`"""
+    if bucket == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate_rows(query):
+    """Serialise rollup_aggregate_query results using the API's column naming"""
+    rows = []
+    for row in query:
+        data = row._mapping
+        item = {'Bucket': str(data['bucket'])[:19], 'Count': data['count']}
+        if 'city' in data:
+            item = {'City': data['city'], **item}
+        for name, label in METRICS:
+            item[f'{label}Min'] = data[f'{name}_min']
+            item[f'{label}Mean'] = data[f'{name}_mean']
+            item[f'{label}Max'] = data[f'{name}_max']
+        rows.append(item)
+    return rows
+
+
+def aggregate_frame(query):
+    """Bucket means as a DataFrame the dashboard renderer can plot directly"""
+    import pandas as pd
+
+    rows = aggregate_rows(query)
+    df = pd.DataFrame({
+        'DateTime': pd.to_datetime([row['Bucket'] for row in rows]),
+        **{label: [row[f'{label}Mean'] for row in rows] for _, label in METRICS}
+    })
+    return df
+
+
+def lttb(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps from (x, y)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    # Interior points split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample_frame(df, threshold):
+    """Keep the union of LTTB-selected points across the three dashboard series"""
+    if len(df) <= threshold:
+        return df
+    x = df['DateTime'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    keep = np.unique(np.concatenate([lttb(x, df[label].to_numpy(), threshold) for _, label in METRICS]))
+    return df.iloc[keep]
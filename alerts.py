@@ -0,0 +1,274 @@
+"""
+Threshold alerts on newly stored weather readings.
+
+The ingestion paths hand each committed batch of rows to AlertEngine.submit(),
+which only appends them to a bounded buffer, so adding entries or fetching
+forecasts never waits on alert work. A background thread drains everything
+waiting at once, compares the whole batch against every rule with numpy
+(rows x rules at a time, per metric) and turns the breaches into at most one
+email per recipient. A breach of the same rule for the same city and reading
+time is only reported once (re-fetched forecast slots don't alert again), a
+rule stays quiet for `cooldown` seconds per city after it fires, and each
+recipient gets at most max_per_hour emails. Emails go through a sender object
+with a send(recipient, subject, body) method: SMTPSender, LogSender or any
+replacement, such as a local SMTP stub in benchmarks.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# A reading of `metric` above `threshold` for one of user_id's cities (or only `city`) alerts `email`
+AlertRule = namedtuple('AlertRule', 'user_id metric threshold email city', defaults=(None,))
+Breach = namedtuple('Breach', 'rule city moment value')
+
+
+def evaluate(rows, rules, max_cells=1000000):
+    """Breach for every (row, rule) pair where the row's reading is above the rule's threshold
+
+    `rows` are dicts of WeatherEntry column values. Comparisons run as a
+    rows x rules boolean matrix per metric, max_cells at a time.
+    """
+    import numpy as np
+
+    if not rows or not rules:
+        return []
+    users = np.fromiter((row['user_id'] for row in rows), dtype=np.int64, count=len(rows))
+    # Cities as integer codes so city-scoped rules compare like the rest; -1 is "any city"
+    city_codes = {}
+    cities = np.fromiter((city_codes.setdefault(row.get('city'), len(city_codes)) for row in rows),
+                         dtype=np.int64, count=len(rows))
+    breaches = []
+    for metric in sorted({rule.metric for rule in rules}):
+        metric_rules = [rule for rule in rules if rule.metric == metric]
+        thresholds = np.array([rule.threshold for rule in metric_rules], dtype=np.float64)
+        owners = np.array([rule.user_id for rule in metric_rules], dtype=np.int64)
+        scopes = np.array([city_codes.get(rule.city, -2) if rule.city else -1 for rule in metric_rules],
+                          dtype=np.int64)
+        values = np.fromiter((row.get(metric) for row in rows), dtype=np.float64, count=len(rows))
+        step = max(1, max_cells // len(metric_rules))
+        for offset in range(0, len(rows), step):
+            window = slice(offset, offset + step)
+            hits = ((values[window, None] > thresholds) & (users[window, None] == owners)
+                    & ((scopes == -1) | (cities[window, None] == scopes)))
+            row_indexes, rule_indexes = np.nonzero(hits)
+            breaches.extend(
+                Breach(metric_rules[rule_index], rows[row_index]['city'], rows[row_index]['datetime'],
+                       float(values[row_index]))
+                for row_index, rule_index in zip((row_indexes + offset).tolist(), rule_indexes.tolist())
+            )
+    return breaches
+
+
+def describe(breaches):
+    """One line for the breaches of a rule in a city, naming the worst reading"""
+    worst = max(breaches, key=lambda breach: breach.value)
+    rule = worst.rule
+    readings = f' ({len(breaches)} readings)' if len(breaches) > 1 else ''
+    return (f"{rule.metric.replace('_', ' ').capitalize()} above {rule.threshold:g} in {worst.city or 'unknown city'}: "
+            f"{worst.value:g} at {worst.moment:%Y-%m-%d %H:%M}{readings}")
+
+
+class LogSender:
+    """Writes alerts to the log instead of sending them (used when no SMTP server is configured)"""
+
+    def send(self, recipient, subject, body):
+        logger.info(f'Alert for {recipient}: {subject}\n{body}')
+
+
+class SMTPSender:
+    """Plain-text alert emails over SMTP, one connection per message"""
+
+    def __init__(self, host, port=587, username=None, password=None, from_addr=None, starttls=True, timeout=10):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.from_addr = from_addr or username or 'weather-dashboard@localhost'
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def send(self, recipient, subject, body):
+        import smtplib
+        from email.mime.text import MIMEText
+
+        message = MIMEText(body)
+        message['Subject'] = subject
+        message['From'] = self.from_addr
+        message['To'] = recipient
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+class AlertEngine:
+    """Evaluates submitted rows against load_rules() and emails breaches from a background thread"""
+
+    def __init__(self, load_rules, sender, cooldown=3600, max_per_hour=10, max_pending=100000,
+                 retries=2, backoff=1.0, observe=None, remember=100000):
+        self._load_rules = load_rules
+        self.sender = sender
+        self.cooldown = cooldown
+        self.max_per_hour = max_per_hour
+        self.max_pending = max_pending
+        self.retries = retries
+        self.backoff = backoff
+        self._observe = observe
+        self._remember = remember
+        self._cond = threading.Condition()
+        self._batches = deque()
+        self._pending = 0
+        self._busy = False
+        self._closing = False
+        self._thread = None
+        self._rules = None
+        self._seen = OrderedDict()      # (rule, city, reading time) already reported, oldest first
+        self._last_alert = {}           # (rule, city) -> monotonic time of its last email
+        self._sent_times = {}           # recipient -> deque of send times in the last hour
+        self._stats = {'rows_evaluated': 0, 'rows_dropped': 0, 'breaches': 0, 'suppressed': 0,
+                       'emails_sent': 0, 'emails_failed': 0, 'last_evaluation_seconds': None,
+                       'last_alert': None, 'last_error': None}
+
+    def submit(self, rows):
+        """Queue newly stored rows for evaluation; never blocks, and drops them if max_pending rows are waiting"""
+        if not rows:
+            return False
+        with self._cond:
+            if self._closing:
+                return False
+            if self._pending + len(rows) > self.max_pending:
+                self._stats['rows_dropped'] += len(rows)
+                return False
+            self._batches.append(rows)
+            self._pending += len(rows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-engine', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return True
+
+    def reload_rules(self):
+        """Pick up changed thresholds before the next evaluation"""
+        with self._cond:
+            self._rules = None
+
+    def drain(self, timeout=None):
+        """Wait until everything submitted so far has been evaluated and sent; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._batches and not self._busy, timeout)
+
+    def close(self, timeout=5):
+        """Evaluate and send what's queued, then stop the worker"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.error(f'Alert queue did not drain within {timeout}s')
+
+    def stats(self):
+        with self._cond:
+            return {**self._stats, 'pending_rows': self._pending,
+                    'rules': None if self._rules is None else len(self._rules),
+                    'cooldown_seconds': self.cooldown, 'max_emails_per_hour': self.max_per_hour}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._batches or self._closing)
+                if not self._batches:
+                    return
+                rows = [row for batch in self._batches for row in batch]
+                self._batches.clear()
+                self._pending = 0
+                self._busy = True
+            try:
+                self.process(rows)
+            except Exception as e:
+                logger.error(f'Alert evaluation of {len(rows)} rows failed: {e}')
+                with self._cond:
+                    self._stats['last_error'] = str(e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def process(self, rows):
+        """Evaluate rows and send the resulting emails on the calling thread; returns emails sent"""
+        rules = self._rules
+        if rules is None:
+            rules = self._rules = list(self._load_rules())
+        began = time.perf_counter()
+        breaches = evaluate(rows, rules)
+        elapsed = time.perf_counter() - began
+        if self._observe is not None:
+            self._observe('alert_evaluate', elapsed)
+        with self._cond:
+            self._stats['rows_evaluated'] += len(rows)
+            self._stats['breaches'] += len(breaches)
+            self._stats['last_evaluation_seconds'] = round(elapsed, 4)
+        return sum(self._send(recipient, lines) for recipient, lines in self._messages(breaches).items())
+
+    def _messages(self, breaches):
+        """{recipient: [line per rule and city]} for the breaches not yet reported and not cooling down"""
+        now = time.monotonic()
+        fresh = {}
+        for breach in breaches:
+            key = (breach.rule, breach.city, breach.moment)
+            if key in self._seen:
+                continue
+            self._seen[key] = True
+            fresh.setdefault((breach.rule, breach.city), []).append(breach)
+        while len(self._seen) > self._remember:
+            self._seen.popitem(last=False)
+
+        messages = {}
+        suppressed = 0
+        for key, group in fresh.items():
+            if now - self._last_alert.get(key, -self.cooldown) < self.cooldown:
+                suppressed += len(group)
+                continue
+            self._last_alert[key] = now
+            messages.setdefault(key[0].email, []).append(describe(group))
+        with self._cond:
+            self._stats['suppressed'] += suppressed
+        return messages
+
+    def _send(self, recipient, lines):
+        now = time.monotonic()
+        sent = self._sent_times.setdefault(recipient, deque())
+        while sent and now - sent[0] >= 3600:
+            sent.popleft()
+        if len(sent) >= self.max_per_hour:
+            with self._cond:
+                self._stats['suppressed'] += len(lines)
+            return 0
+        subject = f'Weather alert: {lines[0]}' if len(lines) == 1 else f'Weather alert: {len(lines)} thresholds exceeded'
+        body = '\n'.join(lines)
+        error = None
+        for attempt in range(self.retries + 1):
+            try:
+                self.sender.send(recipient, subject, body)
+                error = None
+                break
+            except Exception as e:
+                error = str(e)
+                logger.warning(f'Sending alert to {recipient} failed (attempt {attempt + 1}): {error}')
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        with self._cond:
+            if error:
+                self._stats['emails_failed'] += 1
+                self._stats['last_error'] = error
+                return 0
+            sent.append(now)
+            self._stats['emails_sent'] += 1
+            self._stats['last_alert'] = subject
+        return 1
@@ -1,15 +1,19 @@
-from flask import Flask, render_template, request, jsonify
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend to avoid threading issues
-import matplotlib.pyplot as plt
-import io
+from flask import Flask, render_template, request, jsonify, url_for, Response, send_file
 import base64
+import io
+import threading
 from datetime import datetime
 import os
 import requests
 import logging
 from dotenv import load_dotenv
+from dashboard_renderer import DashboardRenderer, chart_payload
+from weather_client import OpenWeatherClient, WeatherAPIError
+from forecast_cache import ForecastCache
+from columnar_store import WeatherStore
+from http_cache import IMAGE_FORMATS, image_etag, version_etag, cacheable, not_modified, image_response
+from aggregation import downsample_frame
+from forecast_parser import parse_forecasts
 
 load_dotenv()
 
@@ -23,15 +27,37 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config['ENV'] = 'production'  # Disable debug/auto-reload
 
-# Store weather data in memory
-weather_data = []
+# Store weather data in memory (columnar, time-sorted, thread-safe)
+weather_data = WeatherStore()
+dashboard_renderer = DashboardRenderer()
+# matplotlib is loaded on a background thread once serving begins, not by the first dashboard
+RENDER_WARMUP = os.getenv('RENDER_WARMUP', 'true').lower() == 'true'
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
 API_KEY = os.getenv('OPENWEATHER_API_KEY', '')
 CITY = os.getenv('OPENWEATHER_CITY', 'Bengaluru')
+# Browser charts get at most this many LTTB-selected points
+CHART_MAX_POINTS = int(os.getenv('DASHBOARD_DOWNSAMPLE_THRESHOLD', '2000'))
+EXPORT_CSV_BATCH = 5000
+weather_client = OpenWeatherClient(api_key=API_KEY)
+forecast_cache = ForecastCache(weather_client, path=os.getenv('FORECAST_CACHE_PATH') or None)
 
 # Verify API key on startup
 if not API_KEY or API_KEY == 'your_api_key_here':
     logger.warning('WARNING: OPENWEATHER_API_KEY not configured in .env file')
 
+@app.before_request
+def warm_up_renderer():
+    """Import matplotlib and draw a first figure off the request path"""
+    global _warm_up_started
+    if _warm_up_started or not RENDER_WARMUP:
+        return
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=dashboard_renderer.warm_up, name='render-warm-up', daemon=True).start()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -41,31 +67,29 @@ def add_entry():
     """Add a manual weather entry"""
     try:
         data = request.json
-        entry = {
-            'DateTime': data.get('datetime'),
-            'Temperature': float(data.get('temperature', 0)),
-            'Humidity': float(data.get('humidity', 0)),
-            'WindSpeed': float(data.get('windspeed', 0)),
-            'Description': data.get('description', '')
-        }
-        weather_data.append(entry)
+        weather_data.append(
+            data.get('datetime'),
+            float(data.get('temperature', 0)),
+            float(data.get('humidity', 0)),
+            float(data.get('windspeed', 0)),
+            data.get('description', '')
+        )
         return jsonify({'status': 'success', 'message': 'Entry added'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/get_entries', methods=['GET'])
 def get_entries():
-    """Get all weather entries"""
-    return jsonify(weather_data)
+    """Get all weather entries, oldest first"""
+    return jsonify(weather_data.records())
 
-@app.route('/delete_entry/<int:index>', methods=['DELETE'])
-def delete_entry(index):
-    """Delete a weather entry by index"""
+@app.route('/delete_entry/<int:entry_id>', methods=['DELETE'])
+def delete_entry(entry_id):
+    """Delete a weather entry by id"""
     try:
-        if 0 <= index < len(weather_data):
-            weather_data.pop(index)
+        if weather_data.delete(entry_id):
             return jsonify({'status': 'success', 'message': 'Entry deleted'})
-        return jsonify({'status': 'error', 'message': 'Invalid index'})
+        return jsonify({'status': 'error', 'message': 'Invalid entry id'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
@@ -76,59 +100,90 @@ def generate_dashboard():
         if not weather_data:
             return jsonify({'status': 'error', 'message': 'No data to visualize'})
         
-        df = pd.DataFrame(weather_data)
-        df['DateTime'] = pd.to_datetime(df['DateTime'])
-        df = df.sort_values('DateTime')
-        
-        plt.figure(figsize=(14, 10))
-        
-        # Temperature Trend
-        plt.subplot(3, 1, 1)
-        plt.plot(df['DateTime'], df['Temperature'], marker='o', color='red')
-        plt.title('Temperature Forecast Trend')
-        plt.ylabel('Temperature (°C)')
-        plt.grid(True)
-        
-        # Humidity Trend
-        plt.subplot(3, 1, 2)
-        plt.plot(df['DateTime'], df['Humidity'], marker='o', color='blue')
-        plt.title('Humidity Forecast Trend')
-        plt.ylabel('Humidity (%)')
-        plt.grid(True)
-        
-        # Wind Speed Trend
-        plt.subplot(3, 1, 3)
-        plt.plot(df['DateTime'], df['WindSpeed'], marker='o', color='green')
-        plt.title('Wind Speed Forecast Trend')
-        plt.ylabel('Wind Speed (m/s)')
-        plt.xlabel('Date & Time')
-        plt.grid(True)
-        
-        plt.tight_layout()
+        # Already typed and sorted by time; no copy is made
+        df = weather_data.frame()
         
         # Convert plot to base64 image
-        img = io.BytesIO()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        plot_url = base64.b64encode(img.getvalue()).decode()
-        plt.close()
-        
-        # Save CSV
-        df.to_csv('weather_forecast_data.csv', index=False)
+        png = dashboard_renderer.render(df)
+        plot_url = base64.b64encode(png).decode()
         
         return jsonify({
             'status': 'success',
             'image': plot_url,
-            'csv_saved': 'weather_forecast_data.csv'
+            'image_url': url_for('dashboard_image', fmt='png'),
+            'export_url': url_for('export_entries', format='csv')
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/dashboard_image.<fmt>', methods=['GET'])
+def dashboard_image(fmt):
+    """The dashboard as raw PNG, SVG or WebP bytes, revalidated by ETag / Last-Modified"""
+    try:
+        if fmt not in IMAGE_FORMATS:
+            return jsonify({'status': 'error', 'message': f"Unsupported image format '{fmt}'"}), 404
+        if not weather_data:
+            return jsonify({'status': 'error', 'message': 'No data to visualize'})
+        
+        # Read the version before the data so a concurrent write can't be labelled as current
+        version, modified = weather_data.version, weather_data.modified
+        etag = image_etag(fmt, version)
+        unchanged = not_modified(etag, modified)
+        if unchanged is not None:
+            return unchanged
+        
+        image = dashboard_renderer.render(weather_data.frame(), key=version, fmt=IMAGE_FORMATS[fmt][0])
+        return image_response(image, fmt, etag, modified)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/chart_data', methods=['GET'])
+def chart_data():
+    """Downsampled dashboard series for drawing the charts in the browser"""
+    try:
+        if not weather_data:
+            return jsonify({'status': 'error', 'message': 'No data to visualize'})
+        
+        version, modified = weather_data.version, weather_data.modified
+        etag = version_etag(version, 'chart')
+        unchanged = not_modified(etag, modified)
+        if unchanged is not None:
+            return unchanged
+        
+        df = downsample_frame(weather_data.frame(), CHART_MAX_POINTS)
+        payload = {'status': 'success', 'points': len(df), 'bucket': None, **chart_payload(df)}
+        return cacheable(jsonify(payload), etag, modified)
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/export', methods=['GET'])
+def export_entries():
+    """Download all entries as CSV (streamed in chunks) or Parquet"""
+    try:
+        fmt = request.args.get('format', 'csv')
+        df = weather_data.frame()
+        if fmt == 'csv':
+            def generate():
+                yield df.iloc[:0].to_csv(index=False)
+                for start in range(0, len(df), EXPORT_CSV_BATCH):
+                    yield df.iloc[start:start + EXPORT_CSV_BATCH].to_csv(index=False, header=False)
+            return Response(generate(), mimetype='text/csv', headers={
+                'Content-Disposition': 'attachment; filename=weather_forecast_data.csv'
+            })
+        if fmt == 'parquet':
+            buffer = io.BytesIO()
+            df.to_parquet(buffer, index=False, compression='zstd')
+            buffer.seek(0)
+            return send_file(buffer, mimetype='application/vnd.apache.parquet', as_attachment=True,
+                             download_name='weather_forecast_data.parquet')
+        return jsonify({'status': 'error', 'message': f"Unsupported export format '{fmt}'"})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
 @app.route('/clear_data', methods=['POST'])
 def clear_data():
     """Clear all weather data"""
-    global weather_data
-    weather_data = []
+    weather_data.clear()
     return jsonify({'status': 'success', 'message': 'All data cleared'})
 
 @app.route('/fetch_api_data', methods=['POST'])
@@ -137,47 +192,40 @@ def fetch_api_data():
     try:
         data = request.json
         api_key = data.get('api_key', API_KEY)
-        city = data.get('city', CITY)
+        cities = data.get('cities') or [data.get('city', CITY)]
         units = data.get('units', 'metric')
         
         if not api_key:
             logger.error('API key not provided')
             return jsonify({'status': 'error', 'message': 'API key not provided'})
         
-        url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&appid={api_key}&units={units}"
-        logger.info(f'Fetching weather data for {city}')
-        
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code != 200:
-            error_data = response.json()
-            error_msg = error_data.get('message', 'Unknown error')
-            logger.error(f'API Error: {response.status_code} - {error_msg}')
-            return jsonify({'status': 'error', 'message': f"API Error: {error_msg}"})
-        
-        api_data = response.json()
-        forecast_list = api_data.get('list', [])
+        logger.info(f'Fetching weather data for {", ".join(cities)}')
         
-        # Clear previous data and load API data
-        global weather_data
-        weather_data = []
+        if len(cities) == 1:
+            # Single city keeps the specific timeout/connection error messages below
+            payloads = [forecast_cache.fetch_forecast(cities[0], units, api_key)]
+        else:
+            results = forecast_cache.fetch_many(cities, units=units, api_key=api_key)
+            failed = [f'{result.city}: {result.error}' for result in results if result.error]
+            if failed:
+                logger.error(f'API Error: {"; ".join(failed)}')
+                return jsonify({'status': 'error', 'message': f"API Error: {'; '.join(failed)}"})
+            payloads = [result.data for result in results]
         
-        for item in forecast_list:
-            entry = {
-                'DateTime': item['dt_txt'],
-                'Temperature': item['main']['temp'],
-                'Humidity': item['main']['humidity'],
-                'WindSpeed': item['wind']['speed'],
-                'Description': item['weather'][0]['description']
-            }
-            weather_data.append(entry)
+        # Replace previous data with the API data in one columnar load
+        df = parse_forecasts(payloads, cities=cities)
+        weather_data.replace(df['DateTime'], df['Temperature'], df['Humidity'], df['WindSpeed'], df['Description'])
         
+        city = ', '.join(cities)
         logger.info(f'Successfully loaded {len(weather_data)} entries for {city}')
         return jsonify({
             'status': 'success',
             'message': f'Loaded {len(weather_data)} entries from API for {city}',
             'entries_count': len(weather_data)
         })
+    except WeatherAPIError as e:
+        logger.error(f'API Error: {e.status_code} - {e}')
+        return jsonify({'status': 'error', 'message': f"API Error: {e}"})
     except requests.exceptions.Timeout:
         logger.error('API request timeout')
         return jsonify({'status': 'error', 'message': 'Request timeout - API server not responding'})
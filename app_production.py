@@ -1,21 +1,37 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response, stream_with_context, send_file
 from flask_sqlalchemy import SQLAlchemy
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
+import atexit
 import base64
+import hashlib
+import heapq
+import json
+import signal
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
+from itertools import chain, islice
+from operator import itemgetter
 import os
-import requests
 import logging
 from dotenv import load_dotenv
-from apscheduler.schedulers.background import BackgroundScheduler
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from sqlalchemy import func
+from sqlalchemy import func, text, tuple_
+from storage_profile import database_url, engine_options, sqlite_pragmas, install_pragmas
+from render_cache import RenderCache
+from render_jobs import RenderJobQueue
+from http_cache import IMAGE_FORMATS, PROCESS_TOKEN, image_etag, version_etag, cacheable, not_modified, image_response
+from exports import ExportStore, batched, csv_chunks, write_parquet
+from archive_store import ArchiveStore, ALL_CITIES, ARCHIVE_COLUMNS, PYARROW_MISSING, month_start, next_month, pyarrow_installed
+from write_behind import WriteBehindQueue, WriteQueueFull
+from alerts import AlertEngine, AlertRule, LogSender, SMTPSender
+from entry_events import EventBroker, TooManySubscribers
+from metrics import Metrics
+from dashboard_renderer import chart_payload
+from weather_client import OpenWeatherClient
+from forecast_parser import parse_forecasts
+from forecast_cache import ForecastCache
+from ingest_scheduler import IngestScheduler, LeaderLock
+from aggregation import rollup_aggregate_query, aggregate_rows, aggregate_frame, choose_bucket, downsample_frame
 
 load_dotenv()
 
@@ -32,23 +48,105 @@ instance_path = os_module.path.join(os_module.path.dirname(__file__), 'instance'
 os_module.makedirs(instance_path, exist_ok=True)
 
 app = Flask(__name__)
-# Use absolute path for database
+# Use absolute path for database; DATABASE_URL can point at another SQLite file or a server database
 db_path = os_module.path.join(instance_path, 'weather_dashboard.db')
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path.replace(chr(92), "/")}'
+database_uri = database_url(
+    os_module.getenv('DATABASE_URL') or f'sqlite:///{db_path.replace(chr(92), "/")}',
+    os_module.path.dirname(os_module.path.abspath(__file__))
+)
+app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+# Enough pooled connections for the waitress threads plus the scheduler and export workers
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    database_uri,
+    pool_size=int(os_module.getenv('DB_POOL_SIZE', '8')),
+    max_overflow=int(os_module.getenv('DB_MAX_OVERFLOW', '4'))
+)
 app.config['SECRET_KEY'] = os_module.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['ENV'] = 'production'
 
 db = SQLAlchemy(app)
+with app.app_context():
+    # SQLite only: WAL so add_entry/fetch_api_data writes don't block readers (DB_PROFILE=default to opt out)
+    install_pragmas(db.engine, sqlite_pragmas(
+        os_module.getenv('DB_PROFILE', 'wal'),
+        busy_timeout=os_module.getenv('SQLITE_BUSY_TIMEOUT_MS'),
+        cache_size=f"-{os_module.getenv('SQLITE_CACHE_SIZE_KB')}" if os_module.getenv('SQLITE_CACHE_SIZE_KB') else None,
+        mmap_size=int(os_module.getenv('SQLITE_MMAP_SIZE_MB')) * 1024 * 1024 if os_module.getenv('SQLITE_MMAP_SIZE_MB') else None,
+        synchronous=os_module.getenv('SQLITE_SYNCHRONOUS')
+    ))
+
+# Per-route latency/error counts and phase timings, served at /metrics (METRICS_ENABLED=false to turn off)
+metrics = Metrics(enabled=os_module.getenv('METRICS_ENABLED', 'true').lower() == 'true')
+metrics.init_app(app)
 
 # Global user for shared data (no authentication)
 DEFAULT_USER_ID = 1
+# Seeded address of users who never gave one; never mailed
+PLACEHOLDER_EMAIL = 'guest@example.com'
+
+# Rendered dashboards, invalidated whenever a user's data changes
+render_cache = RenderCache(max_entries=int(os_module.getenv('RENDER_CACHE_SIZE', '32')))
+# Dashboards render in worker processes so matplotlib never holds the GIL of a request thread.
+# RENDER_PROCESSES=0 renders on RENDER_POOL_SIZE threads in this process instead.
+render_jobs = RenderJobQueue(
+    processes=int(os_module.getenv('RENDER_PROCESSES', '2')),
+    threads=int(os_module.getenv('RENDER_POOL_SIZE', '4')),
+    observe=metrics.observe_phase
+)
+RENDER_TIMEOUT = float(os_module.getenv('RENDER_TIMEOUT', '60'))
+# Start the render workers (matplotlib import, font loading) in the background once serving begins
+RENDER_WARMUP = os_module.getenv('RENDER_WARMUP', 'true').lower() == 'true'
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+# Parquet exports are built on first request and kept on disk for reuse until they expire
+export_store = ExportStore(
+    os_module.getenv('EXPORT_DIR') or os_module.path.join(instance_path, 'exports'),
+    max_age=float(os_module.getenv('EXPORT_MAX_AGE_HOURS', '24')) * 3600,
+    max_files=int(os_module.getenv('EXPORT_MAX_FILES', '20'))
+)
+# Entries of months that ended over ARCHIVE_AFTER_DAYS ago move to monthly Parquet files (0 = keep all in the database)
+ARCHIVE_AFTER_DAYS = int(os_module.getenv('ARCHIVE_AFTER_DAYS', '0'))
+ARCHIVE_INTERVAL_HOURS = float(os_module.getenv('ARCHIVE_INTERVAL_HOURS', '24'))
+archive_store = ArchiveStore(os_module.getenv('ARCHIVE_DIR') or os_module.path.join(instance_path, 'archive'),
+                             observe=metrics.observe_phase)
+# Shared pooled OpenWeatherMap client
+weather_client = OpenWeatherClient(max_workers=int(os_module.getenv('OPENWEATHER_MAX_WORKERS', '4')),
+                                   observe=metrics.observe_phase)
+# Forecasts only change every 3 hours, so repeated fetches are served from here
+forecast_cache = ForecastCache(
+    weather_client,
+    ttl=int(os_module.getenv('FORECAST_CACHE_TTL')) if os_module.getenv('FORECAST_CACHE_TTL') else None,
+    path=os_module.getenv('FORECAST_CACHE_PATH') or None
+)
+# Threshold alerts are evaluated and emailed on a background thread; without SMTP_SERVER they're only logged
+ALERTS_ENABLED = os_module.getenv('ALERTS_ENABLED', 'true').lower() == 'true'
+alert_sender = SMTPSender(
+    os_module.getenv('SMTP_SERVER'),
+    port=os_module.getenv('SMTP_PORT', '587'),
+    username=os_module.getenv('EMAIL_USER'),
+    password=os_module.getenv('EMAIL_PASSWORD'),
+    from_addr=os_module.getenv('ALERT_FROM'),
+    starttls=os_module.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+) if os_module.getenv('SMTP_SERVER') else LogSender()
+# Live entry updates pushed to dashboards over server-sent events. Each open stream holds a
+# server thread, so keep EVENTS_MAX_CLIENTS below waitress' --threads (0 turns the stream off).
+entry_events = EventBroker(
+    PROCESS_TOKEN,
+    max_buffer=int(os_module.getenv('EVENTS_CLIENT_BUFFER', '256')),
+    max_subscribers=int(os_module.getenv('EVENTS_MAX_CLIENTS', '2'))
+)
+# Batches larger than this are announced as a 'reload' instead of row by row
+EVENTS_MAX_ROWS = int(os_module.getenv('EVENTS_MAX_ROWS', '1000'))
+# Streams end after this long and the browser reconnects (resuming from Last-Event-ID), freeing the thread
+EVENTS_STREAM_SECONDS = float(os_module.getenv('EVENTS_STREAM_SECONDS', '300'))
+EVENTS_HEARTBEAT_SECONDS = 15
 
 # ==================== DATABASE MODELS ====================
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), default='Guest', nullable=False)
-    email = db.Column(db.String(120), default='guest@example.com', nullable=False)
+    email = db.Column(db.String(120), default=PLACEHOLDER_EMAIL, nullable=False)
     weather_entries = db.relationship('WeatherEntry', backref='user', lazy=True, cascade='all, delete-orphan')
     alert_threshold_temp = db.Column(db.Float, default=None)
     alert_threshold_humidity = db.Column(db.Float, default=None)
@@ -63,9 +161,24 @@ class WeatherEntry(db.Model):
     wind_speed = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(255))
     city = db.Column(db.String(100))
-    source = db.Column(db.String(50), default='manual')  # 'manual' or 'api'
+    source = db.Column(db.String(50), default='manual')  # 'manual', 'api' or 'import'
     created_at = db.Column(db.DateTime, server_default=func.now())
 
+    __table_args__ = (
+        # get_entries / generate_dashboard: user's rows by time, optionally within one city.
+        # The city index also covers get_cities' DISTINCT city lookup.
+        db.Index('ix_weather_entry_user_datetime', 'user_id', 'datetime'),
+        db.Index('ix_weather_entry_user_city_datetime', 'user_id', 'city', 'datetime'),
+        # One row per forecast slot; backs the ON CONFLICT upsert in bulk_upsert_entries.
+        # Manual readings are left alone so users can still log repeats.
+        db.Index('uq_weather_entry_api_slot', 'user_id', 'city', 'datetime', 'source',
+                 unique=True, sqlite_where=text("source = 'api'"),
+                 postgresql_where=text("source = 'api'")),
+        # Archival deletes the oldest months, which can hold the highest ids (e.g. after a historical
+        # import); AUTOINCREMENT keeps SQLite from handing those ids out again while they're archived
+        {'sqlite_autoincrement': True},
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -78,6 +191,571 @@ class WeatherEntry(db.Model):
             'Source': self.source
         }
 
+class WeatherRollup(db.Model):
+    """Hourly and daily per-city aggregates of WeatherEntry, kept in step on every write"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    city = db.Column(db.String(100))
+    granularity = db.Column(db.String(10), nullable=False)  # 'hour' or 'day'
+    bucket = db.Column(db.DateTime, nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+    # Sums rather than means so buckets can be merged across cities and into weeks
+    temperature_min = db.Column(db.Float)
+    temperature_sum = db.Column(db.Float)
+    temperature_max = db.Column(db.Float)
+    humidity_min = db.Column(db.Float)
+    humidity_sum = db.Column(db.Float)
+    humidity_max = db.Column(db.Float)
+    wind_speed_min = db.Column(db.Float)
+    wind_speed_sum = db.Column(db.Float)
+    wind_speed_max = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index('uq_weather_rollup_bucket', 'user_id', 'granularity', 'city', 'bucket', unique=True),
+        # Buckets across all cities in order (the dashboard and /aggregate?by_city=false)
+        db.Index('ix_weather_rollup_user_granularity_bucket', 'user_id', 'granularity', 'bucket'),
+    )
+
+# ==================== ALERTS ====================
+
+# AlertRule metric for each User threshold column
+ALERT_THRESHOLDS = {'temperature': 'alert_threshold_temp', 'humidity': 'alert_threshold_humidity'}
+
+def alert_rules():
+    """An AlertRule for every threshold a user has set, if they have given an email address"""
+    columns = [getattr(User, column) for column in ALERT_THRESHOLDS.values()]
+    with app.app_context():
+        users = db.session.query(User.id, User.email, *columns).all()
+    rules = []
+    for user_id, email, *thresholds in users:
+        for metric, threshold in zip(ALERT_THRESHOLDS, thresholds):
+            try:
+                threshold = float(threshold)
+            except (TypeError, ValueError):
+                continue
+            if email and email != PLACEHOLDER_EMAIL:
+                rules.append(AlertRule(user_id, metric, threshold, email))
+    return rules
+
+alert_engine = AlertEngine(
+    alert_rules, alert_sender,
+    cooldown=float(os_module.getenv('ALERT_COOLDOWN_MINUTES', '60')) * 60,
+    max_per_hour=int(os_module.getenv('ALERT_MAX_EMAILS_PER_HOUR', '10')),
+    observe=metrics.observe_phase
+)
+# Send what's still queued on the way out
+atexit.register(alert_engine.close)
+
+def submit_alerts(rows):
+    """Hand committed rows to the alert engine; returns immediately"""
+    if ALERTS_ENABLED:
+        alert_engine.submit(rows)
+
+# ==================== LIVE UPDATES ====================
+
+def want_entry_ids(rows):
+    """Whether a write should collect its rows' ids for publish_entries (only when someone is listening)"""
+    return entry_events.has_subscribers() and len(rows) <= EVENTS_MAX_ROWS
+
+def event_entry(entry_id, row):
+    """A WeatherEntry column dict in the to_dict() shape /get_entries returns"""
+    return {
+        'id': entry_id,
+        'DateTime': row['datetime'].strftime('%Y-%m-%d %H:%M:%S'),
+        'Temperature': row['temperature'],
+        'Humidity': row['humidity'],
+        'WindSpeed': row['wind_speed'],
+        'Description': row['description'],
+        'City': row['city'],
+        'Source': row['source']
+    }
+
+def publish_entries(rows, ids):
+    """Push committed rows to open dashboards; without their ids, ask them to reload
+
+    Writes nobody was listening to are still announced, so a browser that
+    reconnects with Last-Event-ID knows it missed something.
+    """
+    if ids is None or len(ids) != len(rows):
+        entry_events.publish('reload', {'count': len(rows)})
+    else:
+        entry_events.publish('upsert', {'entries': [event_entry(entry_id, row) for entry_id, row in zip(ids, rows)]})
+
+# ==================== BULK INGESTION ====================
+
+UPSERT_COLUMNS = ('temperature', 'humidity', 'wind_speed', 'description')
+
+def insert_rows(stmt, rows, returning=False):
+    """executemany of an insert; with returning, the ids of the rows written in row order, else None"""
+    if not returning:
+        db.session.execute(stmt, rows)
+        return None
+    table = WeatherEntry.__table__
+    return db.session.execute(stmt.returning(table.c.id, sort_by_parameter_order=True), rows).scalars().all()
+
+def bulk_upsert_entries(rows, returning=False):
+    """Insert API rows in one executemany, updating rows that already exist for the same slot
+
+    Each row is a dict of WeatherEntry column values with source='api'.
+    Returns the number of rows written, or with returning=True their ids.
+    """
+    if not rows:
+        return [] if returning else 0
+    table = WeatherEntry.__table__
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        ids = insert_rows(table.insert(), rows, returning)
+        return ids if returning else len(rows)
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'city', 'datetime', 'source'],
+        index_where=text("source = 'api'"),
+        set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS}
+    )
+    ids = insert_rows(stmt, rows, returning)
+    return ids if returning else len(rows)
+
+# How SQLAlchemy stores DateTime values in SQLite; insert_frame writes them preformatted
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+def insert_frame(table, df):
+    """Insert every row of a DataFrame whose columns are columns of `table`; runs in the caller's transaction
+
+    On SQLite the rows go to the driver as plain tuples, with datetime
+    columns formatted in one vectorized call, which skips SQLAlchemy's
+    per-row parameter processing and about doubles the insert rate.
+    """
+    if df.empty:
+        return 0
+    if db.engine.dialect.name != 'sqlite':
+        db.session.execute(table.insert(), df.to_dict('records'))
+        return len(df)
+    values = [
+        df[column].dt.strftime(SQLITE_DATETIME_FORMAT).tolist() if df[column].dtype.kind == 'M'
+        else df[column].tolist()
+        for column in df.columns
+    ]
+    statement = f"INSERT INTO {table.name} ({', '.join(df.columns)}) VALUES ({', '.join('?' * len(df.columns))})"
+    db.session.connection().exec_driver_sql(statement, list(zip(*values)))
+    return len(df)
+
+def import_frame(df):
+    """Bulk-load WeatherEntry rows from bulk_import.read_entries(); runs in the caller's transaction
+
+    Rows with source='api' are upserted like fetched forecasts so they keep
+    their one-row-per-slot guarantee; the rest are plain inserts. Rollups are
+    left to the caller (refresh_rollups_span once the load is done).
+    """
+    api = (df['source'] == 'api').to_numpy()
+    count = 0
+    if api.any():
+        upserts = df[api]
+        count += bulk_upsert_entries([
+            dict(zip(upserts.columns, values)) for values in zip(
+                *(upserts[column].dt.to_pydatetime() if upserts[column].dtype.kind == 'M'
+                  else upserts[column].tolist() for column in upserts.columns))
+        ])
+    return count + insert_frame(WeatherEntry.__table__, df[~api])
+
+def entry_row(data, user_id=DEFAULT_USER_ID):
+    """Validated WeatherEntry column values for one manually submitted reading"""
+    return {
+        'user_id': user_id,
+        'datetime': datetime.fromisoformat(data.get('datetime')),
+        'temperature': float(data.get('temperature', 0)),
+        'humidity': float(data.get('humidity', 0)),
+        'wind_speed': float(data.get('windspeed', 0)),
+        'description': data.get('description', ''),
+        'city': data.get('city', 'Manual Entry'),
+        'source': 'manual'
+    }
+
+def write_entries(rows):
+    """Insert manual entry rows and refresh their rollups in one transaction"""
+    with app.app_context():
+        ids = insert_rows(WeatherEntry.__table__.insert(), rows, returning=want_entry_ids(rows))
+        refresh_rollups_for_rows(rows)
+        db.session.commit()
+    render_cache.bump(DEFAULT_USER_ID)
+    publish_entries(rows, ids)
+    submit_alerts(rows)
+    return len(rows)
+
+# Optional write-behind mode: manual entries are acknowledged once queued and committed in batches
+WRITE_BEHIND = os_module.getenv('WRITE_BEHIND', 'false').lower() == 'true'
+WRITE_BEHIND_WAIT_TIMEOUT = 10
+MAX_BULK_ENTRIES = 10000
+entry_queue = WriteBehindQueue(
+    write_entries,
+    max_batch=int(os_module.getenv('WRITE_BEHIND_BATCH', '500')),
+    max_delay=int(os_module.getenv('WRITE_BEHIND_DELAY_MS', '500')) / 1000
+)
+# Commit anything still queued on the way out
+atexit.register(entry_queue.close)
+if WRITE_BEHIND and threading.current_thread() is threading.main_thread() \
+        and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+    # SIGTERM would otherwise end the process without running atexit handlers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+def queue_entries(rows):
+    """Hand rows to the write-behind queue; with ?wait=true, return only once they're committed"""
+    ticket = entry_queue.put(rows)
+    if request.args.get('wait', 'false').lower() == 'true':
+        return entry_queue.wait(ticket, WRITE_BEHIND_WAIT_TIMEOUT)
+    return False
+
+def forecast_rows(results, user_id=DEFAULT_USER_ID):
+    """WeatherEntry row dicts for the successful CityForecast results of a fetch"""
+    successes = [result for result in results if not result.error]
+    # Local time, as API rows have always been stored (the upsert slot key depends on it)
+    with metrics.span('dataframe'):
+        df = parse_forecasts([result.data for result in successes], cities=[result.city for result in successes],
+                             local_time=True)
+    return [
+        {'user_id': user_id, 'datetime': moment, 'temperature': temperature, 'humidity': humidity,
+         'wind_speed': wind_speed, 'description': description, 'city': city, 'source': 'api'}
+        for moment, temperature, humidity, wind_speed, description, city in zip(
+            df['DateTime'].dt.to_pydatetime(), df['Temperature'].tolist(), df['Humidity'].tolist(),
+            df['WindSpeed'].tolist(), df['Description'].tolist(), df['City'].tolist()
+        )
+    ]
+
+# ==================== ROLLUPS ====================
+
+ROLLUP_METRICS = ('temperature', 'humidity', 'wind_speed')
+
+def _rollup_buckets(moment):
+    return (('hour', moment.replace(minute=0, second=0, microsecond=0)),
+            ('day', moment.replace(hour=0, minute=0, second=0, microsecond=0)))
+
+def rollup_range(user_id, city, start, end):
+    """One city's hourly and daily rollups with start <= bucket < end"""
+    rollup_city = WeatherRollup.city.is_(None) if city is None else WeatherRollup.city == city
+    # Naming both granularities lets the (user_id, granularity, city, bucket) index narrow the range
+    return WeatherRollup.query.filter(
+        WeatherRollup.user_id == user_id, WeatherRollup.granularity.in_(('hour', 'day')), rollup_city,
+        WeatherRollup.bucket >= start, WeatherRollup.bucket < end
+    )
+
+def refresh_rollups(user_id, city, start, end):
+    """Recompute the hourly and daily rollups of one city for the days spanning start..end
+
+    Only the raw rows of the affected days are read, so the cost is bounded by the
+    size of the change rather than the table. Runs in the caller's transaction.
+    """
+    day_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    day_end = end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    city_filter = WeatherEntry.city.is_(None) if city is None else WeatherEntry.city == city
+    rows = db.session.query(
+        WeatherEntry.datetime, WeatherEntry.temperature, WeatherEntry.humidity, WeatherEntry.wind_speed
+    ).filter(
+        WeatherEntry.user_id == user_id, city_filter,
+        WeatherEntry.datetime >= day_start, WeatherEntry.datetime < day_end
+    )
+    # Days in archived months also count their archived rows of exactly this city (a no-op when nothing overlaps)
+    archived = archive_store.rows(user_id, ('datetime',) + ROLLUP_METRICS, city=city,
+                                  start=day_start, end=day_end - timedelta(microseconds=1))
+    totals = {}
+    for moment, *values in chain(rows, archived):
+        for granularity, bucket in _rollup_buckets(moment):
+            acc = totals.get((granularity, bucket))
+            if acc is None:
+                acc = totals[(granularity, bucket)] = {'count': 0}
+                for metric, value in zip(ROLLUP_METRICS, values):
+                    acc[f'{metric}_min'] = acc[f'{metric}_max'] = value
+                    acc[f'{metric}_sum'] = 0.0
+            acc['count'] += 1
+            for metric, value in zip(ROLLUP_METRICS, values):
+                acc[f'{metric}_sum'] += value
+                acc[f'{metric}_min'] = min(acc[f'{metric}_min'], value)
+                acc[f'{metric}_max'] = max(acc[f'{metric}_max'], value)
+    
+    rollup_range(user_id, city, day_start, day_end).delete(synchronize_session=False)
+    if totals:
+        db.session.execute(WeatherRollup.__table__.insert(), [
+            {'user_id': user_id, 'city': city, 'granularity': granularity, 'bucket': bucket, **acc}
+            for (granularity, bucket), acc in totals.items()
+        ])
+
+def rollup_totals(df):
+    """WeatherRollup column values for a frame of datetime + ROLLUP_METRICS, aggregated with pandas"""
+    import pandas as pd
+    parts = []
+    for granularity, freq in (('hour', 'h'), ('day', 'D')):
+        grouped = df.groupby(df['datetime'].dt.floor(freq))
+        totals = grouped[list(ROLLUP_METRICS)].agg(['min', 'sum', 'max'])
+        totals.columns = [f'{metric}_{stat}' for metric, stat in totals.columns]
+        totals['count'] = grouped.size()
+        totals['granularity'] = granularity
+        parts.append(totals.rename_axis('bucket').reset_index())
+    return pd.concat(parts, ignore_index=True)
+
+def refresh_rollups_span(user_id, city, start, end, chunk_days=366):
+    """refresh_rollups for a long span (bulk imports, rebuilds), chunk_days at a time and vectorized"""
+    import pandas as pd
+    columns = ('datetime',) + ROLLUP_METRICS
+    city_filter = WeatherEntry.city.is_(None) if city is None else WeatherEntry.city == city
+    chunk_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    span_end = end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    while chunk_start < span_end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), span_end)
+        rows = db.session.query(*(getattr(WeatherEntry, column) for column in columns)).filter(
+            WeatherEntry.user_id == user_id, city_filter,
+            WeatherEntry.datetime >= chunk_start, WeatherEntry.datetime < chunk_end
+        ).all()
+        frames = [pd.DataFrame(rows, columns=columns)] if rows else []
+        frames += [table.to_pandas() for table in archive_store.read(
+            user_id, columns, city=city, start=chunk_start, end=chunk_end - timedelta(microseconds=1))]
+        rollup_range(user_id, city, chunk_start, chunk_end).delete(synchronize_session=False)
+        if frames:
+            totals = rollup_totals(pd.concat(frames, ignore_index=True))
+            totals['user_id'] = user_id
+            totals['city'] = city
+            insert_frame(WeatherRollup.__table__, totals)
+        chunk_start = chunk_end
+
+def refresh_rollups_for_rows(rows):
+    """refresh_rollups for every (user, city) span touched by a batch of entry dicts"""
+    spans = {}
+    for row in rows:
+        key = (row['user_id'], row['city'])
+        first, last = spans.get(key, (row['datetime'], row['datetime']))
+        spans[key] = (min(first, row['datetime']), max(last, row['datetime']))
+    for (user_id, city), (first, last) in spans.items():
+        refresh_rollups(user_id, city, first, last)
+
+def rebuild_rollups(user_id=None, chunk_days=366):
+    """Recreate all rollups from WeatherEntry and the archive, chunk_days of one city at a time"""
+    query = WeatherRollup.query
+    spans = db.session.query(
+        WeatherEntry.user_id, WeatherEntry.city, func.min(WeatherEntry.datetime), func.max(WeatherEntry.datetime)
+    )
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+        spans = spans.filter(WeatherEntry.user_id == user_id)
+    query.delete(synchronize_session=False)
+    spans = {(span_user, city): (first, last)
+             for span_user, city, first, last in spans.group_by(WeatherEntry.user_id, WeatherEntry.city)}
+    for archive_user in ([user_id] if user_id is not None else archive_store.users()):
+        for city, (first, last) in archive_store.city_spans(archive_user).items():
+            known = spans.get((archive_user, city))
+            spans[(archive_user, city)] = (min(known[0], first), max(known[1], last)) if known else (first, last)
+    for (span_user, city), (first, last) in spans.items():
+        refresh_rollups_span(span_user, city, first, last, chunk_days)
+        db.session.commit()
+    return len(spans)
+
+# ==================== ARCHIVAL ====================
+
+ARCHIVE_FIELDS = tuple(getattr(WeatherEntry, column) for column in ARCHIVE_COLUMNS)
+
+def archive_month_query(user_id, month):
+    """One user's entries in the month starting at `month`, in archive column order"""
+    return db.session.query(*ARCHIVE_FIELDS).filter(
+        WeatherEntry.user_id == user_id,
+        WeatherEntry.datetime >= month, WeatherEntry.datetime < next_month(month)
+    ).order_by(WeatherEntry.datetime, WeatherEntry.id)
+
+def archive_entries(older_than_days, user_id=None):
+    """Move entries of months that ended over older_than_days ago to the archive; returns (rows, months)
+
+    Whole months move at once, so each partition is normally written a single
+    time. Each month is written to its Parquet file before its rows are
+    deleted, and rows inserted meanwhile get higher ids, so nothing is lost;
+    a run interrupted in between is finished by the next one. Rollups stay,
+    as aggregates and the dashboard's bucketed view read only those.
+    Raises RuntimeError without pyarrow, which every read of the archive needs.
+    """
+    if not pyarrow_installed():
+        raise RuntimeError(PYARROW_MISSING)
+    cutoff = month_start(datetime.now() - timedelta(days=older_than_days))
+    spans = db.session.query(WeatherEntry.user_id, func.min(WeatherEntry.datetime)).filter(
+        WeatherEntry.datetime < cutoff
+    )
+    if user_id is not None:
+        spans = spans.filter(WeatherEntry.user_id == user_id)
+    moved = months = 0
+    for span_user, first in spans.group_by(WeatherEntry.user_id).all():
+        month = month_start(first)
+        while month < cutoff:
+            rows = archive_month_query(span_user, month).all()
+            if rows:
+                with metrics.span('archive_write'):
+                    archive_store.write_month(span_user, month, rows)
+                WeatherEntry.query.filter(
+                    WeatherEntry.user_id == span_user,
+                    WeatherEntry.datetime >= month, WeatherEntry.datetime < next_month(month),
+                    WeatherEntry.id <= max(row.id for row in rows)
+                ).delete(synchronize_session=False)
+                db.session.commit()
+                logger.info(f'Archived {len(rows)} entries of user {span_user} for {month:%Y-%m}')
+                moved += len(rows)
+                months += 1
+            month = next_month(month)
+    return moved, months
+
+# ==================== QUERIES ====================
+# Shared with benchmarks/explain_queries.py, which checks each one is index-backed
+
+MAX_PAGE_SIZE = 1000
+ENTRIES_STREAM_BATCH = 1000
+EXPORT_CSV_BATCH = 5000
+# Rows per Parquet row group
+EXPORT_PARQUET_BATCH = 100000
+# Above this many points the dashboard plots SQL bucket means ('bucket') or LTTB-selected raw points ('lttb')
+DOWNSAMPLE_THRESHOLD = int(os_module.getenv('DASHBOARD_DOWNSAMPLE_THRESHOLD', '2000'))
+DOWNSAMPLE_MODE = os_module.getenv('DASHBOARD_DOWNSAMPLE', 'bucket')
+
+def entries_query(city='', date_from='', date_to='', user_id=DEFAULT_USER_ID):
+    """Entries for /get_entries, newest first"""
+    query = WeatherEntry.query.filter_by(user_id=user_id)
+    if city:
+        query = query.filter_by(city=city)
+    if date_from:
+        query = query.filter(WeatherEntry.datetime >= datetime.fromisoformat(date_from))
+    if date_to:
+        query = query.filter(WeatherEntry.datetime <= datetime.fromisoformat(date_to))
+    return query.order_by(WeatherEntry.datetime.desc(), WeatherEntry.id.desc())
+
+def export_query(city='', date_from='', date_to='', user_id=DEFAULT_USER_ID):
+    """Plain column rows for /export in EXPORT_COLUMNS order, oldest first"""
+    query = db.session.query(
+        WeatherEntry.datetime, WeatherEntry.city, WeatherEntry.temperature, WeatherEntry.humidity,
+        WeatherEntry.wind_speed, WeatherEntry.description, WeatherEntry.source
+    ).filter(WeatherEntry.user_id == user_id)
+    if city:
+        query = query.filter(WeatherEntry.city == city)
+    if date_from:
+        query = query.filter(WeatherEntry.datetime >= datetime.fromisoformat(date_from))
+    if date_to:
+        query = query.filter(WeatherEntry.datetime <= datetime.fromisoformat(date_to))
+    return query.order_by(WeatherEntry.datetime, WeatherEntry.id)
+
+def encode_cursor(moment, entry_id):
+    """Opaque keyset cursor pointing just past the entry at (moment, entry_id) in (datetime, id) desc order"""
+    raw = f'{moment.isoformat()}|{entry_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """The (datetime, id) key an encode_cursor() cursor points past"""
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    cursor_dt, cursor_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(cursor_dt), int(cursor_id)
+
+def apply_cursor(query, cursor):
+    """Restrict an entries_query to rows after the cursor"""
+    return query.filter(tuple_(WeatherEntry.datetime, WeatherEntry.id) < tuple_(*decode_cursor(cursor)))
+
+def _date_filters(date_from, date_to):
+    return {'start': datetime.fromisoformat(date_from) if date_from else None,
+            'end': datetime.fromisoformat(date_to) if date_to else None}
+
+def archived_entries(city='', date_from='', date_to='', cursor='', user_id=DEFAULT_USER_ID, newest_first=True):
+    """((datetime, id), to_dict() row) pairs of archived entries for /get_entries, newest first by default"""
+    rows = archive_store.rows(user_id, city=city or ALL_CITIES, before=decode_cursor(cursor) if cursor else None,
+                              descending=newest_first, **_date_filters(date_from, date_to))
+    for entry_id, moment, city, temperature, humidity, wind_speed, description, source, _ in rows:
+        yield (moment, entry_id), {
+            'id': entry_id,
+            'DateTime': moment.strftime('%Y-%m-%d %H:%M:%S'),
+            'Temperature': temperature,
+            'Humidity': humidity,
+            'WindSpeed': wind_speed,
+            'Description': description,
+            'City': city,
+            'Source': source
+        }
+
+def _newest_first(hot, archived, newest_archived):
+    """heapq.merge(hot, archived, reverse=True), except that hot rows newer than the whole archive
+    pass straight through, so a page of recent entries never opens an archive file"""
+    for item in hot:
+        if newest_archived is not None and item[0][0] <= newest_archived:
+            yield from heapq.merge(chain([item], hot), archived, key=itemgetter(0), reverse=True)
+            return
+        yield item
+    yield from archived
+
+def entry_rows(query, archived, limit=None, user_id=DEFAULT_USER_ID):
+    """((datetime, id), to_dict() row) pairs of an entries_query interleaved with archived_entries()"""
+    if limit:
+        query = query.limit(limit)
+    hot = (((entry.datetime, entry.id), entry.to_dict()) for entry in query.yield_per(ENTRIES_STREAM_BATCH))
+    rows = _newest_first(hot, archived, archive_store.stats(user_id)[2])
+    return islice(rows, limit) if limit else rows
+
+def export_rows(city='', date_from='', date_to='', user_id=DEFAULT_USER_ID, batch=EXPORT_CSV_BATCH):
+    """export_query rows interleaved with the matching archived rows, oldest first"""
+    hot = export_query(city, date_from, date_to, user_id).yield_per(batch)
+    archived = archive_store.rows(user_id, ('datetime', 'city', 'temperature', 'humidity', 'wind_speed',
+                                            'description', 'source'),
+                                  city=city or ALL_CITIES, **_date_filters(date_from, date_to))
+    return heapq.merge(archived, hot, key=itemgetter(0))
+
+def cities_query(user_id=DEFAULT_USER_ID):
+    """Distinct cities for /get_cities"""
+    return db.session.query(WeatherEntry.city).filter_by(user_id=user_id).distinct()
+
+def dashboard_frame(user_id=DEFAULT_USER_ID):
+    """(DataFrame to plot, bucket or None) for a user's dashboard, downsampled past DOWNSAMPLE_THRESHOLD"""
+    import pandas as pd
+
+    with metrics.span('db_query'):
+        count, first, last = db.session.query(
+            func.count(WeatherEntry.id), func.min(WeatherEntry.datetime), func.max(WeatherEntry.datetime)
+        ).filter(WeatherEntry.user_id == user_id).one()
+    archived, archived_first, archived_last = archive_store.stats(user_id)
+    if archived:
+        first = min(first, archived_first) if first else archived_first
+        last = max(last, archived_last) if last else archived_last
+        count += archived
+    
+    if not count:
+        raise ValueError('No data to visualize')
+    
+    bucket = None
+    if count > DOWNSAMPLE_THRESHOLD and DOWNSAMPLE_MODE == 'bucket':
+        bucket = choose_bucket(first, last, DOWNSAMPLE_THRESHOLD)
+        with metrics.span('db_query'):
+            df = aggregate_frame(rollup_aggregate_query(db.session, WeatherRollup, bucket, user_id, by_city=False))
+    else:
+        with metrics.span('db_query'):
+            entries = WeatherEntry.query.filter_by(user_id=user_id).order_by(WeatherEntry.datetime).all()
+        with metrics.span('dataframe'):
+            if archived:
+                hot = (((entry.datetime, entry.id), entry.to_dict()) for entry in entries)
+                merged = heapq.merge(archived_entries(user_id=user_id, newest_first=False), hot, key=itemgetter(0))
+                data = [row for _, row in merged]
+            else:
+                data = [entry.to_dict() for entry in entries]
+            df = pd.DataFrame(data)
+            df['DateTime'] = pd.to_datetime(df['DateTime'])
+            df = df.sort_values('DateTime')
+            if count > DOWNSAMPLE_THRESHOLD:
+                df = downsample_frame(df, DOWNSAMPLE_THRESHOLD)
+    return df, bucket
+
+def submit_dashboard(version, user_id=DEFAULT_USER_ID, fmt='png'):
+    """Render job for a user's dashboard at a data version; shared by every request for it"""
+    def prepare():
+        df, bucket = dashboard_frame(user_id)
+        return df, {'points': len(df), 'bucket': bucket}
+    return render_jobs.submit((user_id, version, fmt), prepare, fmt=fmt)
+
+def dashboard_result(job):
+    """generate_dashboard's response body for a finished render job"""
+    return {
+        'status': 'success',
+        'image': base64.b64encode(job.result()).decode(),
+        'image_url': url_for('dashboard_image', fmt='png'),
+        'points': job.meta['points'],
+        'bucket': job.meta['bucket']
+    }
+
 # ==================== MAIN ROUTES ====================
 
 @app.route('/')
@@ -89,41 +767,132 @@ def index():
 @app.route('/add_entry', methods=['POST'])
 def add_entry():
     try:
-        data = request.json
-        entry = WeatherEntry(
-            user_id=DEFAULT_USER_ID,
-            datetime=datetime.fromisoformat(data.get('datetime')),
-            temperature=float(data.get('temperature', 0)),
-            humidity=float(data.get('humidity', 0)),
-            wind_speed=float(data.get('windspeed', 0)),
-            description=data.get('description', ''),
-            city=data.get('city', 'Manual Entry'),
-            source='manual'
-        )
+        row = entry_row(request.json)
+        if WRITE_BEHIND:
+            committed = queue_entries([row])
+            return jsonify({'status': 'success', 'message': 'Entry added' if committed else 'Entry queued'})
+        entry = WeatherEntry(**row)
         db.session.add(entry)
+        db.session.flush()
+        refresh_rollups(entry.user_id, entry.city, entry.datetime, entry.datetime)
         db.session.commit()
+        render_cache.bump(DEFAULT_USER_ID)
+        publish_entries([row], [entry.id])
+        submit_alerts([row])
         return jsonify({'status': 'success', 'message': 'Entry added'})
+    except WriteQueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/add_entries', methods=['POST'])
+def add_entries():
+    """Add many manual entries at once: a JSON list, or {"entries": [...]}; all or nothing"""
+    try:
+        data = request.json
+        items = data.get('entries') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'status': 'error', 'message': 'No entries provided'})
+        if len(items) > MAX_BULK_ENTRIES:
+            return jsonify({'status': 'error', 'message': f'At most {MAX_BULK_ENTRIES} entries per request'})
+        
+        rows = []
+        errors = []
+        for index, item in enumerate(items):
+            try:
+                rows.append(entry_row(item))
+            except (TypeError, ValueError, AttributeError) as e:
+                errors.append(f'{index}: {e}')
+        if errors:
+            return jsonify({'status': 'error', 'message': f'{len(errors)} invalid entries, none added',
+                            'errors': errors[:100]})
+        
+        if WRITE_BEHIND:
+            committed = queue_entries(rows)
+        else:
+            committed = write_entries(rows) > 0
+        verb = 'Added' if committed else 'Queued'
+        return jsonify({'status': 'success', 'message': f'{verb} {len(rows)} entries', 'entries_count': len(rows)})
+    except WriteQueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
     except Exception as e:
+        logger.error(f'Error adding entries: {str(e)}')
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/entry_events', methods=['GET'])
+def entry_events_stream():
+    """Server-sent events: 'upsert' (entries in the /get_entries shape), 'delete' (ids), 'clear' and 'reload'"""
+    try:
+        subscription = entry_events.subscribe(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    except TooManySubscribers as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+
+    def generate():
+        deadline = time.monotonic() + EVENTS_STREAM_SECONDS
+        # Browsers reconnect 3s after the stream ends, sending the last event id they saw
+        yield 'retry: 3000\n\n'
+        while not subscription.closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = subscription.next(min(EVENTS_HEARTBEAT_SECONDS, remaining))
+            # The comment line keeps proxies from timing out idle streams and finds disconnected clients
+            yield ''.join(events) if events else ': keep-alive\n\n'
+
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also runs when the client goes away before the first event
+    response.call_on_close(subscription.close)
+    return response
+
+@app.route('/entry_events_status', methods=['GET'])
+def entry_events_status():
+    """Open live update streams, events published and clients that fell behind"""
+    return jsonify(entry_events.stats())
+
+@app.route('/write_queue_status', methods=['GET'])
+def write_queue_status():
+    """Write-behind queue depth, batches and failures"""
+    return jsonify({'enabled': WRITE_BEHIND, **entry_queue.stats()})
+
 @app.route('/get_entries', methods=['GET'])
 def get_entries():
     try:
-        city_filter = request.args.get('city', '')
-        date_from = request.args.get('date_from', '')
-        date_to = request.args.get('date_to', '')
+        filters = {
+            'city': request.args.get('city', ''),
+            'date_from': request.args.get('date_from', ''),
+            'date_to': request.args.get('date_to', '')
+        }
+        cursor = request.args.get('cursor', '')
+        query = entries_query(**filters)
+        if cursor:
+            query = apply_cursor(query, cursor)
+        # Rows of archived months are merged in by (datetime, id); months outside the filters aren't opened
+        archived = archived_entries(cursor=cursor, **filters)
         
-        query = WeatherEntry.query.filter_by(user_id=DEFAULT_USER_ID)
+        if request.args.get('format') == 'ndjson':
+            # Stream the whole result set without materialising it
+            def generate():
+                for _, row in entry_rows(query, archived):
+                    yield json.dumps(row) + '\n'
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
         
-        if city_filter:
-            query = query.filter_by(city=city_filter)
-        if date_from:
-            query = query.filter(WeatherEntry.datetime >= datetime.fromisoformat(date_from))
-        if date_to:
-            query = query.filter(WeatherEntry.datetime <= datetime.fromisoformat(date_to))
+        limit = request.args.get('limit', type=int)
+        if not limit:
+            with metrics.span('db_query'):
+                rows = [row for _, row in entry_rows(query, archived)]
+            return jsonify(rows)
         
-        entries = query.order_by(WeatherEntry.datetime.desc()).all()
-        return jsonify([entry.to_dict() for entry in entries])
+        limit = min(limit, MAX_PAGE_SIZE)
+        # Fetch one extra row to know whether another page exists
+        with metrics.span('db_query'):
+            page = list(entry_rows(query, archived, limit + 1))
+        has_more = len(page) > limit
+        page = page[:limit]
+        return jsonify({
+            'entries': [row for _, row in page],
+            'next_cursor': encode_cursor(*page[-1][0]) if has_more else None
+        })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
@@ -131,10 +900,18 @@ def get_entries():
 def delete_entry(entry_id):
     try:
         entry = WeatherEntry.query.get(entry_id)
-        if not entry or entry.user_id != DEFAULT_USER_ID:
-            return jsonify({'status': 'error', 'message': 'Entry not found'})
-        db.session.delete(entry)
+        if entry and entry.user_id == DEFAULT_USER_ID:
+            db.session.delete(entry)
+            db.session.flush()
+            refresh_rollups(entry.user_id, entry.city, entry.datetime, entry.datetime)
+        else:
+            archived = archive_store.delete_entry(DEFAULT_USER_ID, entry_id)
+            if archived is None:
+                return jsonify({'status': 'error', 'message': 'Entry not found'})
+            refresh_rollups(DEFAULT_USER_ID, archived['city'], archived['datetime'], archived['datetime'])
         db.session.commit()
+        render_cache.bump(DEFAULT_USER_ID)
+        entry_events.publish('delete', {'ids': [entry_id]})
         return jsonify({'status': 'success', 'message': 'Entry deleted'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
@@ -144,40 +921,34 @@ def fetch_api_data():
     try:
         data = request.json
         api_key = data.get('api_key')
-        city = data.get('city', 'Bengaluru')
+        cities = data.get('cities') or [data.get('city', 'Bengaluru')]
         units = data.get('units', 'metric')
         
         if not api_key:
             return jsonify({'status': 'error', 'message': 'API key not provided'})
         
-        url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&appid={api_key}&units={units}"
-        response = requests.get(url)
+        results = forecast_cache.fetch_many(cities, units=units, api_key=api_key)
+        errors = [f'{result.city}: {result.error}' for result in results if result.error]
+        if len(errors) == len(results):
+            if len(results) == 1:
+                return jsonify({'status': 'error', 'message': f"API Error: {results[0].error}"})
+            return jsonify({'status': 'error', 'message': f"API Error: {'; '.join(errors)}"})
         
-        if response.status_code != 200:
-            error_data = response.json()
-            return jsonify({'status': 'error', 'message': f"API Error: {error_data.get('message', 'Unknown error')}"})
-        
-        api_data = response.json()
-        forecast_list = api_data.get('list', [])
-        
-        for item in forecast_list:
-            entry = WeatherEntry(
-                user_id=DEFAULT_USER_ID,
-                datetime=datetime.fromtimestamp(item['dt']),
-                temperature=item['main']['temp'],
-                humidity=item['main']['humidity'],
-                wind_speed=item['wind']['speed'],
-                description=item['weather'][0]['description'],
-                city=city,
-                source='api'
-            )
-            db.session.add(entry)
+        rows = forecast_rows(results)
+        loaded = [result.city for result in results if not result.error]
         
+        ids = bulk_upsert_entries(rows, returning=True) if want_entry_ids(rows) else None
+        entries_count = len(ids) if ids is not None else bulk_upsert_entries(rows)
+        refresh_rollups_for_rows(rows)
         db.session.commit()
+        render_cache.bump(DEFAULT_USER_ID)
+        publish_entries(rows, ids)
+        submit_alerts(rows)
         return jsonify({
             'status': 'success',
-            'message': f'Loaded {len(forecast_list)} entries from API for {city}',
-            'entries_count': len(forecast_list)
+            'message': f'Loaded {entries_count} entries from API for {", ".join(loaded)}',
+            'entries_count': entries_count,
+            'errors': errors
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
@@ -185,62 +956,175 @@ def fetch_api_data():
 @app.route('/generate_dashboard', methods=['GET'])
 def generate_dashboard():
     try:
-        entries = WeatherEntry.query.filter_by(user_id=DEFAULT_USER_ID).all()
-        
-        if not entries:
-            return jsonify({'status': 'error', 'message': 'No data to visualize'})
-        
-        data = [entry.to_dict() for entry in entries]
-        df = pd.DataFrame(data)
-        df['DateTime'] = pd.to_datetime(df['DateTime'])
-        df = df.sort_values('DateTime')
-        
-        plt.figure(figsize=(14, 10))
+        # Read the version before querying so a concurrent write can't be cached as current
+        version = render_cache.version(DEFAULT_USER_ID)
+        cached = render_cache.get(DEFAULT_USER_ID, version)
+        if cached is not None:
+            return jsonify(cached)
         
-        plt.subplot(3, 1, 1)
-        plt.plot(df['DateTime'], df['Temperature'], marker='o', color='red', linewidth=2)
-        plt.title('Temperature Forecast Trend', fontsize=14, fontweight='bold')
-        plt.ylabel('Temperature (°C)')
-        plt.grid(True, alpha=0.3)
+        job = submit_dashboard(version)
+        try:
+            job.result(timeout=RENDER_TIMEOUT)
+        except TimeoutError:
+            # Still rendering in the background; the client can poll /render_jobs/<job_id>
+            return jsonify({'status': 'pending', 'message': 'Dashboard is still rendering', **job.to_dict()}), 202
         
-        plt.subplot(3, 1, 2)
-        plt.plot(df['DateTime'], df['Humidity'], marker='o', color='blue', linewidth=2)
-        plt.title('Humidity Forecast Trend', fontsize=14, fontweight='bold')
-        plt.ylabel('Humidity (%)')
-        plt.grid(True, alpha=0.3)
+        result = {**dashboard_result(job), 'export_url': url_for('export_entries', format='csv')}
+        render_cache.put(DEFAULT_USER_ID, version, result)
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f'Error generating dashboard: {str(e)}')
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/dashboard_image.<fmt>', methods=['GET'])
+def dashboard_image(fmt):
+    """The dashboard as raw PNG, SVG or WebP bytes, revalidated by ETag / Last-Modified"""
+    try:
+        if fmt not in IMAGE_FORMATS:
+            return jsonify({'status': 'error', 'message': f"Unsupported image format '{fmt}'"}), 404
+        version = render_cache.version(DEFAULT_USER_ID)
+        modified = render_cache.modified(DEFAULT_USER_ID)
+        etag = image_etag(fmt, DEFAULT_USER_ID, version)
+        unchanged = not_modified(etag, modified)
+        if unchanged is not None:
+            return unchanged
         
-        plt.subplot(3, 1, 3)
-        plt.plot(df['DateTime'], df['WindSpeed'], marker='o', color='green', linewidth=2)
-        plt.title('Wind Speed Forecast Trend', fontsize=14, fontweight='bold')
-        plt.ylabel('Wind Speed (m/s)')
-        plt.xlabel('Date & Time')
-        plt.grid(True, alpha=0.3)
+        variant = f'image.{fmt}'
+        image = render_cache.get(DEFAULT_USER_ID, version, variant)
+        if image is None:
+            job = submit_dashboard(version, fmt=IMAGE_FORMATS[fmt][0])
+            try:
+                image = job.result(timeout=RENDER_TIMEOUT)
+            except TimeoutError:
+                return jsonify({'status': 'pending', 'message': 'Dashboard is still rendering', **job.to_dict()}), 202
+            render_cache.put(DEFAULT_USER_ID, version, image, variant)
+        return image_response(image, fmt, etag, modified)
+    except Exception as e:
+        logger.error(f'Error rendering dashboard image: {str(e)}')
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/chart_data', methods=['GET'])
+def chart_data():
+    """Downsampled dashboard series for drawing the charts in the browser"""
+    try:
+        version = render_cache.version(DEFAULT_USER_ID)
+        modified = render_cache.modified(DEFAULT_USER_ID)
+        etag = version_etag(DEFAULT_USER_ID, version, 'chart')
+        unchanged = not_modified(etag, modified)
+        if unchanged is not None:
+            return unchanged
         
-        plt.tight_layout()
+        payload = render_cache.get(DEFAULT_USER_ID, version, 'chart')
+        if payload is None:
+            df, bucket = dashboard_frame()
+            payload = {'status': 'success', 'points': len(df), 'bucket': bucket, **chart_payload(df)}
+            render_cache.put(DEFAULT_USER_ID, version, payload, 'chart')
+        return cacheable(jsonify(payload), etag, modified)
+    except Exception as e:
+        logger.error(f'Error building chart data: {str(e)}')
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/render_jobs', methods=['POST'])
+def create_render_job():
+    """Queue a dashboard render and return its job id; identical requests share one job"""
+    try:
+        version = render_cache.version(DEFAULT_USER_ID)
+        job = submit_dashboard(version)
+        return jsonify({'status': 'success', **job.to_dict()}), 202
+    except Exception as e:
+        logger.error(f'Error queueing dashboard render: {str(e)}')
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/render_jobs/<job_id>', methods=['GET'])
+def get_render_job(job_id):
+    """Poll a render job; the finished job's response matches /generate_dashboard"""
+    try:
+        job = render_jobs.get(job_id)
+        if job is None:
+            return jsonify({'status': 'error', 'message': 'Render job not found or expired'}), 404
+        state = job.to_dict()
+        if state['state'] == 'failed':
+            return jsonify({'status': 'error', 'message': state['error'], **state})
+        if state['state'] != 'done':
+            return jsonify({'status': 'pending', **state}), 202
+        result = dashboard_result(job)
+        render_cache.put(DEFAULT_USER_ID, job.key[1], result)
+        return jsonify({**result, **state})
+    except Exception as e:
+        logger.error(f'Error reading render job: {str(e)}')
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/export', methods=['GET'])
+def export_entries():
+    """Entries as streamed CSV, or as a Parquet file built in the background on first request"""
+    try:
+        fmt = request.args.get('format', 'csv')
+        filters = {
+            'city': request.args.get('city', ''),
+            'date_from': request.args.get('date_from', ''),
+            'date_to': request.args.get('date_to', '')
+        }
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        img = io.BytesIO()
-        plt.savefig(img, format='png', dpi=100, bbox_inches='tight')
-        img.seek(0)
-        plot_url = base64.b64encode(img.getvalue()).decode()
-        plt.close()
+        if fmt == 'csv':
+            rows = export_rows(**filters)
+            def generate():
+                yield from csv_chunks(batched(rows, EXPORT_CSV_BATCH))
+            return Response(stream_with_context(generate()), mimetype='text/csv', headers={
+                'Content-Disposition': f'attachment; filename=weather_entries_{stamp}.csv'
+            })
         
-        csv_filename = f'weather_forecast_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        df.to_csv(csv_filename, index=False)
+        if fmt == 'parquet':
+            # One file per data version and filter set; the token keeps versions from before a restart apart
+            version = render_cache.version(DEFAULT_USER_ID)
+            key = repr((PROCESS_TOKEN, DEFAULT_USER_ID, version, sorted(filters.items())))
+            name = f'weather_entries_{hashlib.sha1(key.encode()).hexdigest()[:16]}.parquet'
+            def build(path):
+                with app.app_context():
+                    rows = export_rows(**filters, batch=EXPORT_PARQUET_BATCH)
+                    write_parquet(batched(rows, EXPORT_PARQUET_BATCH), path)
+            path = export_store.get_or_build(name, build)
+            if path is None:
+                return jsonify({'status': 'pending', 'message': 'Export is being prepared, retry shortly'}), 202
+            return send_file(path, mimetype='application/vnd.apache.parquet', as_attachment=True,
+                             download_name=f'weather_entries_{stamp}.parquet')
         
-        return jsonify({
-            'status': 'success',
-            'image': plot_url,
-            'csv_saved': csv_filename
-        })
+        return jsonify({'status': 'error', 'message': f"Unsupported export format '{fmt}'"})
     except Exception as e:
-        logger.error(f'Error generating dashboard: {str(e)}')
+        logger.error(f'Error exporting entries: {str(e)}')
+        return jsonify({'status': 'error', 'message': str(e)})
+
+@app.route('/aggregate', methods=['GET'])
+def aggregate():
+    """min/mean/max of temperature, humidity and wind speed per time bucket and city"""
+    try:
+        date_from = request.args.get('date_from', '')
+        date_to = request.args.get('date_to', '')
+        query = rollup_aggregate_query(
+            db.session, WeatherRollup,
+            bucket=request.args.get('bucket', 'day'),
+            user_id=DEFAULT_USER_ID,
+            city=request.args.get('city', ''),
+            date_from=datetime.fromisoformat(date_from) if date_from else None,
+            date_to=datetime.fromisoformat(date_to) if date_to else None,
+            by_city=request.args.get('by_city', 'true').lower() != 'false'
+        )
+        with metrics.span('db_query'):
+            rows = aggregate_rows(query)
+        return jsonify(rows)
+    except Exception as e:
+        logger.error(f'Error aggregating entries: {str(e)}')
         return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/clear_data', methods=['POST'])
 def clear_data():
     try:
         WeatherEntry.query.filter_by(user_id=DEFAULT_USER_ID).delete()
+        WeatherRollup.query.filter_by(user_id=DEFAULT_USER_ID).delete()
         db.session.commit()
+        archive_store.clear(DEFAULT_USER_ID)
+        render_cache.bump(DEFAULT_USER_ID)
+        entry_events.publish('clear', {})
         logger.info('All data cleared')
         return jsonify({'status': 'success', 'message': 'All data cleared'})
     except Exception as e:
@@ -250,8 +1134,9 @@ def clear_data():
 @app.route('/get_cities', methods=['GET'])
 def get_cities():
     try:
-        cities = db.session.query(WeatherEntry.city).filter_by(user_id=DEFAULT_USER_ID).distinct().all()
-        return jsonify([city[0] for city in cities if city[0]])
+        cities = [city[0] for city in cities_query().all() if city[0]]
+        cities += sorted(archive_store.cities(DEFAULT_USER_ID).difference(cities))
+        return jsonify(cities)
     except Exception as e:
         logger.error(f'Error getting cities: {str(e)}')
         return jsonify({'status': 'error', 'message': str(e)})
@@ -264,7 +1149,10 @@ def set_alerts():
         if user:
             user.alert_threshold_temp = data.get('temp_threshold')
             user.alert_threshold_humidity = data.get('humidity_threshold')
+            if data.get('email'):
+                user.email = data['email']
             db.session.commit()
+            alert_engine.reload_rules()
             logger.info('Alerts configured')
         return jsonify({'status': 'success', 'message': 'Alerts configured'})
     except Exception as e:
@@ -278,25 +1166,199 @@ def get_alerts():
         if user:
             return jsonify({
                 'temp_threshold': user.alert_threshold_temp,
-                'humidity_threshold': user.alert_threshold_humidity
+                'humidity_threshold': user.alert_threshold_humidity,
+                'email': user.email
             })
-        return jsonify({'temp_threshold': None, 'humidity_threshold': None})
+        return jsonify({'temp_threshold': None, 'humidity_threshold': None, 'email': None})
     except Exception as e:
         logger.error(f'Error getting alerts: {str(e)}')
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/alert_status', methods=['GET'])
+def alert_status():
+    """Rows evaluated, breaches found and emails sent or suppressed by the alert engine"""
+    return jsonify({'enabled': ALERTS_ENABLED, 'sender': type(alert_engine.sender).__name__, **alert_engine.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Request and phase timings in the Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'status': 'error', 'message': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Report dashboard render and forecast cache statistics"""
+    return jsonify({'render': render_cache.stats(), 'render_jobs': render_jobs.stats(),
+                    'forecast': forecast_cache.stats()})
+
 # ==================== BACKGROUND SCHEDULER ====================
 
+def ingest_forecasts(results):
+    """Store a scheduled fetch for the default user; returns rows written"""
+    with app.app_context():
+        rows = forecast_rows(results)
+        ids = bulk_upsert_entries(rows, returning=True) if want_entry_ids(rows) else None
+        count = len(ids) if ids is not None else bulk_upsert_entries(rows)
+        refresh_rollups_for_rows(rows)
+        db.session.commit()
+    render_cache.bump(DEFAULT_USER_ID)
+    publish_entries(rows, ids)
+    submit_alerts(rows)
+    return count
+
+# Cities are ';'-separated since OpenWeatherMap names can contain commas ("London,uk")
+ingest_scheduler = IngestScheduler(
+    fetch_many=lambda cities: forecast_cache.fetch_many(
+        cities, units=os_module.getenv('OPENWEATHER_UNITS', 'metric'),
+        api_key=os_module.getenv('OPENWEATHER_API_KEY')
+    ),
+    ingest=ingest_forecasts,
+    cities=[city.strip() for city in os_module.getenv('SCHEDULED_CITIES', '').split(';') if city.strip()],
+    interval_minutes=int(os_module.getenv('SCHEDULE_INTERVAL_MINUTES', '180')),
+    jitter_seconds=int(os_module.getenv('SCHEDULE_JITTER_SECONDS', '300')),
+    lock_path=os_module.path.join(instance_path, 'scheduler.lock')
+)
+
 def scheduled_api_fetch():
-    """Fetch weather data for all users periodically"""
-    pass  # Implement as needed
+    """Fetch weather data for the configured cities (also run periodically by the scheduler)"""
+    return ingest_scheduler.run_once()
+
+@app.before_request
+def start_scheduler():
+    """Start ingestion in serving processes only, not in scripts that import the app"""
+    if os_module.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true':
+        ingest_scheduler.start()
+        start_archival()
 
-scheduler = BackgroundScheduler()
-# scheduler.add_job(scheduled_api_fetch, 'interval', hours=6)
-# scheduler.start()
+# Only one process per instance folder archives, like ingestion
+archive_lock = LeaderLock(os_module.path.join(instance_path, 'archive.lock'))
+_archive_lock = threading.Lock()
+_archive_started = False
+archive_status = {'last_run': None, 'last_duration_seconds': None, 'last_rows_archived': 0,
+                  'last_months_archived': 0, 'last_error': None}
+
+def scheduled_archive():
+    """Archive entries past ARCHIVE_AFTER_DAYS; returns rows moved, or None when another process does it"""
+    if not archive_lock.acquire():
+        return None
+    start = time.perf_counter()
+    rows = months = 0
+    error = None
+    try:
+        with app.app_context():
+            rows, months = archive_entries(ARCHIVE_AFTER_DAYS)
+    except Exception as e:
+        error = str(e)
+        logger.error(f'Scheduled archival failed: {error}')
+    archive_status.update({
+        'last_run': datetime.now().isoformat(timespec='seconds'),
+        'last_duration_seconds': round(time.perf_counter() - start, 3),
+        'last_rows_archived': rows,
+        'last_months_archived': months,
+        'last_error': error
+    })
+    return rows
+
+def start_archival():
+    """Schedule archival every ARCHIVE_INTERVAL_HOURS, first a minute after start; a no-op when disabled"""
+    global _archive_started
+    if _archive_started or ARCHIVE_AFTER_DAYS <= 0:
+        return
+    with _archive_lock:
+        if _archive_started:
+            return
+        _archive_started = True
+    if not pyarrow_installed():
+        # Archived months would make /get_entries, /export and the dashboard need it too
+        archive_status['last_error'] = PYARROW_MISSING
+        logger.error(f'Not archiving entries despite ARCHIVE_AFTER_DAYS={ARCHIVE_AFTER_DAYS}: {PYARROW_MISSING}')
+        return
+    ingest_scheduler.background().add_job(
+        scheduled_archive, 'interval', hours=ARCHIVE_INTERVAL_HOURS, id='archive_entries', max_instances=1,
+        coalesce=True, next_run_time=datetime.now() + timedelta(minutes=1)
+    )
+    logger.info(f'Scheduled archival of entries older than {ARCHIVE_AFTER_DAYS} days')
+
+@app.before_request
+def warm_up_renderers():
+    """Warm the render workers on a background thread so no dashboard request waits for it"""
+    global _warm_up_started
+    if _warm_up_started or not RENDER_WARMUP:
+        return
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=render_jobs.warm_up, name='render-warm-up', daemon=True).start()
+
+@app.route('/scheduler_status', methods=['GET'])
+def scheduler_status():
+    """Last run time, duration and rows ingested by the background scheduler, and the archival job's"""
+    return jsonify({**ingest_scheduler.status(),
+                    'archive': {**archive_status, 'enabled': _archive_started and pyarrow_installed(),
+                                'after_days': ARCHIVE_AFTER_DAYS,
+                                'archived_entries': archive_store.stats(DEFAULT_USER_ID)[0]}})
 
 # ==================== DATABASE INITIALIZATION ====================
 
+def upgrade_schema():
+    """Bring databases created by older versions up to date (create_all skips existing tables)"""
+    from sqlalchemy import inspect
+    inspector = inspect(db.engine)
+    existing = {index['name'] for model in (WeatherEntry, WeatherRollup)
+                for index in inspector.get_indexes(model.__tablename__)}
+    for index in (*WeatherEntry.__table__.indexes, *WeatherRollup.__table__.indexes):
+        if index.name in existing:
+            continue
+        if index.name == 'uq_weather_entry_api_slot':
+            # Older databases collected duplicate forecast rows; keep the newest of each
+            removed = db.session.execute(text(
+                "DELETE FROM weather_entry WHERE source = 'api' AND id NOT IN ("
+                "SELECT MAX(id) FROM weather_entry WHERE source = 'api' "
+                "GROUP BY user_id, city, datetime, source)"
+            )).rowcount
+            db.session.commit()
+            if removed:
+                logger.info(f'Removed {removed} duplicate API entries')
+        index.create(bind=db.engine)
+        logger.info(f'Created index {index.name}')
+    if db.engine.dialect.name == 'sqlite':
+        upgrade_entry_ids()
+    # Databases from before rollups existed get them backfilled once
+    if WeatherRollup.query.first() is None and WeatherEntry.query.first() is not None:
+        logger.info(f'Built rollups for {rebuild_rollups()} city histories')
+
+def upgrade_entry_ids():
+    """Rebuild a weather_entry table created without AUTOINCREMENT, so archived ids are never reused
+
+    The copy keeps every id, and the id counter starts above both the table's
+    and the archive's highest id.
+    """
+    from sqlalchemy import inspect
+    table = WeatherEntry.__tablename__
+    definition = db.session.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table}
+    ).scalar()
+    db.session.commit()
+    if definition is None or 'AUTOINCREMENT' in definition.upper():
+        return
+    columns = ', '.join(column.name for column in WeatherEntry.__table__.columns)
+    old_indexes = [index['name'] for index in inspect(db.engine).get_indexes(table)]
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE {table} RENAME TO {table}_old'))
+        for name in old_indexes:
+            connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        WeatherEntry.__table__.create(bind=connection)
+        connection.execute(text(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_old'))
+        connection.execute(text(f'DROP TABLE {table}_old'))
+        highest = max(connection.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM {table}')).scalar(),
+                      archive_store.max_id())
+        connection.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': table})
+        connection.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'),
+                           {'name': table, 'seq': highest})
+    logger.info(f'Rebuilt {table} with AUTOINCREMENT ids (next id {highest + 1})')
+
 def init_db():
     """Initialize database safely"""
     import os
@@ -307,9 +1369,10 @@ def init_db():
         
         with app.app_context():
             db.create_all()
+            upgrade_schema()
             # Create default user if it doesn't exist
             if not User.query.get(DEFAULT_USER_ID):
-                default_user = User(id=DEFAULT_USER_ID, username='Guest', email='guest@example.com')
+                default_user = User(id=DEFAULT_USER_ID, username='Guest', email=PLACEHOLDER_EMAIL)
                 db.session.add(default_user)
                 db.session.commit()
                 logger.info(f'Created default user with ID {DEFAULT_USER_ID}')
@@ -318,6 +1381,8 @@ def init_db():
 
 if __name__ == '__main__':
     init_db()
+    start_scheduler()
+    warm_up_renderers()
     logger.info('Starting Weather Dashboard (No Authentication Mode)')
     logger.info('Open http://localhost:5000 in your browser')
     try:
@@ -0,0 +1,45 @@
+"""
+Move old WeatherEntry rows into the monthly Parquet archive
+Usage: python archive_entries.py [--older-than-days 365] [--vacuum]
+Archived entries stay readable through /get_entries, /export and the dashboard
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app_production import app, db, archive_entries, archive_store, ARCHIVE_AFTER_DAYS
+
+def main():
+    """Archive entries older than the retention age"""
+    parser = argparse.ArgumentParser(description='Move old weather entries into the Parquet archive')
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS or 365,
+                        help='archive months that ended more than this many days ago (default: ARCHIVE_AFTER_DAYS or 365)')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='compact the SQLite file afterwards (locks the database while it runs)')
+    args = parser.parse_args()
+
+    print(f"Archiving entries older than {args.older_than_days} days to {archive_store.directory}...")
+    start = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        rows, months = archive_entries(args.older_than_days)
+        print(f"✓ Archived {rows} entries from {months} months in {time.perf_counter() - start:.1f}s")
+        if args.vacuum and db.engine.dialect.name == 'sqlite':
+            start = time.perf_counter()
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql('VACUUM')
+            print(f"✓ Vacuumed database in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"Error archiving entries: {e}")
+        sys.exit(1)
@@ -0,0 +1,330 @@
+"""
+Cold storage for old weather entries: one compressed Parquet file per user and month.
+
+archive_entries() in app_production moves rows out of WeatherEntry into
+<directory>/user_<id>/<YYYY-MM>.parquet once their month is past the retention
+age, so the SQLite table (and every scan and VACUUM of it) only holds recent
+data. Each file is sorted by (datetime, id) and split into row groups, so
+reads prune twice: whole months by file name against the requested date
+range, then row groups by their min/max datetime statistics. A query for last
+week opens no archive file; one for a single old day reads a row group or two.
+Files are replaced atomically, so readers always see a complete partition.
+The hourly and daily rollups stay in the database, so aggregates never read
+the archive.
+"""
+import importlib.util
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from functools import reduce
+from operator import and_
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ('id', 'datetime', 'city', 'temperature', 'humidity', 'wind_speed', 'description', 'source',
+                   'created_at')
+
+# read()'s city for "every city"; any other value, '' and None included, matches exactly
+ALL_CITIES = object()
+
+_USER_DIR = re.compile(r'^user_(\d+)$')
+_MONTH_FILE = re.compile(r'^(\d{4})-(\d{2})\.parquet$')
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month):
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def archive_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.int64()),
+        ('datetime', pa.timestamp('us')),
+        ('city', pa.string()),
+        ('temperature', pa.float64()),
+        ('humidity', pa.float64()),
+        ('wind_speed', pa.float64()),
+        ('description', pa.string()),
+        ('source', pa.string()),
+        ('created_at', pa.timestamp('us')),
+    ])
+
+
+PYARROW_MISSING = 'The entry archive needs pyarrow (pip install pyarrow)'
+
+
+def pyarrow_installed():
+    """Whether pyarrow can be imported, without importing it"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError(PYARROW_MISSING)
+    return pa, pc, pq
+
+
+class ArchiveStore:
+    """Monthly Parquet partitions of archived entries under `directory`"""
+
+    def __init__(self, directory, compression='zstd', row_group_size=32768, observe=None):
+        self.directory = directory
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.observe = observe
+        self._lock = threading.Lock()
+        self._summaries = {}    # (path, kind) -> ((mtime_ns, size), summary)
+
+    def path(self, user_id, month):
+        return os.path.join(self.directory, f'user_{int(user_id)}', f'{month:%Y-%m}.parquet')
+
+    def users(self):
+        """Ids of the users with archived months"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(match.group(1)) for match in map(_USER_DIR.match, names) if match)
+
+    def months(self, user_id, start=None, end=None):
+        """First days of a user's archived months that overlap start..end (inclusive), oldest first"""
+        try:
+            names = os.listdir(os.path.join(self.directory, f'user_{int(user_id)}'))
+        except FileNotFoundError:
+            return []
+        months = []
+        for match in map(_MONTH_FILE.match, names):
+            if not match:
+                continue
+            month = datetime(int(match.group(1)), int(match.group(2)), 1)
+            if (start is None or next_month(month) > start) and (end is None or month <= end):
+                months.append(month)
+        return sorted(months)
+
+    def write_month(self, user_id, month, rows):
+        """Add ARCHIVE_COLUMNS row tuples to a month's partition; returns the rows it now holds
+
+        Rows already in the partition (same id and datetime, e.g. from a run
+        interrupted before it deleted them from the database) are skipped.
+        """
+        pa, _, pq = _pyarrow()
+        schema = archive_schema()
+        path = self.path(user_id, month)
+        with self._lock:
+            existing = pq.read_table(path) if os.path.exists(path) else None
+            if existing is not None:
+                archived = set(zip(existing.column('id').to_pylist(), existing.column('datetime').to_pylist()))
+                rows = [row for row in rows if (row[0], row[1]) not in archived]
+            if not rows:
+                return existing.num_rows if existing is not None else 0
+            table = pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)], schema=schema
+            )
+            if existing is not None:
+                table = pa.concat_tables([existing.cast(schema), table])
+            self._write(path, table.sort_by([('datetime', 'ascending'), ('id', 'ascending')]))
+        return table.num_rows
+
+    def _write(self, path, table):
+        _, _, pq = _pyarrow()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.tmp'
+        try:
+            pq.write_table(table, partial, compression=self.compression, row_group_size=self.row_group_size)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def read(self, user_id, columns=ARCHIVE_COLUMNS, city=ALL_CITIES, start=None, end=None, before=None, descending=False):
+        """Tables of matching archived rows, one per row group read, ordered by (datetime, id)
+
+        city ALL_CITIES matches every city, None rows without one and any
+        other value that exact city ('' only rows with an empty one); start and end
+        are inclusive; before=(datetime, id) keeps only rows ordered before
+        that key. Row groups are read as the caller iterates, so stopping
+        early (a page of results) skips the rest.
+        """
+        if before is not None:
+            end = before[0] if end is None else min(end, before[0])
+        months = self.months(user_id, start, end)
+        if not months:
+            return
+        _, pc, pq = _pyarrow()
+        conditions = []
+        if city is None:
+            conditions.append(pc.field('city').is_null())
+        elif city is not ALL_CITIES:
+            conditions.append(pc.field('city') == city)
+        if start is not None:
+            conditions.append(pc.field('datetime') >= start)
+        if end is not None:
+            conditions.append(pc.field('datetime') <= end)
+        if before is not None:
+            moment, entry_id = before
+            conditions.append((pc.field('datetime') < moment) |
+                              ((pc.field('datetime') == moment) & (pc.field('id') < entry_id)))
+        expression = reduce(and_, conditions) if conditions else None
+        # Filter columns are read alongside the requested ones and dropped afterwards
+        needed = list(dict.fromkeys([*columns, 'datetime', 'id', *([] if city is ALL_CITIES else ['city'])]))
+        order = 'descending' if descending else 'ascending'
+        for month in (reversed(months) if descending else months):
+            try:
+                parquet = pq.ParquetFile(self.path(user_id, month))
+            except FileNotFoundError:
+                continue
+            try:
+                datetime_index = parquet.schema_arrow.get_field_index('datetime')
+                groups = range(parquet.metadata.num_row_groups)
+                for group in (reversed(groups) if descending else groups):
+                    stats = parquet.metadata.row_group(group).column(datetime_index).statistics
+                    if stats is not None and stats.has_min_max and (
+                            (start is not None and stats.max < start) or (end is not None and stats.min > end)):
+                        continue
+                    started = time.perf_counter()
+                    table = parquet.read_row_group(group, columns=needed)
+                    if expression is not None:
+                        table = table.filter(expression)
+                    if table.num_rows:
+                        table = table.sort_by([('datetime', order), ('id', order)]).select(list(columns))
+                    if self.observe:
+                        self.observe('archive_read', time.perf_counter() - started)
+                    if table.num_rows:
+                        yield table
+            finally:
+                parquet.close()
+
+    def rows(self, user_id, columns=ARCHIVE_COLUMNS, **filters):
+        """read() as row tuples in `columns` order"""
+        for table in self.read(user_id, columns, **filters):
+            # Converted a slice at a time, so a page of results doesn't pay for the whole row group
+            for batch in table.to_batches(max_chunksize=1024):
+                yield from zip(*(column.to_pylist() for column in batch.columns))
+
+    def _summary(self, path, kind, compute):
+        """compute(path), remembered until the file changes; None if it is gone"""
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (info.st_mtime_ns, info.st_size)
+        cached = self._summaries.get((path, kind))
+        if cached is None or cached[0] != signature:
+            cached = self._summaries[(path, kind)] = (signature, compute(path))
+        return cached[1]
+
+    @staticmethod
+    def _footer_stats(path):
+        _, _, pq = _pyarrow()
+        metadata = pq.read_metadata(path)
+        index = metadata.schema.to_arrow_schema().get_field_index('datetime')
+        bounds = [metadata.row_group(group).column(index).statistics for group in range(metadata.num_row_groups)]
+        bounds = [stats for stats in bounds if stats is not None and stats.has_min_max]
+        return (metadata.num_rows, min((stats.min for stats in bounds), default=None),
+                max((stats.max for stats in bounds), default=None))
+
+    @staticmethod
+    def _file_cities(path):
+        _, _, pq = _pyarrow()
+        return {city for city in pq.read_table(path, columns=['city']).column('city').unique().to_pylist() if city}
+
+    def stats(self, user_id):
+        """(rows, first datetime, last datetime) of a user's archive, from the file footers only"""
+        total, first, last = 0, None, None
+        for month in self.months(user_id):
+            summary = self._summary(self.path(user_id, month), 'stats', self._footer_stats)
+            if summary is None:
+                continue
+            rows, low, high = summary
+            total += rows
+            first = low if first is None or (low is not None and low < first) else first
+            last = high if last is None or (high is not None and high > last) else last
+        return total, first, last
+
+    def max_id(self):
+        """Highest entry id in any user's archive (0 when empty), from the file footers only"""
+        users = self.users()
+        if not users:
+            return 0
+        _, _, pq = _pyarrow()
+        highest = 0
+        for user_id in users:
+            for month in self.months(user_id):
+                try:
+                    metadata = pq.read_metadata(self.path(user_id, month))
+                except FileNotFoundError:
+                    continue
+                index = metadata.schema.to_arrow_schema().get_field_index('id')
+                for group in range(metadata.num_row_groups):
+                    stats = metadata.row_group(group).column(index).statistics
+                    if stats is not None and stats.has_min_max:
+                        highest = max(highest, stats.max)
+        return highest
+
+    def cities(self, user_id):
+        """Distinct non-empty city names in a user's archive"""
+        cities = set()
+        for month in self.months(user_id):
+            cities.update(self._summary(self.path(user_id, month), 'cities', self._file_cities) or ())
+        return cities
+
+    def city_spans(self, user_id):
+        """{city: (first datetime, last datetime)} of a user's archive"""
+        spans = {}
+        for table in self.read(user_id, ('city', 'datetime')):
+            grouped = table.group_by('city').aggregate([('datetime', 'min'), ('datetime', 'max')])
+            for city, first, last in zip(grouped.column('city').to_pylist(), grouped.column('datetime_min').to_pylist(),
+                                         grouped.column('datetime_max').to_pylist()):
+                known = spans.get(city)
+                spans[city] = (min(known[0], first), max(known[1], last)) if known else (first, last)
+        return spans
+
+    def delete_entry(self, user_id, entry_id):
+        """Remove one archived entry by id; returns its column values as a dict, or None if not archived"""
+        months = self.months(user_id)
+        if not months:
+            return None
+        _, pc, pq = _pyarrow()
+        for month in reversed(months):
+            path = self.path(user_id, month)
+            with self._lock:
+                try:
+                    ids = pq.read_table(path, columns=['id']).column('id')
+                except FileNotFoundError:
+                    continue
+                if not pc.any(pc.equal(ids, entry_id)).as_py():
+                    continue
+                table = pq.read_table(path)
+                match = pc.equal(table.column('id'), entry_id)
+                row = table.filter(match).slice(0, 1).to_pylist()[0]
+                remaining = table.filter(pc.invert(match))
+                if remaining.num_rows:
+                    self._write(path, remaining)
+                else:
+                    os.remove(path)
+            return row
+        return None
+
+    def clear(self, user_id):
+        """Delete every archived month of a user; returns how many"""
+        months = self.months(user_id)
+        with self._lock:
+            shutil.rmtree(os.path.join(self.directory, f'user_{int(user_id)}'), ignore_errors=True)
+            for month in months:
+                for kind in ('stats', 'cities'):
+                    self._summaries.pop((self.path(user_id, month), kind), None)
+        if months:
+            logger.info(f'Removed {len(months)} archived months of user {user_id}')
+        return len(months)
@@ -0,0 +1,118 @@
+"""
+Alert evaluation throughput, and ingestion latency with alerts off vs on
+
+Times alerts.evaluate() on synthetic rows against many rules next to a
+per-row, per-rule Python loop. Then POSTs readings that breach the default
+user's thresholds through the real routes, with alerts disabled and with
+alerts emailed to a local SMTP stub that takes --smtp-latency seconds per
+message, and reports request latency and the emails the stub received.
+
+Usage: python benchmarks/bench_alerts.py [--rows 100000] [--rules 200] [--requests 200] [--smtp-latency 0.2]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_rows(rows, users, cities):
+    start = datetime(2024, 6, 1)
+    return [{'user_id': 1 + i % users, 'datetime': start + timedelta(hours=i), 'temperature': 15 + (i * 7) % 25,
+             'humidity': 30 + (i * 11) % 70, 'wind_speed': 2.0, 'description': 'bench', 'city': f'City{i % cities:03d}',
+             'source': 'manual'} for i in range(rows)]
+
+
+def synthetic_rules(count, users, cities):
+    from alerts import AlertRule
+    # Thresholds near the top of the synthetic ranges, so a few percent of readings breach
+    return [AlertRule(1 + i % users, ('temperature', 'humidity')[i % 2], (35.0, 95.0)[i % 2] + i % 4,
+                      f'user{i % users}@example.com',
+                      f'City{i % cities:03d}' if i % 3 == 0 else None) for i in range(count)]
+
+
+def naive_evaluate(rows, rules):
+    return [(rule, row) for row in rows for rule in rules
+            if row['user_id'] == rule.user_id and (not rule.city or row['city'] == rule.city)
+            and row[rule.metric] > rule.threshold]
+
+
+def bench_evaluate(args):
+    from alerts import evaluate
+    rows = synthetic_rows(args.rows, args.users, args.cities)
+    rules = synthetic_rules(args.rules, args.users, args.cities)
+    start = time.perf_counter()
+    breaches = evaluate(rows, rules)
+    vectorized = time.perf_counter() - start
+    sample = rows[:max(1, args.rows // 10)]
+    start = time.perf_counter()
+    naive_evaluate(sample, rules)
+    naive = (time.perf_counter() - start) * len(rows) / len(sample)
+    print(f'{args.rows:,} rows x {args.rules} rules ({args.users} users, {args.cities} cities): {len(breaches):,} breaches')
+    print(f'{"evaluate() (numpy)":<36}{vectorized * 1000:>10.0f} ms{args.rows / vectorized:>14,.0f} rows/s')
+    print(f'{"per-row, per-rule loop (estimated)":<36}{naive * 1000:>10.0f} ms{args.rows / naive:>14,.0f} rows/s\n')
+
+
+def bench_ingestion(args):
+    from smtp_stub import start_stub
+    server, messages = start_stub(latency=args.smtp_latency)
+    tmp = tempfile.mkdtemp()
+    os.environ.update({'DATABASE_URL': f'sqlite:///{tmp}/bench_alerts.db'.replace(os.sep, '/'),
+                       'SCHEDULER_ENABLED': 'false', 'RENDER_WARMUP': 'false', 'SMTP_SERVER': '127.0.0.1',
+                       'SMTP_PORT': str(server.server_address[1]), 'SMTP_STARTTLS': 'false',
+                       'ALERT_COOLDOWN_MINUTES': '0', 'ALERT_MAX_EMAILS_PER_HOUR': '100000'})
+    import app_production as ap
+
+    ap.init_db()
+    client = ap.app.test_client()
+    client.post('/set_alerts', json={'temp_threshold': 30, 'humidity_threshold': 90, 'email': 'bench@example.com'})
+    start = datetime(2024, 6, 1)
+
+    def post(enabled, offset):
+        ap.ALERTS_ENABLED = enabled
+        timings = []
+        for i in range(args.requests):
+            moment = start + timedelta(days=offset, minutes=i)
+            began = time.perf_counter()
+            client.post('/add_entry', json={'datetime': moment.isoformat(), 'temperature': 35 + i % 5,
+                                            'humidity': 50, 'windspeed': 2, 'city': f'City{i % 5}'})
+            timings.append(time.perf_counter() - began)
+        return timings
+
+    print(f'{args.requests} POST /add_entry, each over the temperature threshold; SMTP stub takes '
+          f'{args.smtp_latency}s per message')
+    print(f'{"":<24}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}')
+    for name, enabled, offset in (('alerts off', False, 0), ('alerts on', True, 1)):
+        timings = sorted(post(enabled, offset))
+        print(f'{name:<24}{statistics.median(timings) * 1000:>10.2f}'
+              f'{timings[int(len(timings) * 0.95)] * 1000:>10.2f}{timings[-1] * 1000:>10.2f}')
+    began = time.perf_counter()
+    ap.alert_engine.drain(120)
+    stats = ap.alert_engine.stats()
+    print(f"\nAlert queue drained {time.perf_counter() - began:.1f}s after the last request: "
+          f"{stats['rows_evaluated']} rows evaluated, {stats['breaches']} breaches, "
+          f"{stats['emails_sent']} emails sent, {len(messages)} received by the stub")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--rules', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--cities', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--smtp-latency', type=float, default=0.2)
+    args = parser.parse_args()
+    bench_evaluate(args)
+    bench_ingestion(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Database size, scan/VACUUM time and read latency before and after archiving old entries
+
+Seeds a throwaway SQLite database with hourly rows for several cities ending
+today, times the read endpoints and a full-table scan, then runs
+archive_entries() and VACUUM and times everything again. Reads that only need
+recent data should not notice the archive; reads of old months go to Parquet.
+
+Usage: python benchmarks/bench_archive.py [--rows 500000] [--cities 20] [--archive-after-days 90] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_BATCH = 50000
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def seed(ap, rows, cities):
+    hours = rows // cities
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours)
+    table = ap.WeatherEntry.__table__
+    batch = []
+    with ap.app.app_context():
+        for hour in range(hours):
+            moment = start + timedelta(hours=hour)
+            for city in range(cities):
+                batch.append({'user_id': ap.DEFAULT_USER_ID, 'datetime': moment, 'temperature': 15 + (hour % 24) / 2,
+                              'humidity': 40 + city, 'wind_speed': (hour % 7) * 1.5, 'description': 'clear sky',
+                              'city': f'City{city:03d}', 'source': 'api'})
+            if len(batch) >= SEED_BATCH:
+                ap.db.session.execute(table.insert(), batch)
+                ap.db.session.commit()
+                batch = []
+        if batch:
+            ap.db.session.execute(table.insert(), batch)
+            ap.db.session.commit()
+        ap.rebuild_rollups()
+    return start
+
+
+def measure(ap, client, repeat, old_week):
+    old_from, old_to = (moment.isoformat(timespec='seconds') for moment in old_week)
+
+    def scan():
+        with ap.app.app_context():
+            ap.db.session.execute(ap.text('SELECT count(*), avg(temperature) FROM weather_entry')).one()
+            ap.db.session.remove()
+
+    def vacuum():
+        with ap.app.app_context():
+            with ap.db.engine.connect() as connection:
+                connection.exec_driver_sql('VACUUM')
+
+    timings = {
+        'get_entries?limit=100': best_of(repeat, lambda: client.get('/get_entries?limit=100')),
+        'get_entries old week, 1 city': best_of(repeat, lambda: client.get(
+            f'/get_entries?city=City001&date_from={old_from}&date_to={old_to}')),
+        'get_entries old week, limit=100': best_of(repeat, lambda: client.get(
+            f'/get_entries?limit=100&date_from={old_from}&date_to={old_to}')),
+        'aggregate?bucket=week': best_of(repeat, lambda: client.get('/aggregate?bucket=week')),
+        'get_cities': best_of(repeat, lambda: client.get('/get_cities')),
+        'full table scan': best_of(repeat, scan),
+        'VACUUM': best_of(1, vacuum),
+    }
+    return {name: seconds * 1000 for name, seconds in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--cities', type=int, default=20)
+    parser.add_argument('--archive-after-days', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_file = os.path.join(tmp, 'archive.db')
+    os.environ.update({'DATABASE_URL': f'sqlite:///{db_file}'.replace(os.sep, '/'),
+                       'ARCHIVE_DIR': os.path.join(tmp, 'archive'), 'SCHEDULER_ENABLED': 'false', 'RENDER_WARMUP': 'false', 'METRICS_ENABLED': 'false'})
+    sys.path.insert(0, ROOT)
+    import app_production as ap
+
+    ap.init_db()
+    start = time.perf_counter()
+    first = seed(ap, args.rows, args.cities)
+    print(f'Seeded {args.rows} rows for {args.cities} cities from {first:%Y-%m-%d} in {time.perf_counter() - start:.1f}s\n')
+    old_week = (first + timedelta(days=30), first + timedelta(days=37))
+    client = ap.app.test_client()
+
+    before = measure(ap, client, args.repeat, old_week)
+    before_db = os.path.getsize(db_file)
+    with ap.app.app_context():
+        start = time.perf_counter()
+        moved, months = ap.archive_entries(args.archive_after_days)
+        archived_in = time.perf_counter() - start
+        hot_rows = ap.WeatherEntry.query.count()
+    after = measure(ap, client, args.repeat, old_week)
+    after_db = os.path.getsize(db_file)
+
+    print(f'Archived {moved} rows from {months} months in {archived_in:.1f}s; {hot_rows} rows stay in SQLite\n')
+    print(f'{"":<38}{"before":>12}{"after":>12}')
+    print(f'{"SQLite file (MB)":<38}{before_db / 1e6:>12.1f}{after_db / 1e6:>12.1f}')
+    print(f'{"Parquet archive (MB)":<38}{"":>12}{dir_size(ap.archive_store.directory) / 1e6:>12.1f}')
+    for name in before:
+        print(f'{name + " (ms)":<38}{before[name]:>12.1f}{after[name]:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
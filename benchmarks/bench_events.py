@@ -0,0 +1,94 @@
+"""
+Live entry updates: bytes per change, publish cost and memory held for stalled clients
+
+Compares what the dashboard used to transfer after every change (the first
+/get_entries page, re-fetched) with the server-sent event carrying just the
+change, times EventBroker.publish() with many open streams, and shows the
+memory stalled clients that never read can hold: at most
+EVENTS_CLIENT_BUFFER events each, shared between all of them.
+
+Usage: python benchmarks/bench_events.py [--rows 10000] [--changes 200] [--subscribers 100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--changes', type=int, default=200)
+    parser.add_argument('--subscribers', type=int, default=100)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update({'DATABASE_URL': f'sqlite:///{tmp}/bench_events.db'.replace(os.sep, '/'),
+                       'SCHEDULER_ENABLED': 'false', 'RENDER_WARMUP': 'false', 'ALERTS_ENABLED': 'false',
+                       'EVENTS_MAX_CLIENTS': str(args.subscribers + 1)})
+    sys.path.insert(0, ROOT)
+    import app_production as ap
+    from entry_events import EventBroker
+
+    ap.init_db()
+    client = ap.app.test_client()
+    start = datetime(2024, 1, 1)
+    client.post('/add_entries', json=[{'datetime': (start + timedelta(minutes=i)).isoformat(), 'temperature': 20,
+                                       'humidity': 50, 'windspeed': 3, 'description': 'seed', 'city': 'Bench'}
+                                      for i in range(args.rows)])
+
+    # The dashboard's side: one open stream, the page re-fetch it replaces
+    subscription = ap.entry_events.subscribe()
+    refetch_bytes = event_bytes = 0
+    refetch_seconds = 0.0
+    for i in range(args.changes):
+        client.post('/add_entry', json={'datetime': (start + timedelta(days=30, minutes=i)).isoformat(),
+                                        'temperature': 21, 'humidity': 50, 'windspeed': 3, 'city': 'Bench'})
+        event_bytes += sum(len(event.encode()) for event in subscription.next(0))
+        began = time.perf_counter()
+        refetch_bytes += len(client.get('/get_entries?limit=200').data)
+        refetch_seconds += time.perf_counter() - began
+    subscription.close()
+    print(f'{args.changes} POST /add_entry on {args.rows:,} rows, per change:')
+    print(f'{"  re-fetch /get_entries?limit=200":<40}{refetch_bytes / args.changes:>10,.0f} bytes'
+          f'{refetch_seconds / args.changes * 1000:>10.2f} ms')
+    print(f'{"  upsert event":<40}{event_bytes / args.changes:>10,.0f} bytes\n')
+
+    # A 40-slot forecast fetch as one event, fanned out to open streams
+    rows = [{'datetime': start + timedelta(hours=3 * i), 'temperature': 20.5, 'humidity': 60.0, 'wind_speed': 3.1,
+             'description': 'scattered clouds', 'city': 'Bench', 'source': 'api'} for i in range(40)]
+    payload = {'entries': [ap.event_entry(i, row) for i, row in enumerate(rows)]}
+    for subscribers in (0, 10, args.subscribers):
+        broker = EventBroker('bench', max_buffer=256, max_subscribers=subscribers + 1)
+        streams = [broker.subscribe() for _ in range(subscribers)]
+        began = time.perf_counter()
+        for _ in range(1000):
+            broker.publish('upsert', payload)
+            for stream in streams:
+                stream.next(0)
+        seconds = (time.perf_counter() - began) / 1000
+        print(f'publish 40-row event, {subscribers:>4} streams reading: {seconds * 1e6:>8.1f} us')
+
+    # Stalled streams: nobody reads, the buffers stop growing at max_buffer
+    broker = EventBroker('bench', max_buffer=256, max_subscribers=args.subscribers)
+    streams = [broker.subscribe() for _ in range(args.subscribers)]
+    tracemalloc.start()
+    for _ in range(5000):
+        broker.publish('upsert', payload)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = broker.stats()
+    print(f"\n{args.subscribers} stalled streams, 5000 events: {stats['buffered_events']:,} events buffered "
+          f"({stats['overflows']:,} overflows answered with 'reload'), {current / 1e6:.1f} MB held "
+          f"(unbounded: ~{5000 * args.subscribers * 8 / 1e6 + 5000 * len(str(payload)) / 1e6:.0f} MB)")
+    for stream in streams:
+        stream.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Bulk import throughput: import_entries.py vs POST /add_entries
+
+Writes synthetic hourly readings for several cities as a CSV in the
+weather_forecast_data.csv layout (plus City) and as /get_entries-style
+NDJSON, imports each into a fresh SQLite database with import_entries.py and
+reports rows/s. For reference it also times the same rows sent through
+/add_entries in 10000-row requests (on the first --api-rows rows only).
+
+Usage: python benchmarks/bench_import.py [--rows 1000000] [--cities 20] [--api-rows 50000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_frame(rows, cities):
+    import numpy as np
+    import pandas as pd
+    hours = -(-rows // cities)
+    moments = pd.date_range('2015-01-01', periods=hours, freq='h')
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'DateTime': np.repeat(moments.values, cities)[:rows],
+        'Temperature': rng.normal(22, 6, rows).round(2),
+        'Humidity': rng.uniform(20, 95, rows).round(0),
+        'WindSpeed': rng.gamma(2, 2, rows).round(2),
+        'Description': rng.choice(['clear sky', 'few clouds', 'light rain', 'overcast clouds'], rows),
+        'City': np.tile([f'City{i:03d}' for i in range(cities)], hours)[:rows],
+    })
+    return df
+
+
+def run_import(path, env):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, os.path.join(ROOT, 'import_entries.py'), path], env=env,
+                         capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if out.returncode:
+        raise RuntimeError(out.stdout + out.stderr)
+    return elapsed, out.stdout.strip().splitlines()[-2]
+
+
+def run_add_entries(args):
+    """Child process: POST the first --api-rows rows to /add_entries"""
+    sys.path.insert(0, ROOT)
+    import app_production as ap
+    df = make_frame(args.api_rows, args.cities)
+    items = [{'datetime': moment.isoformat(), 'temperature': temperature, 'humidity': humidity,
+              'windspeed': wind_speed, 'description': description, 'city': city}
+             for moment, temperature, humidity, wind_speed, description, city in zip(
+                 df['DateTime'].dt.to_pydatetime(), df['Temperature'], df['Humidity'], df['WindSpeed'],
+                 df['Description'], df['City'])]
+    ap.init_db()
+    client = ap.app.test_client()
+    start = time.perf_counter()
+    for offset in range(0, len(items), ap.MAX_BULK_ENTRIES):
+        client.post('/add_entries', json=items[offset:offset + ap.MAX_BULK_ENTRIES])
+    print(json.dumps({'seconds': time.perf_counter() - start}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--cities', type=int, default=20)
+    parser.add_argument('--api-rows', type=int, default=50000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return run_add_entries(args)
+
+    tmp = tempfile.mkdtemp()
+    base_env = {**os.environ, 'SCHEDULER_ENABLED': 'false', 'RENDER_WARMUP': 'false', 'WRITE_BEHIND': 'false'}
+    df = make_frame(args.rows, args.cities)
+    csv_path = os.path.join(tmp, 'weather_forecast_data.csv')
+    ndjson_path = os.path.join(tmp, 'entries.ndjson')
+    df.to_csv(csv_path, index=False)
+    df.assign(DateTime=df['DateTime'].dt.strftime('%Y-%m-%d %H:%M:%S')).to_json(ndjson_path, orient='records',
+                                                                                  lines=True)
+    print(f'{args.rows:,} rows for {args.cities} cities: CSV {os.path.getsize(csv_path) / 1e6:.0f} MB, '
+          f'NDJSON {os.path.getsize(ndjson_path) / 1e6:.0f} MB\n')
+
+    for name, path in (('import_entries.py CSV', csv_path), ('import_entries.py NDJSON', ndjson_path)):
+        env = {**base_env, 'DATABASE_URL': f'sqlite:///{tmp}/{name.split()[-1]}.db'.replace(os.sep, '/')}
+        elapsed, summary = run_import(path, env)
+        print(f'{name:<28}{elapsed:>8.1f}s{args.rows / elapsed:>12,.0f} rows/s (whole process)')
+        print(f'{"":<28}{summary}')
+
+    env = {**base_env, 'DATABASE_URL': f'sqlite:///{tmp}/add_entries.db'.replace(os.sep, '/')}
+    out = subprocess.run([sys.executable, __file__, '--child', '--api-rows', str(args.api_rows),
+                          '--cities', str(args.cities)], env=env, capture_output=True, text=True, check=True)
+    seconds = json.loads(out.stdout.strip().splitlines()[-1])['seconds']
+    print(f'{"POST /add_entries":<28}{seconds:>8.1f}s{args.api_rows / seconds:>12,.0f} rows/s ({args.api_rows:,} rows)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Manual-entry ingestion rate: one commit per POST vs write-behind batching vs bulk POSTs
+
+Runs against a throwaway SQLite database through the real Flask routes.
+
+Usage: python benchmarks/bench_ingest.py [--entries 2000] [--bulk-size 500]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def readings(n, offset):
+    start = datetime(2024, 6, 1) + timedelta(days=offset)
+    return [{
+        'datetime': (start + timedelta(minutes=i)).isoformat(), 'temperature': 20 + i % 9,
+        'humidity': 55, 'windspeed': 2.5, 'description': 'sensor', 'city': 'Bench'
+    } for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=2000)
+    parser.add_argument('--bulk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/bench_ingest.db'.replace(os.sep, '/')
+    os.environ['SCHEDULER_ENABLED'] = 'false'
+    import app_production as ap
+
+    ap.init_db()
+    client = ap.app.test_client()
+
+    def per_entry(items):
+        for item in items:
+            client.post('/add_entry', json=item)
+
+    def bulk(items):
+        for i in range(0, len(items), args.bulk_size):
+            client.post('/add_entries', json=items[i:i + args.bulk_size])
+
+    modes = [
+        ('POST /add_entry, commit each', False, per_entry),
+        ('POST /add_entry, write-behind', True, per_entry),
+        (f'POST /add_entries x{args.bulk_size}', False, bulk),
+        (f'POST /add_entries x{args.bulk_size}, write-behind', True, bulk),
+    ]
+    print(f'{args.entries} entries per mode\n')
+    print(f'{"mode":<40}{"entries/s":>12}{"acked in":>12}{"committed in":>14}')
+    for offset, (name, write_behind, post) in enumerate(modes):
+        ap.WRITE_BEHIND = write_behind
+        items = readings(args.entries, offset)
+        start = time.perf_counter()
+        post(items)
+        acked = time.perf_counter() - start
+        ap.entry_queue.flush()
+        committed = time.perf_counter() - start
+        print(f'{name:<40}{args.entries / committed:>12.0f}{acked:>11.2f}s{committed:>13.2f}s')
+
+    with ap.app.app_context():
+        total = ap.WeatherEntry.query.filter_by(city='Bench').count()
+    print(f'\n{total} rows stored ({len(modes) * args.entries} expected)')
+    ap.entry_queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Cost of the /metrics instrumentation per request and per span, enabled vs disabled
+
+Each setting runs in a fresh subprocess (METRICS_ENABLED is read at import)
+and times a cheap route through the Flask test client, then times bare
+metrics.span() calls.
+
+Usage: python benchmarks/bench_metrics.py [--requests 5000] [--spans 200000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_setting(args):
+    """Child process: time requests and spans, print a JSON summary"""
+    sys.path.insert(0, ROOT)
+    import app_production as ap
+
+    ap.init_db()
+    client = ap.app.test_client()
+    for _ in range(200):
+        client.get('/write_queue_status')
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        client.get('/write_queue_status')
+    per_request = (time.perf_counter() - start) / args.requests
+    start = time.perf_counter()
+    for _ in range(args.spans):
+        with ap.metrics.span('bench'):
+            pass
+    per_span = (time.perf_counter() - start) / args.spans
+    print(json.dumps({'request_us': per_request * 1e6, 'span_us': per_span * 1e6,
+                      'metrics_bytes': len(ap.metrics.render()) if ap.metrics.enabled else 0}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--spans', type=int, default=200000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return run_setting(args)
+
+    tmp = tempfile.mkdtemp()
+    print(f'{"METRICS_ENABLED":<18}{"us/request":>12}{"us/span":>10}{"/metrics bytes":>16}')
+    for enabled in ('false', 'true'):
+        env = {**os.environ, 'METRICS_ENABLED': enabled, 'SCHEDULER_ENABLED': 'false', 'RENDER_WARMUP': 'false',
+               'DATABASE_URL': f'sqlite:///{tmp}/metrics_{enabled}.db'.replace(os.sep, '/')}
+        out = subprocess.run([sys.executable, __file__, '--child', '--requests', str(args.requests),
+                              '--spans', str(args.spans)], env=env, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f'{enabled:<18}{result["request_us"]:>12.1f}{result["span_us"]:>10.2f}{result["metrics_bytes"]:>16}')
+
+
+if __name__ == '__main__':
+    main()
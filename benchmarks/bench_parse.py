@@ -0,0 +1,88 @@
+"""
+Forecast payload parsing: the old per-item loops vs json_normalize vs forecast_parser
+
+Builds synthetic 40-item forecasts (benchmarks/owm_stub.make_forecast) for
+many cities and times JSON decoding plus conversion to a typed DataFrame.
+
+Usage: python benchmarks/bench_parse.py [--cities 2500] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import forecast_parser
+from forecast_parser import parse_forecasts
+from owm_stub import make_forecast
+
+
+def loop_dataframe(payloads):
+    """What app.py and weather_dashboard.py used to do"""
+    rows = []
+    for payload in payloads:
+        for item in payload['list']:
+            rows.append([item['dt_txt'], item['main']['temp'], item['main']['humidity'],
+                         item['wind']['speed'], item['weather'][0]['description']])
+    df = pd.DataFrame(rows, columns=['DateTime', 'Temperature', 'Humidity', 'WindSpeed', 'Description'])
+    df['DateTime'] = pd.to_datetime(df['DateTime'])
+    return df
+
+
+def normalized(payloads):
+    df = pd.json_normalize([item for payload in payloads for item in payload['list']])
+    return pd.DataFrame({
+        'DateTime': pd.to_datetime(df['dt'], unit='s'),
+        'Temperature': df['main.temp'],
+        'Humidity': df['main.humidity'].astype(float),
+        'WindSpeed': df['wind.speed'],
+        'Description': [weather[0]['description'] for weather in df['weather']],
+    })
+
+
+def best_of(repeat, fn, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cities', type=int, default=2500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cities = [f'City{i}' for i in range(args.cities)]
+    bodies = [json.dumps(make_forecast(city)).encode() for city in cities]
+    payloads = [json.loads(body) for body in bodies]
+    items = sum(len(payload['list']) for payload in payloads)
+    print(f'{args.cities} cities, {items} forecast items, {sum(map(len, bodies)) / 1e6:.1f} MB of JSON\n')
+
+    timings = [
+        ('json.loads', best_of(args.repeat, lambda: [json.loads(body) for body in bodies])),
+    ]
+    if forecast_parser.orjson is not None:
+        timings.append(('orjson.loads', best_of(args.repeat, lambda: [forecast_parser.orjson.loads(b) for b in bodies])))
+    timings += [
+        ('per-item loop + to_datetime', best_of(args.repeat, loop_dataframe, payloads)),
+        ('pandas.json_normalize', best_of(args.repeat, normalized, payloads)),
+        ('parse_forecasts', best_of(args.repeat, parse_forecasts, payloads, cities)),
+        ('parse_forecasts (local time)', best_of(args.repeat, lambda: parse_forecasts(payloads, cities, local_time=True))),
+    ]
+    for name, seconds in timings:
+        print(f'{name:<32}{seconds * 1000:>10.1f} ms{items / seconds / 1e6:>10.2f} M items/s')
+
+    df = parse_forecasts(payloads, cities)
+    print(f'\nparse_forecasts frame: {df.memory_usage(deep=True).sum() / 1e6:.1f} MB, '
+          f'old frame: {loop_dataframe(payloads).memory_usage(deep=True).sum() / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark dashboard rendering: per-request pyplot vs persistent DashboardRenderer
+
+Usage: python benchmarks/bench_render.py [--repeat N]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from dashboard_renderer import DashboardRenderer
+
+SIZES = (40, 4_000, 400_000)
+
+
+def make_frame(n):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'DateTime': pd.date_range('2024-01-01', periods=n, freq='3h'),
+        'Temperature': 25 + 5 * rng.standard_normal(n),
+        'Humidity': 60 + 10 * rng.standard_normal(n),
+        'WindSpeed': np.abs(3 + rng.standard_normal(n)),
+    })
+
+
+def render_pyplot(df):
+    """The original generate_dashboard drawing code"""
+    plt.figure(figsize=(14, 10))
+    for i, (col, colour) in enumerate((('Temperature', 'red'), ('Humidity', 'blue'), ('WindSpeed', 'green')), 1):
+        plt.subplot(3, 1, i)
+        plt.plot(df['DateTime'], df[col], marker='o', color=colour, linewidth=2)
+        plt.title(col, fontsize=14, fontweight='bold')
+        plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    img = io.BytesIO()
+    plt.savefig(img, format='png', dpi=100, bbox_inches='tight')
+    plt.close()
+    return img.getvalue()
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    renderer = DashboardRenderer(pool_size=1)
+    print(f"{'points':>10} {'pyplot (ms)':>14} {'renderer (ms)':>15} {'unchanged (ms)':>16}")
+    for n in SIZES:
+        df = make_frame(n)
+        old = timed(lambda: render_pyplot(df), args.repeat)
+        new = timed(lambda: renderer.render(df), args.repeat)
+        # Same data key: Line2D data is left untouched, only the canvas is drawn
+        renderer.render(df, key=n)
+        same = timed(lambda: renderer.render(df, key=n), args.repeat)
+        print(f"{n:>10} {old * 1000:>14.1f} {new * 1000:>15.1f} {same * 1000:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
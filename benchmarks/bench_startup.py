@@ -0,0 +1,132 @@
+"""
+Cold-start time of each entry point, from `python -X importtime`
+
+Every run is a fresh interpreter. For the two Flask apps it imports the module
+and serves one GET / through the test client; weather_dashboard.py is run with
+no API key, so it stops right after its imports. Reports wall time, the time
+spent in imports and the heaviest of them. Background work (scheduler,
+renderer warm-up) is switched off so only the startup path is timed. The
+first run of each entry point compiles bytecode and is discarded.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--top 8]
+                                          [--save startup.json] [--compare startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVE_FIRST_REQUEST = '''
+import json, sys, time
+start = time.perf_counter()
+import {module} as entry
+imported = time.perf_counter()
+entry.app.test_client().get('/')
+print('STARTUP ' + json.dumps({{'import_ms': (imported - start) * 1000,
+                               'first_request_ms': (time.perf_counter() - imported) * 1000}}))
+'''
+
+# name: (interpreter arguments, module whose direct imports are listed)
+ENTRY_POINTS = {
+    'python': (['-c', 'pass'], None),
+    'app': (['-c', SERVE_FIRST_REQUEST.format(module='app')], 'app'),
+    'app_production': (['-c', SERVE_FIRST_REQUEST.format(module='app_production')], 'app_production'),
+    'weather_dashboard': (['weather_dashboard.py'], None),
+}
+
+
+def parse_importtime(stderr, entry_module=None):
+    """({module: cumulative_us} for the imports worth listing, total us of all top-level imports)
+
+    Listed are the top-level imports and, for an app, the modules it imports
+    directly, since its own line accounts for nearly everything.
+    """
+    listed, total = {}, 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two more spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            total += int(cumulative_us)
+        if depth <= (1 if entry_module else 0) and name != entry_module:
+            listed[name] = int(cumulative_us)
+    return listed, total
+
+
+def run_once(name, env):
+    args, entry_module = ENTRY_POINTS[name]
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    top, total = parse_importtime(proc.stderr, entry_module)
+    result = {'wall_ms': wall, 'imports_ms': total / 1000, 'top': top}
+    for line in proc.stdout.splitlines():
+        if line.startswith('STARTUP '):
+            result.update(json.loads(line[len('STARTUP '):]))
+    return result
+
+
+def measure(name, repeat, env):
+    run_once(name, env)
+    runs = [run_once(name, env) for _ in range(repeat)]
+    summary = {key: statistics.median(run[key] for run in runs)
+               for key in ('wall_ms', 'imports_ms', 'import_ms', 'first_request_ms') if key in runs[0]}
+    modules = runs[0]['top']
+    summary['top'] = sorted(
+        ((module, statistics.median(run['top'].get(module, 0) for run in runs) / 1000)
+         for module in modules), key=lambda item: -item[1])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='heaviest imports to list per entry point')
+    parser.add_argument('--entry', nargs='+', choices=list(ENTRY_POINTS), default=list(ENTRY_POINTS))
+    parser.add_argument('--save', help='write the medians to this JSON file')
+    parser.add_argument('--compare', help='JSON file from an earlier --save to diff against')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    env = {**os.environ, 'SCHEDULER_ENABLED': 'false', 'RENDER_WARMUP': 'false', 'OPENWEATHER_API_KEY': '',
+           'DATABASE_URL': f'sqlite:///{tmp}/startup.db'.replace(os.sep, '/')}
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f'median of {args.repeat} runs, milliseconds\n')
+    print(f'{"entry point":<20}{"wall":>9}{"imports":>10}{"import":>9}{"1st req":>9}{"vs base":>10}')
+    for name in args.entry:
+        summary = results[name] = measure(name, args.repeat, env)
+        before = baseline.get(name, {}).get('wall_ms')
+        delta = f'{summary["wall_ms"] - before:+.0f}' if before is not None else ''
+        cells = [f'{summary[key]:>9.0f}' if key in summary else f'{"":>9}' for key in ('import_ms', 'first_request_ms')]
+        print(f'{name:<20}{summary["wall_ms"]:>9.0f}{summary["imports_ms"]:>10.0f}{"".join(cells)}{delta:>10}')
+
+    for name in args.entry:
+        if name == 'python':
+            continue
+        print(f'\n{name}: heaviest imports (cumulative ms)')
+        for module, ms in results[name]['top'][:args.top]:
+            print(f'  {module:<40}{ms:>8.1f}')
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nSaved to {args.save}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Memory and speed of the columnar WeatherStore vs the old list-of-dicts store
+
+Usage: python benchmarks/bench_store.py [--entries 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import WeatherStore
+
+DESCRIPTIONS = ('clear sky', 'few clouds', 'scattered clouds', 'light rain', 'overcast clouds')
+
+
+def synthetic(n):
+    # 10-minute readings: a million of them stay well inside datetime64[ns]'s range
+    start = pd.Timestamp('2005-01-01')
+    stamps = (start + pd.to_timedelta(np.arange(n) * 10, unit='min')).strftime('%Y-%m-%d %H:%M:%S').tolist()
+    rng = np.random.default_rng(0)
+    return (stamps, (20 + 5 * rng.standard_normal(n)).tolist(), (60 + 10 * rng.standard_normal(n)).tolist(),
+            np.abs(3 + rng.standard_normal(n)).tolist(), [DESCRIPTIONS[i % len(DESCRIPTIONS)] for i in range(n)])
+
+
+def timed(build):
+    start = time.perf_counter()
+    result = build()
+    return result, time.perf_counter() - start
+
+
+def traced_bytes(build):
+    """Bytes still allocated once build() returns"""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    args = parser.parse_args()
+    columns = synthetic(args.entries)
+
+    def build_dicts():
+        # What app.py used to keep: one dict per entry
+        return [{'DateTime': d, 'Temperature': t, 'Humidity': h, 'WindSpeed': w, 'Description': desc}
+                for d, t, h, w, desc in zip(*columns)]
+
+    def build_store():
+        store = WeatherStore()
+        for d, t, h, w, desc in zip(*columns):
+            store.append(d, t, h, w, desc)
+        return store
+
+    def load_store():
+        store = WeatherStore()
+        store.replace(*columns)
+        return store
+
+    dicts, dict_time = timed(build_dicts)
+    start = time.perf_counter()
+    df = pd.DataFrame(dicts)
+    df['DateTime'] = pd.to_datetime(df['DateTime'])
+    df = df.sort_values('DateTime')
+    dict_frame = time.perf_counter() - start
+    # A million live dicts make every GC pass crawl; drop them before timing the store
+    del dicts, df
+    gc.collect()
+    dict_bytes = traced_bytes(build_dicts)
+    gc.collect()
+
+    store, store_time = timed(build_store)
+    _, load_time = timed(load_store)
+    store_bytes = traced_bytes(load_store)
+    start = time.perf_counter()
+    store.frame()
+    store_frame = time.perf_counter() - start
+
+    mb = 1024 * 1024
+    print(f'{args.entries:,} entries')
+    print(f"{'':24} {'memory (MB)':>12} {'build (s)':>10} {'DataFrame (ms)':>15}")
+    print(f"{'list of dicts':24} {dict_bytes / mb:>12.1f} {dict_time:>10.2f} {dict_frame * 1000:>15.1f}")
+    print(f"{'WeatherStore.append':24} {store_bytes / mb:>12.1f} {store_time:>10.2f} {store_frame * 1000:>15.1f}")
+    print(f"{'WeatherStore.replace':24} {store_bytes / mb:>12.1f} {load_time:>10.2f} {'':>15}")
+
+
+if __name__ == '__main__':
+    main()
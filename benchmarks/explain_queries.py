@@ -0,0 +1,40 @@
+"""
+Check that the hot WeatherEntry and rollup queries are served by an index.
+
+Runs the checks from query_plans.py (the same ones tests/test_query_plans.py
+asserts on a scratch database) against the configured DATABASE_URL, prints
+each plan and exits non-zero if any query falls back to a full table scan or
+a temporary sort it shouldn't need. Useful on a migrated production copy.
+
+Usage: python benchmarks/explain_queries.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_production import app, db, init_db
+from query_plans import plan_for, plan_problems, index_ordered_queries, range_sorted_queries
+
+
+def main():
+    init_db()
+    failures = 0
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print(f'EXPLAIN QUERY PLAN check only supports SQLite (got {db.engine.dialect.name})')
+            return 0
+        checks = [(name, query, False) for name, query in index_ordered_queries().items()]
+        checks += [(name, query, True) for name, query in range_sorted_queries().items()]
+        for name, query, allow_sort in checks:
+            plan = plan_for(query)
+            problems = plan_problems(plan, allow_sort)
+            failures += bool(problems)
+            print(f"[{'FAIL' if problems else 'ok'}] {name}")
+            for step in plan:
+                print(f'       {step}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
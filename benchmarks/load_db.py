@@ -0,0 +1,132 @@
+"""
+Concurrent read/write load against the production app under each storage profile.
+
+Each profile runs in a fresh subprocess on its own SQLite file: writer threads
+POST /add_entry while reader threads page through /get_entries and query
+/aggregate, all through the real Flask routes. Reports throughput, latency
+percentiles and how many requests failed with "database is locked".
+
+Usage: python benchmarks/load_db.py [--profiles default wal] [--seconds 10]
+                                    [--writers 2] [--readers 4] [--seed-rows 20000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run_profile(args):
+    """Child process: seed the database, hammer it for args.seconds, print a JSON summary"""
+    sys.path.insert(0, ROOT)
+    import app_production as ap
+
+    ap.init_db()
+    start = datetime(2024, 1, 1)
+    with ap.app.app_context():
+        rows = [{
+            'user_id': ap.DEFAULT_USER_ID, 'datetime': start + timedelta(minutes=10 * i),
+            'temperature': 20 + i % 7, 'humidity': 50 + i % 30, 'wind_speed': 3.0,
+            'description': 'seed', 'city': f'City{i % 4}', 'source': 'api'
+        } for i in range(args.seed_rows)]
+        ap.bulk_upsert_entries(rows)
+        ap.refresh_rollups_for_rows(rows)
+        ap.db.session.commit()
+
+    stop = time.perf_counter() + args.seconds
+    results = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0, 'locked': 0}
+    lock = threading.Lock()
+
+    def worker(kind, n):
+        client = ap.app.test_client()
+        i = 0
+        while time.perf_counter() < stop:
+            i += 1
+            began = time.perf_counter()
+            if kind == 'write':
+                moment = start + timedelta(days=400, minutes=n * 100000 + i)
+                response = client.post('/add_entry', json={
+                    'datetime': moment.isoformat(), 'temperature': 21, 'humidity': 55,
+                    'windspeed': 2, 'description': 'load', 'city': f'City{n % 4}'
+                })
+            elif i % 2:
+                response = client.get(f'/get_entries?limit=100&city=City{n % 4}')
+            else:
+                response = client.get('/aggregate?bucket=day&by_city=false')
+            elapsed = time.perf_counter() - began
+            body = response.get_json()
+            failed = isinstance(body, dict) and body.get('status') == 'error'
+            with lock:
+                if failed:
+                    errors[kind] += 1
+                    errors['locked'] += 'locked' in body.get('message', '')
+                else:
+                    results[kind].append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=('write', n)) for n in range(args.writers)]
+    threads += [threading.Thread(target=worker, args=('read', n)) for n in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = {'profile': args.profile}
+    for kind in ('read', 'write'):
+        latencies = results[kind]
+        summary[kind] = {
+            'ops_per_sec': round(len(latencies) / args.seconds, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'errors': errors[kind]
+        }
+    summary['locked_errors'] = errors['locked']
+    print(json.dumps(summary))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', default=['default', 'wal'])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seed-rows', type=int, default=20000)
+    parser.add_argument('--profile', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        return run_profile(args)
+
+    print(f'{args.writers} writers + {args.readers} readers for {args.seconds:g}s, '
+          f'{args.seed_rows} seeded rows\n')
+    print(f'{"profile":<10}{"reads/s":>10}{"read p95":>11}{"writes/s":>10}{"write p95":>11}{"errors":>8}{"locked":>8}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            env = {**os.environ, 'DATABASE_URL': f'sqlite:///{tmp}/{profile}.db'.replace(os.sep, '/'),
+                   'DB_PROFILE': profile, 'SCHEDULER_ENABLED': 'false', 'RENDER_PROCESSES': '0'}
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--profile', profile, '--seconds', str(args.seconds),
+                 '--writers', str(args.writers), '--readers', str(args.readers), '--seed-rows', str(args.seed_rows)],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            s = json.loads(output.strip().splitlines()[-1])
+            print(f'{profile:<10}{s["read"]["ops_per_sec"]:>10}{s["read"]["p95_ms"]:>9}ms'
+                  f'{s["write"]["ops_per_sec"]:>10}{s["write"]["p95_ms"]:>9}ms'
+                  f'{s["read"]["errors"] + s["write"]["errors"]:>8}{s["locked_errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
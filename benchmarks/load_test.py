@@ -0,0 +1,370 @@
+"""
+Load test of the production app served by waitress, per database size
+
+For each --rows size a SQLite database with that many synthetic readings
+(spread hourly across --cities cities, with rollups built) is seeded once
+into --data-dir and reused by later runs; every run works on a fresh copy,
+so the writes it makes never leak into the next. The app is served by
+waitress in a child process, pointed at a local OpenWeatherMap stub, and
+client threads replay a weighted mix of /add_entry, /get_entries (100-row
+pages), /generate_dashboard and /fetch_api_data for --duration seconds
+after a --warmup. Reports latency percentiles and throughput per endpoint
+and the peak RSS of the server and its child processes (Linux /proc, or
+psutil if installed). --save writes the results as JSON and --compare
+prints the change against such a file.
+
+The clients share the machine with the server, so compare runs made on the
+same host with the same settings.
+
+Usage: python benchmarks/load_test.py [--rows 1000 100000 1000000] [--cities 50]
+                                      [--concurrency 8] [--duration 20] [--warmup 3]
+                                      [--mix add_entry=30,get_entries=50,generate_dashboard=10,fetch_api_data=10]
+                                      [--save baseline.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_db import percentile
+from owm_stub import start_stub
+
+ENDPOINTS = ('add_entry', 'get_entries', 'generate_dashboard', 'fetch_api_data')
+DEFAULT_MIX = 'add_entry=30,get_entries=50,generate_dashboard=10,fetch_api_data=10'
+SEED_START = datetime(2020, 1, 1)
+SEED_BATCH = 50000
+DESCRIPTIONS = ('clear sky', 'few clouds', 'scattered clouds', 'light rain', 'overcast clouds')
+
+
+def city_name(i):
+    return f'City{i:03d}'
+
+
+def seed_database(args):
+    """Child process: fill the database at DATABASE_URL with args.rows readings and their rollups"""
+    import app_production as ap
+
+    ap.init_db()
+    rng = random.Random(42)
+    table = ap.WeatherEntry.__table__
+    with ap.app.app_context():
+        for offset in range(0, args.rows, SEED_BATCH):
+            rows = []
+            for i in range(offset, min(offset + SEED_BATCH, args.rows)):
+                hour = i // args.cities
+                rows.append({
+                    'user_id': ap.DEFAULT_USER_ID, 'datetime': SEED_START + timedelta(hours=hour),
+                    'temperature': round(20 + 8 * rng.random() + (hour % 24) / 4, 2),
+                    'humidity': float(rng.randint(30, 95)), 'wind_speed': round(rng.random() * 10, 2),
+                    'description': DESCRIPTIONS[rng.randrange(len(DESCRIPTIONS))],
+                    'city': city_name(i % args.cities), 'source': 'api'
+                })
+            ap.db.session.execute(table.insert(), rows)
+            ap.db.session.commit()
+        ap.rebuild_rollups()
+        ap.db.session.commit()
+        ap.db.session.remove()
+        # Closing the last connection checkpoints the WAL into the database file
+        ap.db.engine.dispose()
+
+
+def serve(args):
+    """Child process: serve app_production with waitress until killed"""
+    from waitress import serve as waitress_serve
+    import app_production as ap
+
+    ap.init_db()
+    waitress_serve(ap.app, host='127.0.0.1', port=args.port, threads=args.server_threads, _quiet=True)
+
+
+def seeded_path(args, rows):
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = os.path.join(args.data_dir, f'weather_{rows}_{args.cities}.db')
+    if not os.path.exists(path):
+        print(f'Seeding {rows} rows into {path}...', flush=True)
+        # Leftovers of an interrupted seed would collide with the new rows
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(f'{path}.tmp{suffix}'):
+                os.remove(f'{path}.tmp{suffix}')
+        began = time.perf_counter()
+        env = {**os.environ, 'DATABASE_URL': sqlite_url(path + '.tmp'), 'SCHEDULER_ENABLED': 'false'}
+        subprocess.run([sys.executable, __file__, '--seed', '--rows', str(rows), '--cities', str(args.cities)],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        os.replace(path + '.tmp', path)
+        print(f'Seeded in {time.perf_counter() - began:.1f}s', flush=True)
+    return path
+
+
+def sqlite_url(path):
+    return f'sqlite:///{os.path.abspath(path)}'.replace(os.sep, '/')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def process_tree(pid):
+    """pid and all of its descendants (Linux /proc)"""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name can contain spaces; the parent pid follows the closing paren
+                    parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                pass
+    tree, frontier = [pid], [pid]
+    while frontier:
+        children = [child for child, parent in parents.items() if parent in frontier]
+        tree += children
+        frontier = children
+    return tree
+
+
+def peak_rss_mb(pid):
+    """(server peak RSS, [peak RSS of each child: render workers, resource tracker]) in MB"""
+    if os.path.isdir('/proc'):
+        peaks = []
+        for member in process_tree(pid):
+            try:
+                with open(f'/proc/{member}/status') as f:
+                    for line in f:
+                        if line.startswith('VmHWM:'):
+                            peaks.append(int(line.split()[1]) / 1024)
+            except OSError:
+                pass
+        return (peaks[0], peaks[1:]) if peaks else (None, [])
+    try:
+        import psutil
+    except ImportError:
+        return None, []
+    # Without /proc only the current RSS is known
+    process = psutil.Process(pid)
+    return process.memory_info().rss / 2 ** 20, [child.memory_info().rss / 2 ** 20 for child in process.children(True)]
+
+
+def parse_mix(text):
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint '{name}' in --mix, expected {', '.join(ENDPOINTS)}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def run_load(args, base_url, rows):
+    """Replay the mix against base_url; returns {endpoint: [(latency, ok)]} recorded after the warmup"""
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    results = {name: [] for name in ENDPOINTS}
+    lock = threading.Lock()
+    began = time.perf_counter()
+    record_from = began + args.warmup
+    stop = record_from + args.duration
+    # Manual readings go after the seeded history so they never collide with it
+    first_new_hour = SEED_START + timedelta(hours=rows // args.cities + 1)
+
+    def client(n):
+        rng = random.Random(n)
+        session = requests.Session()
+        i = 0
+        while True:
+            now = time.perf_counter()
+            if now >= stop:
+                return
+            i += 1
+            name = rng.choices(names, weights)[0]
+            city = city_name(rng.randrange(args.cities))
+            if name == 'add_entry':
+                moment = first_new_hour + timedelta(minutes=n * 1000000 + i)
+                call = lambda: session.post(f'{base_url}/add_entry', json={
+                    'datetime': moment.isoformat(), 'temperature': 21.5, 'humidity': 55,
+                    'windspeed': 3.2, 'description': 'load test', 'city': city
+                })
+            elif name == 'get_entries':
+                query = f'?limit=100&city={city}' if rng.random() < 0.5 else '?limit=100'
+                call = lambda: session.get(f'{base_url}/get_entries{query}')
+            elif name == 'generate_dashboard':
+                call = lambda: session.get(f'{base_url}/generate_dashboard')
+            else:
+                call = lambda: session.post(f'{base_url}/fetch_api_data', json={
+                    'api_key': 'load-test', 'cities': [f'Stub{rng.randrange(args.api_cities)}']
+                })
+            start = time.perf_counter()
+            try:
+                response = call()
+                body = response.json()
+                ok = response.status_code < 400 and not (isinstance(body, dict) and body.get('status') == 'error')
+            except (requests.RequestException, ValueError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            if start >= record_from:
+                with lock:
+                    results[name].append((elapsed, ok))
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(results, duration):
+    summary = {}
+    everything = []
+    for name, samples in results.items():
+        if not samples:
+            continue
+        everything += samples
+        summary[name] = _stats(samples, duration)
+    summary['total'] = _stats(everything, duration)
+    return summary
+
+
+def _stats(samples, duration):
+    latencies = [elapsed for elapsed, _ in samples]
+    return {
+        'count': len(samples),
+        'errors': sum(not ok for _, ok in samples),
+        'req_per_sec': round(len(samples) / duration, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def change(now, before):
+    if before in (None, 0) or now is None:
+        return ''
+    return f'{(now - before) / before * 100:+.0f}%'
+
+
+def run_size(args, rows, stub_url):
+    seeded = seeded_path(args, rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'weather.db')
+        shutil.copyfile(seeded, database)
+        port = free_port()
+        env = {**os.environ, 'DATABASE_URL': sqlite_url(database), 'OPENWEATHER_BASE_URL': stub_url,
+               'SCHEDULER_ENABLED': 'false', 'EXPORT_DIR': os.path.join(tmp, 'exports'),
+               'FORECAST_CACHE_PATH': ''}
+        server = subprocess.Popen([sys.executable, __file__, '--serve', '--port', str(port),
+                                   '--server-threads', str(args.server_threads)], env=env)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            deadline = time.time() + 60
+            while True:
+                try:
+                    requests.get(f'{base_url}/write_queue_status', timeout=1)
+                    break
+                except requests.RequestException:
+                    if server.poll() is not None or time.time() > deadline:
+                        raise SystemExit('Server did not start')
+                    time.sleep(0.2)
+            results = run_load(args, base_url, rows)
+            server_rss, child_rss = peak_rss_mb(server.pid)
+        finally:
+            # Ctrl+C lets waitress return and the render workers shut down with it
+            server.send_signal(signal.SIGTERM if os.name == 'nt' else signal.SIGINT)
+            try:
+                server.wait(30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+    summary = summarize(results, args.duration)
+    summary['peak_rss_mb'] = {'server': round(server_rss, 1) if server_rss else None,
+                              'children': [round(rss, 1) for rss in child_rss]}
+    return summary
+
+
+def print_summary(rows, summary, baseline):
+    before = baseline.get(str(rows), {})
+    print(f'\n{rows} seeded rows')
+    print(f'{"endpoint":<20}{"count":>7}{"errors":>7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+          f'{"vs req/s":>10}{"vs p95":>8}')
+    for name in (*ENDPOINTS, 'total'):
+        stats = summary.get(name)
+        if not stats:
+            continue
+        old = before.get(name, {})
+        print(f'{name:<20}{stats["count"]:>7}{stats["errors"]:>7}{stats["req_per_sec"]:>9.1f}'
+              f'{stats["p50_ms"]:>9.1f}{stats["p95_ms"]:>9.1f}{stats["p99_ms"]:>9.1f}'
+              f'{change(stats["req_per_sec"], old.get("req_per_sec")):>10}{change(stats["p95_ms"], old.get("p95_ms")):>8}')
+    rss = summary['peak_rss_mb']
+    old_rss = before.get('peak_rss_mb', {}).get('server')
+    children = ', '.join(f'{mb:.0f}' for mb in rss['children']) or 'none'
+    print(f'peak RSS: server {rss["server"]} MB{" " + change(rss["server"], old_rss) if old_rss else ""}, '
+          f'child processes: {children} MB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--cities', type=int, default=50)
+    parser.add_argument('--api-cities', type=int, default=20, help='distinct cities /fetch_api_data asks the stub for')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--server-threads', type=int, default=8, help='waitress worker threads')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--stub-latency', type=float, default=0.05, help='seconds the OpenWeatherMap stub waits')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'weather_load_test'))
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file from an earlier --save to diff against')
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        args.rows = args.rows[0]
+        return seed_database(args)
+    if args.serve:
+        return serve(args)
+
+    parse_mix(args.mix)
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    stub, stub_url = start_stub(latency=args.stub_latency)
+    print(f'{args.concurrency} clients, {args.server_threads} waitress threads, {args.duration:g}s after a '
+          f'{args.warmup:g}s warmup, mix {args.mix}')
+    results = {}
+    try:
+        for rows in args.rows:
+            results[str(rows)] = run_size(args, rows, stub_url)
+            print_summary(rows, results[str(rows)], baseline)
+    finally:
+        stub.shutdown()
+
+    if args.save:
+        settings = {key: getattr(args, key) for key in
+                    ('cities', 'api_cities', 'concurrency', 'server_threads', 'duration', 'warmup', 'mix',
+                     'stub_latency')}
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=2)
+        print(f'\nSaved to {args.save}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Local stand-in for the OpenWeatherMap forecast API.
+
+Serves deterministic 40-item 5 day / 3 hour forecasts for any city, so the
+apps, the CLI and the benchmarks can run without network access or an API key.
+Point them at it with OPENWEATHER_BASE_URL=http://127.0.0.1:<port>.
+start_stub() can also make chosen cities fail with given statuses first or
+answer slowly, and counts concurrent requests, for tests of the client.
+
+Usage: python benchmarks/owm_stub.py [--port 8089] [--latency 0.05]
+"""
+import argparse
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DESCRIPTIONS = ('clear sky', 'few clouds', 'scattered clouds', 'light rain', 'overcast clouds')
+
+
+def make_forecast(city, items=40, start=None):
+    """Build a forecast payload shaped like the real API's response"""
+    seed = zlib.crc32(city.encode())
+    start = start or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    forecast = []
+    for i in range(items):
+        when = start + timedelta(hours=3 * i)
+        wobble = ((seed >> (i % 16)) & 0xF) / 3
+        forecast.append({
+            'dt': int(when.timestamp()),
+            'main': {'temp': round(18 + wobble + (i % 8), 2), 'humidity': 40 + (seed + i) % 50},
+            'wind': {'speed': round(1 + wobble / 2, 2)},
+            'weather': [{'description': DESCRIPTIONS[(seed + i) % len(DESCRIPTIONS)]}],
+            'dt_txt': when.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    return {'cod': '200', 'cnt': items, 'list': forecast, 'city': {'name': city}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests_served = 0
+    _lock = threading.Lock()
+    faults = {}     # city -> statuses to answer with, one per request, before serving it normally
+    delays = {}     # city -> extra seconds before answering
+    traffic = None  # per-server counters: requests per city, requests in flight and the most at once
+
+    def do_GET(self):
+        with StubHandler._lock:
+            StubHandler.requests_served += 1
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        city = query.get('q', [''])[0]
+        with self._lock:
+            self.traffic['requests'][city] = self.traffic['requests'].get(city, 0) + 1
+            self.traffic['in_flight'] += 1
+            self.traffic['max_in_flight'] = max(self.traffic['max_in_flight'], self.traffic['in_flight'])
+            fault = self.faults[city].pop(0) if self.faults.get(city) else None
+        try:
+            self._serve(url, query, city, fault)
+        finally:
+            with self._lock:
+                self.traffic['in_flight'] -= 1
+
+    def _serve(self, url, query, city, fault):
+        if self.latency or self.delays.get(city):
+            time.sleep(self.latency + self.delays.get(city, 0))
+        if fault is not None:
+            return self._send(fault, {'cod': str(fault), 'message': f'stub fault {fault}'})
+        if not url.path.endswith('/forecast'):
+            return self._send(404, {'cod': '404', 'message': 'Not found'})
+        if not query.get('appid', [''])[0]:
+            return self._send(401, {'cod': 401, 'message': 'Invalid API key'})
+        if not city or city.lower() == 'nowhere':
+            return self._send(404, {'cod': '404', 'message': 'city not found'})
+        # Forecasts change per 3-hour step, so that's what the validator tracks
+        etag = f'"{zlib.crc32(city.encode()):x}-{int(time.time()) // 10800}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self._send(200, make_forecast(city), etag)
+
+    def _send(self, status, payload, etag=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, latency=0.0, faults=None, delays=None):
+    """Start the stub in a daemon thread; returns (server, base_url)
+
+    faults {city: [status, ...]} answers that city's first requests with those
+    statuses; delays {city: seconds} slows that city down. Request counts are
+    in server.RequestHandlerClass.traffic.
+    """
+    handler = type('Handler', (StubHandler,), {
+        'latency': latency, 'faults': {city: list(statuses) for city, statuses in (faults or {}).items()},
+        'delays': dict(delays or {}), 'traffic': {'requests': {}, 'in_flight': 0, 'max_in_flight': 0}
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenWeatherMap forecast stub')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to sleep per request')
+    args = parser.parse_args()
+    server, base_url = start_stub(args.port, args.latency)
+    print(f'OpenWeatherMap stub listening on {base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Local SMTP server that accepts every message and keeps it in memory.
+
+Enough of SMTP for smtplib (no STARTTLS or AUTH), so alert emails can be
+checked without a mail account. Point the app at it with
+SMTP_SERVER=127.0.0.1 SMTP_PORT=<port> SMTP_STARTTLS=false.
+
+Usage: python benchmarks/smtp_stub.py [--port 8025] [--latency 0.2]
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    latency = 0.0
+    messages = None     # (recipients, raw message) of every message accepted, per server
+    lock = None
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        recipients = []
+        self.reply('220 localhost SMTP stub')
+        for line in self.rfile:
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip(' <>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                for data in self.rfile:
+                    if data in (b'.\r\n', b'.\n'):
+                        break
+                    body.append(data)
+                if self.latency:
+                    time.sleep(self.latency)
+                with self.lock:
+                    self.messages.append((recipients, b''.join(body).decode('utf-8', 'replace')))
+                self.reply('250 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+def start_stub(port=0, latency=0.0):
+    """Start the stub in a daemon thread; returns (server, messages list)"""
+    messages = []
+    handler = type('Handler', (SMTPHandler,), {'latency': latency, 'messages': messages, 'lock': threading.Lock()})
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local SMTP stub')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to sleep per message')
+    args = parser.parse_args()
+    server, messages = start_stub(args.port, args.latency)
+    print(f'SMTP stub listening on 127.0.0.1:{server.server_address[1]}')
+    seen = 0
+    try:
+        while True:
+            time.sleep(1)
+            for recipients, message in messages[seen:]:
+                print(f"--- to {', '.join(recipients)}\n{message}")
+            seen = len(messages)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Chunked reading and validation of historical weather data for bulk imports.
+
+read_entries() streams a CSV or NDJSON file of any size as DataFrames of
+WeatherEntry column values, chunk_size rows at a time. Columns are matched by
+name, ignoring case, spaces and underscores, so the files the app writes read
+back as they are: weather_forecast_data.csv (DateTime, Temperature, Humidity,
+WindSpeed, Description[, City]), /export CSV and /get_entries?format=ndjson.
+Coercion and validation are vectorized over the chunk. Rows with an
+unparseable datetime, a missing or non-numeric reading or no city are dropped
+and reported by line number instead of failing the import. As with
+/add_entry, an absent Humidity or WindSpeed column means 0. NDJSON is decoded a
+chunk at a time as one JSON array (with orjson when installed), about twice
+as fast as pandas.read_json.
+"""
+import bz2
+import gzip
+import lzma
+import os
+from itertools import islice
+
+from forecast_parser import decode_json
+
+# WeatherEntry column: accepted header names, normalised (lower case, no spaces or underscores)
+COLUMN_NAMES = {
+    'datetime': ('datetime', 'dttxt', 'timestamp', 'time'),
+    'temperature': ('temperature', 'temp'),
+    'humidity': ('humidity',),
+    'wind_speed': ('windspeed', 'wind'),
+    'description': ('description',),
+    'city': ('city',),
+    'source': ('source',),
+}
+NUMERIC_COLUMNS = ('temperature', 'humidity', 'wind_speed')
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson'}
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def detect_format(path):
+    """'csv' or 'ndjson' from the file extension (a trailing .gz/.bz2/.xz is ignored)"""
+    name, extension = os.path.splitext(path.lower())
+    if extension in OPENERS:
+        name, extension = os.path.splitext(name)
+    fmt = FORMATS.get(extension)
+    if fmt is None:
+        raise ValueError(f"Can't tell the format of {path}; pass --format csv or ndjson")
+    return fmt
+
+
+def match_columns(names):
+    """{WeatherEntry column: header in the file} for the headers that map to one"""
+    normalised = {str(name).lower().replace('_', '').replace(' ', ''): name for name in names}
+    matched = {}
+    for column, aliases in COLUMN_NAMES.items():
+        for alias in aliases:
+            if alias in normalised:
+                matched[column] = normalised[alias]
+                break
+    return matched
+
+
+def _datetimes(values):
+    import pandas as pd
+    try:
+        moments = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    except ValueError:
+        moments = None
+    if moments is None or moments.dtype == object:
+        # Mixed UTC offsets (or offsets and naive times): compare them as UTC
+        moments = pd.to_datetime(values, errors='coerce', format='ISO8601', utc=True)
+    if getattr(moments.dt, 'tz', None) is not None:
+        moments = moments.dt.tz_convert(None)
+    return moments
+
+
+def coerce_chunk(chunk, city=None, source='import', user_id=1, line_offset=1):
+    """(valid rows as WeatherEntry columns, {line number: reason} for the rows dropped)
+
+    `city` fills a missing or empty City column; `source` fills a missing Source column.
+    A row's file line is its index label plus line_offset.
+    """
+    import numpy as np
+    import pandas as pd
+
+    columns = match_columns(chunk.columns)
+    missing = [column for column in ('datetime', 'temperature') if column not in columns]
+    if missing:
+        raise ValueError(f"No {' or '.join(missing)} column (found {', '.join(map(str, chunk.columns))})")
+    if 'city' not in columns and not city:
+        raise ValueError('No City column; pass --city for the whole file')
+
+    rows = pd.DataFrame(index=chunk.index)
+    rows['user_id'] = user_id
+    rows['datetime'] = _datetimes(chunk[columns['datetime']])
+    for column in NUMERIC_COLUMNS:
+        if column in columns:
+            rows[column] = pd.to_numeric(chunk[columns[column]], errors='coerce').astype('float64')
+        else:
+            rows[column] = 0.0
+    descriptions = chunk[columns['description']] if 'description' in columns else pd.Series('', index=chunk.index)
+    rows['description'] = descriptions.fillna('').astype(str)
+    cities = chunk[columns['city']] if 'city' in columns else pd.Series(city, index=chunk.index)
+    cities = cities.where(cities.notna() & (cities.astype(str).str.strip() != ''), city)
+    rows['city'] = cities.astype(object).where(cities.notna(), None)
+    sources = chunk[columns['source']].fillna(source) if 'source' in columns else pd.Series(source, index=chunk.index)
+    rows['source'] = sources.astype(str)
+
+    reasons = pd.Series(None, index=chunk.index, dtype=object)
+    reasons[rows['city'].isna()] = 'no city'
+    for column in reversed(NUMERIC_COLUMNS):
+        reasons[~np.isfinite(rows[column])] = f'invalid {column}'
+    reasons[rows['datetime'].isna()] = 'invalid datetime'
+    bad = reasons.notna()
+    invalid = {}
+    if bad.any():
+        invalid = dict(zip((chunk.index[bad.to_numpy()] + line_offset).tolist(), reasons[bad].tolist()))
+    return rows[~bad], invalid
+
+
+def ndjson_chunks(path, chunk_size):
+    """A DataFrame indexed by line number for each chunk_size lines of an NDJSON file"""
+    import pandas as pd
+    opener = OPENERS.get(os.path.splitext(path.lower())[1], open)
+    first_line = 1
+    with opener(path, 'rb') as f:
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                return
+            numbers = [first_line + offset for offset, line in enumerate(lines) if line.strip()]
+            first_line += len(lines)
+            if not numbers:
+                continue
+            try:
+                records = decode_json(b'[' + b','.join(line for line in lines if line.strip()) + b']')
+            except ValueError:
+                raise ValueError(f'Invalid JSON between lines {numbers[0]} and {numbers[-1]}')
+            yield pd.DataFrame.from_records(records, index=numbers)
+
+
+def read_entries(path, fmt=None, chunk_size=100000, **options):
+    """(rows, invalid) pairs from coerce_chunk() for each chunk of a CSV or NDJSON file"""
+    import pandas as pd
+
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        # read_csv numbers the rows from 0 across chunks; line 1 is the header
+        with pd.read_csv(path, chunksize=chunk_size, skipinitialspace=True) as reader:
+            for chunk in reader:
+                yield coerce_chunk(chunk, line_offset=2, **options)
+    elif fmt == 'ndjson':
+        for chunk in ndjson_chunks(path, chunk_size):
+            yield coerce_chunk(chunk, line_offset=0, **options)
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}'")
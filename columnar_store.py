@@ -0,0 +1,199 @@
+"""
+Columnar in-memory store for the development app's weather entries.
+
+Each field lives in its own NumPy array (datetime64[ns], float64, and int32
+codes into an interned description table) that grows by doubling, so appends
+are amortised O(1) and a million entries take tens of MB instead of the
+hundreds a list of dicts needs. Rows are kept sorted by time. frame() returns
+a DataFrame over the live buffers without copying; any later mutation that
+would shift rows under that view copies the buffers first (copy-on-write),
+so the view stays a consistent snapshot. pandas is only imported by the
+methods that build or parse frames.
+"""
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+FLOAT_COLUMNS = ('temperature', 'humidity', 'wind_speed')
+
+
+class WeatherStore:
+    """Thread-safe, time-sorted columnar store of weather readings"""
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.Lock()
+        self._capacity = max(16, int(capacity))
+        self._size = 0
+        self._next_id = 0
+        self._shared = False
+        self._descriptions = []
+        self._description_codes = {}
+        self._allocate(self._capacity)
+        # Bumped by every mutation so renders and HTTP validators can tell when data changed
+        self.version = 0
+        self.modified = datetime.now(timezone.utc)
+
+    def _allocate(self, capacity):
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._datetime = np.empty(capacity, dtype='datetime64[ns]')
+        self._floats = {name: np.empty(capacity, dtype=np.float64) for name in FLOAT_COLUMNS}
+        self._description = np.empty(capacity, dtype=np.int32)
+        self._capacity = capacity
+
+    def _columns(self):
+        return [self._ids, self._datetime, self._description, *self._floats.values()]
+
+    def _reallocate(self, capacity):
+        """Move live rows into fresh buffers; outstanding frame() views keep the old ones"""
+        old = self._columns()
+        self._allocate(capacity)
+        for src, dst in zip(old, self._columns()):
+            dst[:self._size] = src[:self._size]
+        self._shared = False
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed > self._capacity:
+            capacity = self._capacity
+            while capacity < needed:
+                capacity *= 2
+            self._reallocate(capacity)
+        elif self._shared:
+            self._reallocate(self._capacity)
+
+    def _touch(self):
+        self.version += 1
+        self.modified = datetime.now(timezone.utc)
+
+    def _intern(self, description):
+        description = description or ''
+        code = self._description_codes.get(description)
+        if code is None:
+            code = self._description_codes[description] = len(self._descriptions)
+            self._descriptions.append(description)
+        return code
+
+    def __len__(self):
+        return self._size
+
+    def append(self, when, temperature, humidity, wind_speed, description=''):
+        """Insert one reading in time order; returns its id"""
+        when = _to_datetime64(when)
+        with self._lock:
+            n = self._size
+            in_order = n == 0 or when >= self._datetime[n - 1]
+            if in_order and n < self._capacity:
+                # Writes past the end never disturb an outstanding view
+                pos = n
+            else:
+                self._reserve(1)
+                pos = n if in_order else int(np.searchsorted(self._datetime[:n], when, side='right'))
+                for column in self._columns():
+                    column[pos + 1:n + 1] = column[pos:n]
+            entry_id = self._next_id
+            self._next_id += 1
+            self._ids[pos] = entry_id
+            self._datetime[pos] = when
+            self._floats['temperature'][pos] = temperature
+            self._floats['humidity'][pos] = humidity
+            self._floats['wind_speed'][pos] = wind_speed
+            self._description[pos] = self._intern(description)
+            self._size = n + 1
+            self._touch()
+            return entry_id
+
+    def replace(self, datetimes, temperature, humidity, wind_speed, descriptions):
+        """Swap the whole contents for the given columns in one vectorised load"""
+        import pandas as pd
+
+        when = pd.to_datetime(pd.Series(datetimes)).to_numpy(dtype='datetime64[ns]')
+        order = np.argsort(when, kind='stable')
+        n = len(when)
+        with self._lock:
+            self._descriptions = []
+            self._description_codes = {}
+            codes = np.fromiter((self._intern(d) for d in descriptions), dtype=np.int32, count=n)
+            self._size = 0
+            self._allocate(max(16, 1 << max(n - 1, 0).bit_length()))
+            self._ids[:n] = np.arange(self._next_id, self._next_id + n)
+            self._next_id += n
+            self._datetime[:n] = when[order]
+            self._floats['temperature'][:n] = np.asarray(temperature, dtype=np.float64)[order]
+            self._floats['humidity'][:n] = np.asarray(humidity, dtype=np.float64)[order]
+            self._floats['wind_speed'][:n] = np.asarray(wind_speed, dtype=np.float64)[order]
+            self._description[:n] = codes[order]
+            self._size = n
+            self._shared = False
+            self._touch()
+
+    def delete(self, entry_id):
+        """Remove a reading by id; returns False if it doesn't exist"""
+        with self._lock:
+            n = self._size
+            matches = np.flatnonzero(self._ids[:n] == entry_id)
+            if not len(matches):
+                return False
+            pos = int(matches[0])
+            if self._shared:
+                self._reallocate(self._capacity)
+            for column in self._columns():
+                column[pos:n - 1] = column[pos + 1:n]
+            self._size = n - 1
+            self._touch()
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._descriptions = []
+            self._description_codes = {}
+            self._allocate(16)
+            self._shared = False
+            self._touch()
+
+    def frame(self):
+        """Zero-copy DataFrame snapshot (DateTime, Temperature, Humidity, WindSpeed, Description codes)"""
+        import pandas as pd
+
+        with self._lock:
+            n = self._size
+            self._shared = True
+            return pd.DataFrame({
+                'DateTime': self._datetime[:n],
+                'Temperature': self._floats['temperature'][:n],
+                'Humidity': self._floats['humidity'][:n],
+                'WindSpeed': self._floats['wind_speed'][:n],
+                'Description': pd.Categorical.from_codes(self._description[:n], list(self._descriptions))
+                if n else pd.Categorical([])
+            }, copy=False)
+
+    def records(self):
+        """Entries as the list of dicts /get_entries serves, in time order"""
+        with self._lock:
+            n = self._size
+            ids = self._ids[:n].tolist()
+            stamps = np.datetime_as_string(self._datetime[:n], unit='s')
+            temperature = self._floats['temperature'][:n].tolist()
+            humidity = self._floats['humidity'][:n].tolist()
+            wind_speed = self._floats['wind_speed'][:n].tolist()
+            descriptions = [self._descriptions[code] for code in self._description[:n].tolist()]
+        return [
+            {'id': i, 'DateTime': stamp.replace('T', ' '), 'Temperature': t, 'Humidity': h,
+             'WindSpeed': w, 'Description': d}
+            for i, stamp, t, h, w, d in zip(ids, stamps.tolist(), temperature, humidity, wind_speed, descriptions)
+        ]
+
+    def nbytes(self):
+        """Bytes held by the column buffers"""
+        with self._lock:
+            return sum(column.nbytes for column in self._columns())
+
+
+def _to_datetime64(value):
+    """Fast path for ISO strings and datetimes, pandas for anything else it can parse"""
+    try:
+        return np.datetime64(value, 'ns')
+    except (ValueError, TypeError):
+        import pandas as pd
+        return np.datetime64(pd.Timestamp(value).to_datetime64(), 'ns')
@@ -0,0 +1,161 @@
+"""
+Persistent matplotlib renderer for the dashboard plots.
+
+Uses the object-oriented Figure/Agg canvas API so no pyplot global state is
+touched. Figures and axes are built once and kept in a small pool; a render
+only swaps the Line2D data and rescales the axes, and each figure is used by
+one thread at a time. matplotlib is imported when the first figure is built,
+and warm_up() does that (plus the font loading of a first draw) ahead of the
+first request.
+"""
+import io
+import queue
+import threading
+import time
+
+import numpy as np
+
+# (column, title, y label, colour)
+SERIES = (
+    ('Temperature', 'Temperature Forecast Trend', 'Temperature (°C)', 'red'),
+    ('Humidity', 'Humidity Forecast Trend', 'Humidity (%)', 'blue'),
+    ('WindSpeed', 'Wind Speed Forecast Trend', 'Wind Speed (m/s)', 'green'),
+)
+
+# Markers stop being readable (and get very slow to draw) past this many points
+MARKER_LIMIT = 500
+
+# Drawn to the Agg buffer and encoded from it, so the two steps can be timed apart
+RASTER_FORMATS = ('png', 'webp')
+
+
+class _DashboardFigure:
+    """One pre-built three-panel figure"""
+
+    def __init__(self, figsize, dpi):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.lines = []
+        self.data_key = None
+        axes = self.figure.subplots(len(SERIES), 1)
+        for ax, (_, title, ylabel, colour) in zip(axes, SERIES):
+            line, = ax.plot([], [], marker='o', color=colour, linewidth=2)
+            ax.set_title(title, fontsize=14, fontweight='bold')
+            ax.set_ylabel(ylabel)
+            ax.grid(True, alpha=0.3)
+            ax.xaxis_date()
+            self.lines.append(line)
+        axes[-1].set_xlabel('Date & Time')
+        self.axes = axes
+        self._laid_out = False
+
+    def update(self, x, columns, key=None):
+        """Swap in new data; skipped when the caller's data key is unchanged"""
+        if key is not None and key == self.data_key:
+            return
+        marker = 'o' if len(x) <= MARKER_LIMIT else ''
+        for ax, line, y in zip(self.axes, self.lines, columns):
+            line.set_data(x, y)
+            line.set_marker(marker)
+            ax.relim()
+            ax.autoscale_view()
+        if not self._laid_out and len(x):
+            # Lay out once with real tick labels, then keep the geometry
+            self.figure.tight_layout()
+            self._laid_out = True
+        self.data_key = key
+
+    def to_bytes(self, fmt='png', timings=None):
+        """Image bytes; fills timings['draw'] and timings['encode'] (seconds) when given a dict"""
+        buf = io.BytesIO()
+        start = time.perf_counter()
+        if fmt in RASTER_FORMATS:
+            import matplotlib.image as mimage
+
+            self.canvas.draw()
+            drawn = time.perf_counter()
+            mimage.imsave(buf, self.canvas.buffer_rgba(), format=fmt, dpi=self.figure.dpi)
+        else:
+            # Vector backends draw while they write, so it all counts as drawing
+            self.figure.savefig(buf, format=fmt)
+            drawn = time.perf_counter()
+        if timings is not None:
+            timings['draw'] = drawn - start
+            timings['encode'] = time.perf_counter() - drawn
+        return buf.getvalue()
+
+
+class DashboardRenderer:
+    """Thread-safe pool of persistent dashboard figures"""
+
+    def __init__(self, pool_size=4, figsize=(14, 10), dpi=100):
+        self.pool_size = max(1, int(pool_size))
+        self.figsize = figsize
+        self.dpi = dpi
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                return _DashboardFigure(self.figsize, self.dpi)
+        return self._idle.get()
+
+    def warm_up(self):
+        """Import matplotlib and draw one pooled figure so the first request doesn't pay for it"""
+        fig = self._acquire()
+        try:
+            fig.to_bytes('png')
+        finally:
+            self._idle.put(fig)
+
+    def render(self, df, key=None, fmt='png', timings=None):
+        """Render a DataFrame with DateTime/Temperature/Humidity/WindSpeed columns to image bytes"""
+        return self.render_series(*frame_series(df), key=key, fmt=fmt, timings=timings)
+
+    def render_series(self, when, columns, key=None, fmt='png', timings=None):
+        """Render datetime64 x values and one float array per SERIES entry to image bytes
+
+        Pass a dict as `timings` to get the draw and encode seconds back in it.
+        """
+        import matplotlib.dates as mdates
+
+        x = mdates.date2num(when)
+        fig = self._acquire()
+        try:
+            fig.update(x, columns, key=key)
+            return fig.to_bytes(fmt, timings)
+        finally:
+            self._idle.put(fig)
+
+
+def frame_series(df):
+    """(datetime64 array, [float arrays in SERIES order]) from a dashboard DataFrame"""
+    when = df['DateTime'].to_numpy(dtype='datetime64[ns]')
+    return when, [np.asarray(df[name], dtype=float) for name, _, _, _ in SERIES]
+
+
+def chart_payload(df):
+    """Columnar series for drawing the dashboard in the browser
+
+    x holds epoch milliseconds; each SERIES entry carries its title, axis label,
+    colour and values, with NaN sent as null.
+    """
+    when, columns = frame_series(df)
+    series = []
+    for (name, title, ylabel, colour), values in zip(SERIES, columns):
+        values = np.round(values, 2)
+        series.append({
+            'name': name, 'title': title, 'ylabel': ylabel, 'color': colour,
+            'values': [None if np.isnan(v) else v for v in values.tolist()]
+        })
+    return {'x': when.astype('datetime64[ms]').astype(np.int64).tolist(), 'series': series}
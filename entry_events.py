@@ -0,0 +1,117 @@
+"""
+In-process publish/subscribe of entry changes for the dashboard's live stream.
+
+publish() encodes each event once as a server-sent event and appends the
+same string to a short history and to every subscriber's buffer. Buffers are
+bounded: a client that falls max_buffer events behind has its buffer dropped
+and gets one 'reload' event in its place, so a stalled connection never holds
+more than max_buffer shared strings. Reconnecting clients send Last-Event-ID
+and are replayed from the history when it still reaches back that far, or
+told to reload otherwise (including after a restart, since event ids carry a
+per-process token). Only subscribers in the publishing process see events,
+which is every client of a single waitress process.
+"""
+import json
+import threading
+from collections import deque
+
+
+class TooManySubscribers(Exception):
+    """Raised by subscribe() when max_subscribers streams are already open"""
+
+
+def format_event(event_id, event, data):
+    """A server-sent event block with a JSON payload"""
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Subscription:
+    """One client's bounded queue of encoded events"""
+
+    def __init__(self, broker, backlog):
+        self._broker = broker
+        self._events = deque(backlog)
+        self.closed = False
+
+    def next(self, timeout):
+        """Encoded events waiting for this client, blocking up to timeout; [] when none arrived"""
+        with self._broker._cond:
+            self._broker._cond.wait_for(lambda: self._events or self.closed, timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def close(self):
+        self._broker._unsubscribe(self)
+
+
+class EventBroker:
+    """Fans published events out to subscriber buffers of at most max_buffer events each"""
+
+    def __init__(self, token, max_buffer=256, history=1024, max_subscribers=8):
+        self.token = token
+        self.max_buffer = max(1, int(max_buffer))
+        self.max_subscribers = max_subscribers
+        self._cond = threading.Condition()
+        self._history = deque(maxlen=max(1, int(history)))    # (sequence, event name, encoded event)
+        self._sequence = 0
+        self._subscribers = set()
+        self._stats = {'published': 0, 'overflows': 0, 'replayed': 0, 'rejected': 0}
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event, data):
+        """Send an event to every subscriber; returns its id"""
+        with self._cond:
+            self._sequence += 1
+            event_id = f'{self.token}-{self._sequence}'
+            encoded = format_event(event_id, event, data)
+            self._history.append((self._sequence, event, encoded))
+            for subscription in self._subscribers:
+                if len(subscription._events) >= self.max_buffer:
+                    # Too far behind to catch up event by event; start it over from /get_entries
+                    subscription._events.clear()
+                    subscription._events.append(format_event(event_id, 'reload', {}))
+                    self._stats['overflows'] += 1
+                else:
+                    subscription._events.append(encoded)
+            self._stats['published'] += 1
+            self._cond.notify_all()
+            return event_id
+
+    def subscribe(self, last_event_id=None):
+        """A new Subscription, first replaying what came after last_event_id (or a 'reload' if that's gone)"""
+        with self._cond:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._stats['rejected'] += 1
+                raise TooManySubscribers(f'At most {self.max_subscribers} live update streams are open, retry later')
+            subscription = Subscription(self, self._backlog(last_event_id))
+            self._subscribers.add(subscription)
+            return subscription
+
+    def _backlog(self, last_event_id):
+        if not last_event_id:
+            return []
+        token, _, sequence = last_event_id.rpartition('-')
+        oldest = self._history[0][0] if self._history else self._sequence + 1
+        if token == self.token and sequence.isdigit() and oldest - 1 <= int(sequence) <= self._sequence:
+            missed = [(event, encoded) for number, event, encoded in self._history if number > int(sequence)]
+            # A reload supersedes everything before and after it
+            if len(missed) <= self.max_buffer and all(event != 'reload' for event, _ in missed):
+                self._stats['replayed'] += len(missed)
+                return [encoded for _, encoded in missed]
+        return [format_event(f'{self.token}-{self._sequence}', 'reload', {})]
+
+    def _unsubscribe(self, subscription):
+        with self._cond:
+            subscription.closed = True
+            subscription._events.clear()
+            self._subscribers.discard(subscription)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {**self._stats, 'subscribers': len(self._subscribers), 'max_subscribers': self.max_subscribers,
+                    'buffered_events': sum(len(subscription._events) for subscription in self._subscribers),
+                    'max_buffer': self.max_buffer, 'last_event_id': f'{self.token}-{self._sequence}'}
@@ -0,0 +1,158 @@
+"""
+Streaming and on-disk exports of weather entries.
+
+CSV is streamed: rows come off the database cursor in batches and leave as
+text chunks, so an export of any size holds one batch in memory and never
+touches the disk. Parquet writes its footer last and can't be streamed, so
+ExportStore builds those files in a background thread the first time they are
+requested, hands the same file to repeat requests for the same data, and
+deletes files once they pass the retention limits.
+"""
+import csv
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ('DateTime', 'City', 'Temperature', 'Humidity', 'WindSpeed', 'Description', 'Source')
+
+
+def batched(rows, size):
+    """Lists of up to `size` items from an iterator"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def csv_chunks(batches, columns=EXPORT_COLUMNS):
+    """CSV text: the header, then one chunk per batch of row tuples"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('DateTime', pa.timestamp('us')),
+        ('City', pa.string()),
+        ('Temperature', pa.float64()),
+        ('Humidity', pa.float64()),
+        ('WindSpeed', pa.float64()),
+        ('Description', pa.string()),
+        ('Source', pa.string()),
+    ])
+
+
+def write_parquet(batches, path, compression='zstd'):
+    """Write batches of EXPORT_COLUMNS row tuples to `path`, one row group per batch
+
+    The file appears atomically once complete. Needs pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow)')
+    schema = parquet_schema()
+    partial = f'{path}.tmp'
+    rows = 0
+    try:
+        with pq.ParquetWriter(partial, schema, compression=compression) as writer:
+            for batch in batches:
+                columns = list(zip(*batch))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+                ))
+                rows += len(batch)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return rows
+
+
+class ExportStore:
+    """Export files built on demand in `directory`, kept max_age seconds and at most max_files"""
+
+    def __init__(self, directory, max_age=86400, max_files=20):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_files = max(1, int(max_files))
+        self._building = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export')
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get_or_build(self, name, build):
+        """Path of the finished export `name`, or None while build(path) runs in the background
+
+        The build starts on the first call. If it failed, the error is raised
+        once and the next call starts it again.
+        """
+        path = self.path(name)
+        with self._lock:
+            future = self._building.get(name)
+            if future is None:
+                if os.path.exists(path):
+                    return path
+                os.makedirs(self.directory, exist_ok=True)
+                self._building[name] = self._executor.submit(self._build, path, build)
+                return None
+            if not future.done():
+                return None
+            del self._building[name]
+        future.result()
+        return path
+
+    def _build(self, path, build):
+        start = time.perf_counter()
+        build(path)
+        logger.info(f'Built export {os.path.basename(path)} in {time.perf_counter() - start:.2f}s')
+        self.prune()
+
+    def prune(self):
+        """Delete exports older than max_age, then the oldest beyond max_files; returns how many"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        now = time.time()
+        files = []
+        for name in names:
+            path = self.path(name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        files.sort(reverse=True)
+        removed = 0
+        kept = 0
+        for mtime, path in files:
+            # Partial files of running builds are only removed once clearly abandoned
+            expired = now - mtime > self.max_age
+            if not expired and (path.endswith('.tmp') or kept < self.max_files):
+                kept += not path.endswith('.tmp')
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -0,0 +1,167 @@
+"""
+Response cache in front of the OpenWeatherMap forecast fetch.
+
+Forecasts are keyed on (city, units). By default an entry expires at the next
+3-hour forecast step boundary, when the upstream model can next publish new
+data. After that it may still be served for a further stale window while a
+background refresh runs (stale-while-revalidate). Refreshes send the stored
+ETag / Last-Modified validators so an unchanged forecast costs a 304.
+Entries can optionally be persisted to a JSON file so they survive restarts.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from forecast_parser import decode_json
+
+logger = logging.getLogger(__name__)
+
+# The 5 day / 3 hour forecast publishes a new step every three hours
+FORECAST_STEP = 3 * 3600
+
+
+def next_step_boundary(now, step=FORECAST_STEP):
+    """Epoch seconds of the next forecast step after `now`"""
+    return (int(now) // step + 1) * step
+
+
+class ForecastCache:
+    """TTL cache with stale-while-revalidate wrapping an OpenWeatherClient"""
+
+    def __init__(self, client, ttl=None, stale_ttl=FORECAST_STEP, path=None):
+        self.client = client
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.path = path
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.errors = 0
+        if path:
+            self._load()
+
+    @staticmethod
+    def _key(city, units):
+        return f'{city.strip().lower()}|{units}'
+
+    def _expiry(self, now):
+        if self.ttl is not None:
+            return now + self.ttl
+        return next_step_boundary(now)
+
+    def fetch_forecast(self, city, units='metric', api_key=None):
+        """Drop-in replacement for OpenWeatherClient.fetch_forecast"""
+        key = self._key(city, units)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now < entry['expires_at']:
+                self.hits += 1
+                return entry['data']
+            if entry and now < entry['expires_at'] + self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._background_refresh,
+                                     args=(key, city, units, api_key), daemon=True).start()
+                return entry['data']
+            self.misses += 1
+        try:
+            return self._refresh(key, city, units, api_key, entry)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def fetch_many(self, cities, units='metric', api_key=None):
+        """Drop-in replacement for OpenWeatherClient.fetch_many"""
+        return self.client.fetch_many(cities, units, api_key, fetch=self.fetch_forecast)
+
+    def _background_refresh(self, key, city, units, api_key):
+        try:
+            with self._lock:
+                entry = self._entries.get(key)
+            self._refresh(key, city, units, api_key, entry)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning(f'Background forecast refresh failed for {city}: {e}')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh(self, key, city, units, api_key, entry):
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        response = self.client.fetch_forecast_response(city, units, api_key, headers=headers or None)
+        now = time.time()
+        if response.status_code == 304 and entry:
+            data = entry['data']
+            with self._lock:
+                self.revalidated += 1
+        else:
+            data = decode_json(response.content)
+        with self._lock:
+            self._entries[key] = {
+                'data': data,
+                'fetched_at': now,
+                'expires_at': self._expiry(now),
+                'etag': response.headers.get('ETag') or (entry or {}).get('etag'),
+                'last_modified': response.headers.get('Last-Modified') or (entry or {}).get('last_modified')
+            }
+            self._save()
+        return data
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+            logger.info(f'Loaded {len(self._entries)} cached forecasts from {self.path}')
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f'Ignoring unreadable forecast cache {self.path}: {e}')
+
+    def _save(self):
+        """Persist entries; caller holds the lock"""
+        if not self.path:
+            return
+        now = time.time()
+        # Nothing past its stale window will ever be served again
+        self._entries = {k: v for k, v in self._entries.items()
+                         if now < v['expires_at'] + self.stale_ttl}
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f'Could not persist forecast cache to {self.path}: {e}')
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'errors': self.errors,
+                'hit_rate': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+            }
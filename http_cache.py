@@ -0,0 +1,71 @@
+"""
+Conditional-GET support for the dashboard image and chart data endpoints.
+
+Responses are validated by the data version they were built from. Versions
+are per-process counters, so ETags also carry a token unique to this process
+and a restart can never make an old image look current. Responses are sent
+with Cache-Control: no-cache, so browsers keep the body and revalidate it on
+every view; an unchanged dashboard then costs an empty 304.
+"""
+import gzip
+import os
+import time
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+# Served format -> (format passed to savefig, Content-Type)
+IMAGE_FORMATS = {
+    'png': ('png', 'image/png'),
+    'svg': ('svgz', 'image/svg+xml'),  # rendered gzipped, sent as Content-Encoding: gzip
+    'webp': ('webp', 'image/webp'),
+}
+
+PROCESS_TOKEN = f'{int(time.time()):x}.{os.getpid():x}'
+PROCESS_STARTED = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _sends_gzip(fmt):
+    return IMAGE_FORMATS[fmt][0] == 'svgz' and 'gzip' in request.accept_encodings
+
+
+def version_etag(*version):
+    """ETag for a response built from `version` (one or more key parts)"""
+    return f'{PROCESS_TOKEN}-' + '-'.join(str(part) for part in version)
+
+
+def image_etag(fmt, *version):
+    """ETag for an image of `fmt` rendered at `version`"""
+    encoding = '-gz' if _sends_gzip(fmt) else ''
+    return f'{version_etag(*version)}-{fmt}{encoding}'
+
+
+def cacheable(response, etag, last_modified):
+    """Attach validators to a response and make clients revalidate before reuse"""
+    response.set_etag(etag)
+    response.last_modified = max(last_modified, PROCESS_STARTED)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def not_modified(etag, last_modified):
+    """A 304 response if the request's validators still match, else None"""
+    response = cacheable(Response(status=200), etag, last_modified)
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    return None
+
+
+def image_response(data, fmt, etag, last_modified):
+    """Raw image bytes from savefig(format=IMAGE_FORMATS[fmt][0]) with caching headers"""
+    render_format, mimetype = IMAGE_FORMATS[fmt]
+    response = Response(mimetype=mimetype)
+    if render_format == 'svgz':
+        if _sends_gzip(fmt):
+            response.content_encoding = 'gzip'
+        else:
+            data = gzip.decompress(data)
+    response.set_data(data)
+    return cacheable(response, etag, last_modified)
@@ -0,0 +1,85 @@
+"""
+Bulk-import historical weather readings from CSV or NDJSON files
+Usage: python import_entries.py data.csv [more.ndjson ...] [--city Bengaluru] [--chunk-size 100000]
+Reads weather_forecast_data.csv, /export CSV and /get_entries?format=ndjson files as they are
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bulk_import import read_entries
+from app_production import app, db, init_db, import_frame, refresh_rollups_span, DEFAULT_USER_ID
+
+# Invalid rows listed individually before the rest are only counted
+MAX_REPORTED_ERRORS = 10
+
+def import_file(path, args, spans, stats):
+    """Load one file, a committed transaction per chunk; returns rows imported"""
+    imported = 0
+    for rows, invalid in read_entries(path, fmt=args.format, chunk_size=args.chunk_size, city=args.city,
+                                      source=args.source, user_id=DEFAULT_USER_ID):
+        for line, reason in invalid.items():
+            if stats['invalid'] < MAX_REPORTED_ERRORS:
+                print(f"  ! {os.path.basename(path)} line {line}: {reason}")
+            stats['invalid'] += 1
+        if invalid and args.strict:
+            raise ValueError(f"{len(invalid)} invalid rows in {path}; nothing from this chunk on was imported")
+        if rows.empty:
+            continue
+        import_frame(rows)
+        db.session.commit()
+        imported += len(rows)
+        stats['rows'] += len(rows)
+        # Rollups are brought up to date once per city at the end rather than per chunk
+        for city, first, last in rows.groupby('city', sort=False)['datetime'].agg(['min', 'max']).itertuples():
+            known = spans.get(city)
+            spans[city] = (min(known[0], first), max(known[1], last)) if known else (first, last)
+        elapsed = time.perf_counter() - stats['start']
+        print(f"  {stats['rows']:>12,} rows  {stats['rows'] / elapsed:>10,.0f} rows/s", flush=True)
+    return imported
+
+def main():
+    """Import every file given on the command line"""
+    parser = argparse.ArgumentParser(description='Bulk-import historical weather readings')
+    parser.add_argument('paths', nargs='+', help='CSV or NDJSON files (optionally .gz); format from the extension')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help='override the format of every file')
+    parser.add_argument('--city', help='city for rows without one (required when a file has no City column)')
+    parser.add_argument('--source', default='import', help="source of rows without one (default: import; "
+                                                           "'api' rows are upserted like fetched forecasts)")
+    parser.add_argument('--chunk-size', type=int, default=100000, help='rows per chunk and transaction')
+    parser.add_argument('--strict', action='store_true', help='stop at the first chunk with an invalid row')
+    args = parser.parse_args()
+
+    stats = {'rows': 0, 'invalid': 0, 'start': time.perf_counter()}
+    spans = {}
+    init_db()
+    with app.app_context():
+        for path in args.paths:
+            print(f"Importing {path}...")
+            imported = import_file(path, args, spans, stats)
+            print(f"✓ {imported:,} rows from {path}")
+        loaded = time.perf_counter() - stats['start']
+
+        print(f"Updating rollups for {len(spans)} cities...")
+        for city, (first, last) in spans.items():
+            refresh_rollups_span(DEFAULT_USER_ID, city, first.to_pydatetime(), last.to_pydatetime())
+            db.session.commit()
+    elapsed = time.perf_counter() - stats['start']
+    skipped = f" ({stats['invalid']:,} invalid rows skipped)" if stats['invalid'] else ''
+    print(f"✓ Imported {stats['rows']:,} rows{skipped} in {elapsed:.1f}s "
+          f"({stats['rows'] / elapsed:,.0f} rows/s; {stats['rows'] / loaded:,.0f} rows/s before rollups)")
+    print("Running servers keep serving cached dashboards until their next write or restart")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"Error importing entries: {e}")
+        sys.exit(1)
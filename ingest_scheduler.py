@@ -0,0 +1,173 @@
+"""
+Periodic forecast ingestion for a configured list of cities.
+
+Runs on an APScheduler BackgroundScheduler with jitter so several deployments
+don't hit the API in lockstep; unless one is passed in, start() imports and
+creates it, so processes that never schedule anything don't load APScheduler.
+Only one process per instance folder ingests: the first to take the leader
+lock file keeps it until it exits, and the others check again on every tick. Cities that fail are backed
+off exponentially (skipping 1, 3, 7 runs...) instead of retried every run.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures stop doubling the skip after this many runs
+MAX_SKIPPED_RUNS = 8
+
+
+class LeaderLock:
+    """Non-blocking, process-lifetime exclusive lock on a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        if self._file is not None:
+            return True
+        handle = open(self.path, 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        self._file = handle
+        return True
+
+
+class IngestScheduler:
+    """Refreshes `cities` every interval via fetch_many() and hands successes to ingest()"""
+
+    def __init__(self, fetch_many, ingest, cities, interval_minutes=180,
+                 jitter_seconds=300, lock_path=None, scheduler=None):
+        self.scheduler = scheduler
+        self.fetch_many = fetch_many
+        self.ingest = ingest
+        self.cities = list(cities)
+        self.interval_minutes = interval_minutes
+        self.jitter_seconds = jitter_seconds
+        self.lock = LeaderLock(lock_path) if lock_path else None
+        self._failures = {}
+        self._skip = {}
+        self._run_lock = threading.Lock()
+        self._scheduler_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._status = {
+            'last_run': None,
+            'last_duration_seconds': None,
+            'last_rows_ingested': 0,
+            'last_error': None,
+            'total_runs': 0,
+            'total_rows_ingested': 0
+        }
+
+    def start(self):
+        """Schedule the job (first run right away); a no-op without cities or when already running"""
+        if self._started or not self.cities:
+            return
+        # Called from a before_request hook, so concurrent first requests race to get here
+        with self._start_lock:
+            if self._started:
+                return
+            self.background().add_job(
+                self.run_once, 'interval', minutes=self.interval_minutes, jitter=self.jitter_seconds,
+                id='scheduled_api_fetch', max_instances=1, coalesce=True, next_run_time=datetime.now()
+            )
+            self._started = True
+        logger.info(f'Scheduled ingestion of {len(self.cities)} cities every {self.interval_minutes} minutes')
+
+    def background(self):
+        """The running scheduler, created on first use; other periodic jobs can be added to it too"""
+        with self._scheduler_lock:
+            if self.scheduler is None:
+                from apscheduler.schedulers.background import BackgroundScheduler
+                self.scheduler = BackgroundScheduler()
+            if not self.scheduler.running:
+                self.scheduler.start()
+        return self.scheduler
+
+    def _due_cities(self):
+        due = []
+        for city in self.cities:
+            if self._skip.get(city, 0) > 0:
+                self._skip[city] -= 1
+            else:
+                due.append(city)
+        return due
+
+    def _record(self, result):
+        if result.error:
+            failures = self._failures.get(result.city, 0) + 1
+            self._failures[result.city] = failures
+            self._skip[result.city] = min(2 ** (failures - 1), MAX_SKIPPED_RUNS) - 1
+            logger.warning(f'Scheduled fetch failed for {result.city} ({failures} in a row): {result.error}')
+        else:
+            self._failures.pop(result.city, None)
+            self._skip.pop(result.city, None)
+
+    def run_once(self):
+        """One ingestion pass; returns rows ingested, or None when another process is leader"""
+        if self.lock and not self.lock.acquire():
+            return None
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        start = time.perf_counter()
+        rows = 0
+        error = None
+        try:
+            results = self.fetch_many(self._due_cities())
+            for result in results:
+                self._record(result)
+            successes = [result for result in results if not result.error]
+            if successes:
+                rows = self.ingest(successes)
+        except Exception as e:
+            error = str(e)
+            logger.error(f'Scheduled ingestion failed: {error}')
+        finally:
+            duration = time.perf_counter() - start
+            self._status.update({
+                'last_run': datetime.now().isoformat(timespec='seconds'),
+                'last_duration_seconds': round(duration, 3),
+                'last_rows_ingested': rows,
+                'last_error': error
+            })
+            self._status['total_runs'] += 1
+            self._status['total_rows_ingested'] += rows
+            self._run_lock.release()
+        return rows
+
+    def status(self):
+        job = self.scheduler.get_job('scheduled_api_fetch') if self._started else None
+        return {
+            **self._status,
+            'enabled': self._started,
+            'leader': self.lock.held if self.lock else True,
+            'cities': self.cities,
+            'interval_minutes': self.interval_minutes,
+            'next_run': job.next_run_time.isoformat(timespec='seconds') if job and job.next_run_time else None,
+            'failing_cities': {
+                city: {'consecutive_failures': count, 'runs_to_skip': self._skip.get(city, 0)}
+                for city, count in self._failures.items()
+            }
+        }
@@ -15,7 +15,7 @@ load_dotenv()
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app_production import app, db
+from app_production import app, db, upgrade_schema
 
 def init_db():
     """Initialize the database"""
@@ -26,6 +26,8 @@ def init_db():
             # Create all tables
             db.create_all()
             print("✓ Database tables created successfully")
+            upgrade_schema()
+            print("✓ Database schema up to date")
             print(f"✓ Database file: {instance_path}/weather_dashboard.db")
     except Exception as e:
         print(f"Error: {e}")
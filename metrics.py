@@ -0,0 +1,196 @@
+"""
+Request and phase timing exposed in the Prometheus text format.
+
+Metrics.init_app() times every request through before/after request hooks and
+records count, latency histogram and errors per route (the URL rule, so
+/delete_entry/<int:entry_id> is one series, not one per id). The app's
+routes report failures as 200 responses with {"status": "error"}, so those
+count as errors along with 5xx responses. span(phase) times one step of the
+work (database query, DataFrame build, draw, encode, upstream API call) into
+a per-phase histogram. A disabled Metrics registers no hooks and span()
+returns a shared no-op, so switching it off costs nothing per request.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+# Upper bounds in seconds, from a cache hit to a slow upstream fetch
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Error bodies are small; larger JSON responses are never scanned
+_ERROR_MARKER = b'"status":"error"'
+_ERROR_BODY_LIMIT = 4096
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class _Span:
+    __slots__ = ('_metrics', '_phase', '_start')
+
+    def __init__(self, metrics, phase):
+        self._metrics = metrics
+        self._phase = phase
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe_phase(self._phase, time.perf_counter() - self._start)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Thread-safe counters and histograms for a Flask app, rendered by render()"""
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS, prefix='weather'):
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._requests = {}     # (route, method, status) -> count
+        self._errors = {}       # (route, method) -> count
+        self._latency = {}      # (route, method) -> _Histogram
+        self._phases = {}       # (phase,) -> _Histogram
+        self._in_flight = 0
+        self._started = time.time()
+
+    def init_app(self, app):
+        """Time every request of `app`; a no-op when disabled"""
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def span(self, phase):
+        """Context manager timing one phase of the work"""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, phase)
+
+    def _observe(self, histograms, key, seconds):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = _Histogram(len(self.buckets) + 1)
+        histogram.counts[bisect_left(self.buckets, seconds)] += 1
+        histogram.sum += seconds
+        histogram.count += 1
+
+    def observe_phase(self, phase, seconds):
+        """Record a phase timed elsewhere (e.g. in a worker process)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._observe(self._phases, (phase,), seconds)
+
+    def observe_request(self, route, method, status, seconds, error=False):
+        with self._lock:
+            key = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if error:
+                self._errors[(route, method)] = self._errors.get((route, method), 0) + 1
+            self._observe(self._latency, (route, method), seconds)
+
+    def _before_request(self):
+        g._metrics_start = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+
+    def _after_request(self, response):
+        start = g.get('_metrics_start')
+        if start is None:
+            return response
+        status = response.status_code
+        error = status >= 500
+        body = response.response
+        # jsonify() bodies are a one-item list; streams and files are left alone
+        if not error and type(body) is list and len(body) == 1 and len(body[0]) <= _ERROR_BODY_LIMIT:
+            error = _ERROR_MARKER in body[0]
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        # Streamed responses are timed to the first byte
+        self.observe_request(route, request.method, status, time.perf_counter() - start, error)
+        return response
+
+    def _teardown_request(self, exc):
+        if g.pop('_metrics_start', None) is not None:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _histogram_lines(self, name, label_names, histograms):
+        lines = []
+        bounds = [_number(bound) for bound in self.buckets] + ['+Inf']
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                le = 'le="' + bound + '"'
+                lines.append(f'{name}_bucket{_labels(label_names, key, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, key)} {_number(histogram.sum)}')
+            lines.append(f'{name}_count{_labels(label_names, key)} {histogram.count}')
+        return lines
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        p = self.prefix
+        with self._lock:
+            lines = [
+                f'# HELP {p}_http_requests_total Requests served, by route, method and status code.',
+                f'# TYPE {p}_http_requests_total counter',
+                *(f'{p}_http_requests_total{_labels(("route", "method", "status"), key)} {count}'
+                  for key, count in sorted(self._requests.items())),
+                f'# HELP {p}_http_request_errors_total Requests answered with a 5xx or a {{"status": "error"}} body.',
+                f'# TYPE {p}_http_request_errors_total counter',
+                *(f'{p}_http_request_errors_total{_labels(("route", "method"), key)} {count}'
+                  for key, count in sorted(self._errors.items())),
+                f'# HELP {p}_http_request_duration_seconds Time from request start to response (first byte when streamed).',
+                f'# TYPE {p}_http_request_duration_seconds histogram',
+                *self._histogram_lines(f'{p}_http_request_duration_seconds', ('route', 'method'), self._latency),
+                f'# HELP {p}_phase_duration_seconds Time spent in each phase of request and background work.',
+                f'# TYPE {p}_phase_duration_seconds histogram',
+                *self._histogram_lines(f'{p}_phase_duration_seconds', ('phase',), self._phases),
+                f'# HELP {p}_http_requests_in_flight Requests currently being handled.',
+                f'# TYPE {p}_http_requests_in_flight gauge',
+                f'{p}_http_requests_in_flight {self._in_flight}',
+                f'# HELP {p}_process_start_time_seconds Start time of the process since the Unix epoch.',
+                f'# TYPE {p}_process_start_time_seconds gauge',
+                f'{p}_process_start_time_seconds {_number(self._started)}',
+            ]
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,82 @@
+"""
+EXPLAIN QUERY PLAN checks for the queries behind the endpoints (SQLite only).
+
+Shared by tests/test_query_plans.py and benchmarks/explain_queries.py so the
+two can't drift apart. index_ordered_queries() must each be answered by an
+index search in the order the endpoint needs it: no full table scan and no
+temporary B-tree. range_sorted_queries() are rollup aggregates that read an
+index range but sort the groups: weeks merge daily rollups under a computed
+bucket, and per-city buckets over a date range across all cities come off the
+(user_id, granularity, bucket) index, so SQLite sorts only the rows in range.
+"""
+from datetime import datetime
+
+
+def plan_for(query):
+    """The detail column of EXPLAIN QUERY PLAN for a SQLAlchemy ORM query"""
+    from app_production import db
+
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def plan_problems(plan, allow_sort=False):
+    """Why a plan falls short: no index used, a scan of a whole table or index, or (unless allow_sort) a temp B-tree"""
+    problems = [] if any('USING INDEX' in step or 'USING COVERING INDEX' in step for step in plan) \
+        else ['no index used']
+    problems += [step for step in plan if step.startswith('SCAN ')]
+    if not allow_sort:
+        problems += [step for step in plan if 'USE TEMP B-TREE' in step]
+    return problems
+
+
+def index_ordered_queries(user_id=None):
+    """{name: query} for the entry, city, export, archival, dashboard and rollup aggregate queries"""
+    from aggregation import rollup_aggregate_query
+    from app_production import (db, entries_query, cities_query, apply_cursor, encode_cursor, export_query,
+                                archive_month_query, WeatherEntry, WeatherRollup, DEFAULT_USER_ID)
+
+    user_id = DEFAULT_USER_ID if user_id is None else user_id
+    date_range = {'date_from': '2024-01-01T00:00', 'date_to': '2024-02-01T00:00'}
+    moments = {'date_from': datetime(2024, 1, 1), 'date_to': datetime(2024, 2, 1)}
+    queries = {
+        'get_entries': entries_query(user_id=user_id),
+        'get_entries?city': entries_query(city='Bengaluru', user_id=user_id),
+        'get_entries?date range': entries_query(user_id=user_id, **date_range),
+        'get_entries?city+date range': entries_query(city='Bengaluru', user_id=user_id, **date_range),
+        'get_entries?cursor': apply_cursor(entries_query(user_id=user_id), encode_cursor(datetime(2024, 1, 1), 1)),
+        'get_cities': cities_query(user_id),
+        'export': export_query(user_id=user_id),
+        'export?city+date range': export_query(city='Bengaluru', user_id=user_id, **date_range),
+        'archive_entries': archive_month_query(user_id, datetime(2024, 1, 1)),
+        'generate_dashboard': WeatherEntry.query.filter_by(user_id=user_id).order_by(WeatherEntry.datetime),
+    }
+    for bucket in ('hour', 'day'):
+        queries.update({
+            f'aggregate?bucket={bucket}': rollup_aggregate_query(db.session, WeatherRollup, bucket, user_id),
+            f'aggregate?bucket={bucket}&city+date range': rollup_aggregate_query(
+                db.session, WeatherRollup, bucket, user_id, city='Bengaluru', **moments),
+            f'aggregate?bucket={bucket}&by_city=false': rollup_aggregate_query(
+                db.session, WeatherRollup, bucket, user_id, by_city=False),
+            f'aggregate?bucket={bucket}&by_city=false&date range': rollup_aggregate_query(
+                db.session, WeatherRollup, bucket, user_id, by_city=False, **moments),
+        })
+    return queries
+
+
+def range_sorted_queries(user_id=None):
+    """{name: query} for the rollup aggregates that sort the index range they read"""
+    from aggregation import rollup_aggregate_query
+    from app_production import db, WeatherRollup, DEFAULT_USER_ID
+
+    user_id = DEFAULT_USER_ID if user_id is None else user_id
+    moments = {'date_from': datetime(2024, 1, 1), 'date_to': datetime(2024, 2, 1)}
+    return {
+        'aggregate?bucket=day&date range': rollup_aggregate_query(db.session, WeatherRollup, 'day', user_id,
+                                                                  **moments),
+        'aggregate?bucket=week': rollup_aggregate_query(db.session, WeatherRollup, 'week', user_id),
+        'aggregate?bucket=week&by_city=false': rollup_aggregate_query(db.session, WeatherRollup, 'week', user_id,
+                                                                      by_city=False),
+    }
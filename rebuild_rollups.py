@@ -0,0 +1,32 @@
+"""
+Rebuild the hourly/daily WeatherRollup tables from WeatherEntry
+Use after bulk changes made outside the app (manual SQL, restored backups)
+"""
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app_production import app, db, rebuild_rollups, WeatherRollup
+
+def main():
+    """Rebuild all rollups"""
+    print("Rebuilding rollups...")
+    start = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+        cities = rebuild_rollups()
+        buckets = WeatherRollup.query.count()
+    print(f"✓ Rebuilt {buckets} rollup buckets for {cities} city histories in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"Error rebuilding rollups: {e}")
+        sys.exit(1)
@@ -0,0 +1,86 @@
+"""
+In-process cache for rendered dashboards.
+
+Entries are keyed by (user_id, data_version, variant). Every write path bumps
+the user's data version after committing, so a cached render can never be
+served for data that has since changed.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class RenderCache:
+    """Thread-safe LRU cache of rendered dashboards with per-user data versions"""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._modified = {}
+        self._started = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, user_id):
+        """Return the current data version for a user"""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def bump(self, user_id):
+        """Mark a user's data as changed and drop their stale renders"""
+        with self._lock:
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            self._modified[user_id] = datetime.now(timezone.utc)
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+            return version
+
+    def modified(self, user_id):
+        """When the user's data last changed (at the latest, when this cache was created)"""
+        with self._lock:
+            return self._modified.get(user_id, self._started)
+
+    def get(self, user_id, version, variant='png'):
+        """Return a cached render or None"""
+        key = (user_id, version, variant)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, user_id, version, value, variant='png'):
+        """Store a render, evicting the least recently used entries"""
+        key = (user_id, version, variant)
+        with self._lock:
+            # A write may have landed while we were rendering
+            if version != self._versions.get(user_id, 0):
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,201 @@
+"""
+Dashboard rendering outside the web server's threads.
+
+matplotlib holds the GIL for the whole draw, so a render running in a waitress
+thread stalls every other request in the process. RenderJobQueue hands renders
+to a pool of worker processes, each with its own DashboardRenderer, and tracks
+them as pollable jobs. Submitting a key that already has a queued, running or
+finished job returns that job instead of rendering the same dashboard twice.
+Workers send back how long the draw and encode took along with the image.
+"""
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dashboard_renderer import DashboardRenderer, frame_series
+
+# Per-process renderer, created by _init_worker
+_renderer = None
+
+
+def _init_worker(pool_size, figsize, dpi):
+    global _renderer
+    _renderer = DashboardRenderer(pool_size=pool_size, figsize=figsize, dpi=dpi)
+    # Pay for the matplotlib import and font loading before the worker takes a job
+    _renderer.warm_up()
+
+
+def _ready():
+    return True
+
+
+def _render(when, columns, key, fmt):
+    timings = {}
+    image = _renderer.render_series(when, columns, key=key, fmt=fmt, timings=timings)
+    return image, timings
+
+
+class RenderJob:
+    """One submitted render; `meta` carries whatever the caller wants back with the image"""
+
+    def __init__(self, key, future, meta):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.meta = meta
+        self.created = time.time()
+        self.future = future
+
+    @property
+    def state(self):
+        if not self.future.done():
+            return 'running' if self.future.running() else 'queued'
+        return 'failed' if self.future.exception() else 'done'
+
+    def result(self, timeout=None):
+        """Rendered image bytes, waiting up to `timeout` seconds"""
+        return self.future.result(timeout)[0]
+
+    @property
+    def timings(self):
+        """{'draw': seconds, 'encode': seconds} once rendered, else None"""
+        if not self.future.done() or self.future.exception():
+            return None
+        return self.future.result()[1]
+
+    def to_dict(self):
+        info = {'job_id': self.id, 'state': self.state, 'age_seconds': round(time.time() - self.created, 3)}
+        if info['state'] == 'failed':
+            info['error'] = str(self.future.exception())
+        return info
+
+
+class RenderJobQueue:
+    """Deduplicating render job tracker over a process pool
+
+    processes=0 renders in a thread pool of the current process instead (the old
+    behaviour, useful where spawning processes isn't allowed). Finished jobs are
+    kept for `ttl` seconds, up to `max_jobs` of them, so polls and repeated
+    submits can collect the image. observe(phase, seconds), if given, is called
+    with the draw and encode times of every finished render.
+    """
+
+    def __init__(self, processes=2, threads=4, figsize=(14, 10), dpi=100, max_jobs=64, ttl=300,
+                 observe=None):
+        self.processes = max(0, int(processes))
+        self.threads = max(1, int(threads))
+        self.figsize = figsize
+        self.dpi = dpi
+        self.max_jobs = max(1, int(max_jobs))
+        self.ttl = ttl
+        self.observe = observe
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+
+    def _pool(self):
+        # Created on first use so importing the app (init_db, scripts) never spawns workers
+        if self._executor is None:
+            if self.processes:
+                # spawn rather than fork: forking a threaded server can copy held locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker, initargs=(1, self.figsize, self.dpi)
+                )
+            else:
+                _init_worker(self.threads, self.figsize, self.dpi)
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='render')
+        return self._executor
+
+    def warm_up(self):
+        """Start the workers now instead of on the first render; returns without waiting for them"""
+        with self._lock:
+            pool = self._pool()
+            # A spawn-context pool only starts processes as work arrives, so give each one something
+            for _ in range(self.processes):
+                pool.submit(_ready)
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            # Never forget a job someone may still be waiting on
+            if not job.future.done():
+                continue
+            if len(self._jobs) > self.max_jobs or now - job.created >= self.ttl:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+
+    def _existing(self, key):
+        job = self._by_key.get(key)
+        if job is None or job.state == 'failed':
+            return None
+        return job
+
+    def submit(self, key, prepare, fmt='png'):
+        """Job rendering the dashboard for `key`, reusing one already submitted for it
+
+        prepare() is only called when a new render is needed and returns
+        (DataFrame, meta); exceptions it raises propagate to the caller.
+        """
+        with self._lock:
+            self._expire()
+            job = self._existing(key)
+            if job is not None:
+                self.deduplicated += 1
+                return job
+        df, meta = prepare()
+        when, columns = frame_series(df)
+        with self._lock:
+            # Another thread may have submitted the same key while we were preparing
+            job = self._existing(key)
+            if job is not None:
+                self.deduplicated += 1
+                return job
+            try:
+                future = self._pool().submit(_render, when, columns, key, fmt)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool
+                self._executor = None
+                future = self._pool().submit(_render, when, columns, key, fmt)
+            job = RenderJob(key, future, meta)
+            if self.observe is not None:
+                future.add_done_callback(self._observe)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self.submitted += 1
+            return job
+
+    def _observe(self, future):
+        if future.cancelled() or future.exception():
+            return
+        for phase, seconds in future.result()[1].items():
+            self.observe(phase, seconds)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+            return {
+                'processes': self.processes,
+                'jobs': len(states),
+                'queued': states.count('queued'),
+                'running': states.count('running'),
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,79 @@
+"""
+Database engine configuration for the production app.
+
+SQLite's out-of-the-box settings (rollback journal, full fsync on every
+commit, a 2 MB page cache) make a writer block every reader, which shows up
+as "database is locked" once a few waitress threads share the file. The 'wal'
+profile switches to write-ahead logging so readers never wait for the single
+writer, relaxes fsync to checkpoints, and gives each connection a bigger page
+cache plus a memory map. PRAGMAs are applied to every pooled connection as it
+is opened. Any other DATABASE_URL (e.g. postgresql://) gets a pre-pinged,
+recycled connection pool instead.
+"""
+import os
+
+from sqlalchemy import event
+
+SQLITE_PROFILES = {
+    # SQLite's own defaults
+    'default': {},
+    # synchronous=NORMAL in WAL mode survives app crashes; only a power loss can drop the last commits
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -20000,  # negative = KiB, so 20 MB per connection
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def database_url(url, base_dir):
+    """Normalise a DATABASE_URL
+
+    Relative SQLite paths are taken relative to base_dir rather than the
+    working directory, and Heroku-style postgres:// becomes postgresql://.
+    """
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    prefix = 'sqlite:///'
+    if url.startswith(prefix):
+        path = url[len(prefix):]
+        if path and path != ':memory:' and not os.path.isabs(path):
+            return prefix + os.path.join(base_dir, path).replace(os.sep, '/')
+    return url
+
+
+def engine_options(url, pool_size=8, max_overflow=4, pool_timeout=30):
+    """SQLALCHEMY_ENGINE_OPTIONS suited to the database behind `url`"""
+    if url.startswith('sqlite'):
+        if ':memory:' in url or url.rstrip('/') == 'sqlite:':
+            return {}
+        # Connections move between waitress threads through the pool
+        return {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_timeout': pool_timeout,
+                'connect_args': {'check_same_thread': False}}
+    return {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_timeout': pool_timeout,
+            'pool_pre_ping': True, 'pool_recycle': 1800}
+
+
+def sqlite_pragmas(profile='wal', **overrides):
+    """The profile's PRAGMAs with non-None overrides applied"""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown storage profile '{profile}', expected one of {', '.join(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    pragmas.update({name: value for name, value in overrides.items() if value is not None})
+    return pragmas
+
+
+def install_pragmas(engine, pragmas):
+    """Run `pragmas` on every new connection of a SQLite engine; other engines are left alone"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
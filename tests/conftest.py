@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+@pytest.fixture
+def owm_stub():
+    """start_stub(**options) -> (traffic counters, base_url); every stub is shut down after the test"""
+    from owm_stub import start_stub
+    servers = []
+
+    def start(**options):
+        server, base_url = start_stub(**options)
+        servers.append(server)
+        return server.RequestHandlerClass.traffic, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope='session')
+def app_production(tmp_path_factory):
+    """app_production on a scratch SQLite database (DATABASE_URL is read at import), initialised and seeded"""
+    directory = tmp_path_factory.mktemp('app')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{directory / 'weather.db'}".replace(os.sep, '/'),
+        'ARCHIVE_DIR': str(directory / 'archive'), 'EXPORT_DIR': str(directory / 'exports'),
+        'SCHEDULER_ENABLED': 'false', 'RENDER_WARMUP': 'false', 'ALERTS_ENABLED': 'false',
+    })
+    import app_production
+    app_production.init_db()
+    app_production.app.test_client().post('/add_entries', json=[
+        {'datetime': f'2024-01-{day:02d}T{hour:02d}:00', 'temperature': 20 + day % 5, 'humidity': 60,
+         'windspeed': 3, 'description': 'seed', 'city': city}
+        for day in range(1, 15) for hour in (6, 18) for city in ('Bengaluru', 'Mysuru')
+    ])
+    return app_production
@@ -0,0 +1,38 @@
+"""The endpoint queries are answered from an index (EXPLAIN QUERY PLAN on SQLite)"""
+import pytest
+
+from query_plans import plan_for, plan_problems, index_ordered_queries, range_sorted_queries
+
+
+@pytest.fixture
+def app_context(app_production):
+    with app_production.app.app_context():
+        yield
+
+
+def problems_of(queries, allow_sort=False):
+    """{name: plan} of the queries whose plan has problems"""
+    plans = {name: plan_for(query) for name, query in queries.items()}
+    return {name: plan for name, plan in plans.items() if plan_problems(plan, allow_sort)}
+
+
+def test_seeded_database_has_rows(app_production, app_context):
+    assert app_production.WeatherEntry.query.count() == 56
+    assert app_production.WeatherRollup.query.count() > 0
+
+
+def test_plan_problems_flags_scans_and_sorts():
+    assert plan_problems(['SEARCH weather_entry USING INDEX ix_weather_entry_user_datetime (user_id=?)']) == []
+    assert plan_problems(['SCAN weather_entry']) == ['no index used', 'SCAN weather_entry']
+    assert plan_problems(['SEARCH weather_rollup USING INDEX uq_weather_rollup_bucket (user_id=?)',
+                          'USE TEMP B-TREE FOR ORDER BY']) == ['USE TEMP B-TREE FOR ORDER BY']
+
+
+def test_endpoint_queries_search_an_index_in_order(app_context):
+    queries = index_ordered_queries()
+    assert {'get_entries', 'get_entries?cursor', 'get_cities', 'export', 'aggregate?bucket=day'} <= set(queries)
+    assert problems_of(queries) == {}
+
+
+def test_range_sorted_aggregates_search_an_index(app_context):
+    assert problems_of(range_sorted_queries(), allow_sort=True) == {}
@@ -0,0 +1,90 @@
+"""OpenWeatherClient against the local forecast stub in benchmarks/owm_stub.py"""
+import time
+
+import pytest
+
+from weather_client import OpenWeatherClient, WeatherAPIError
+
+
+def client_for(base_url, **options):
+    return OpenWeatherClient(api_key='test', base_url=base_url, **{'backoff': 0.05, **options})
+
+
+def test_rate_limits_and_server_errors_are_retried_with_backoff(owm_stub):
+    traffic, base_url = owm_stub(faults={'Paris': [429, 503]})
+    client = client_for(base_url, retries=2)
+    start = time.perf_counter()
+    data = client.fetch_forecast('Paris')
+    elapsed = time.perf_counter() - start
+    assert len(data['list']) == 40
+    assert traffic['requests']['Paris'] == 3
+    # Backoff doubles: 0.05s after the first failure, 0.1s after the second
+    assert elapsed >= 0.15
+
+
+def test_retries_stop_after_the_last_attempt(owm_stub):
+    traffic, base_url = owm_stub(faults={'Paris': [500, 502, 504, 200]})
+    with pytest.raises(WeatherAPIError) as error:
+        client_for(base_url, retries=2).fetch_forecast('Paris')
+    assert error.value.status_code == 504
+    assert traffic['requests']['Paris'] == 3
+
+
+@pytest.mark.parametrize('city, faults, status', [
+    ('nowhere', {}, 404),
+    ('Paris', {'Paris': [400]}, 400),
+    ('Paris', {'Paris': [401]}, 401),
+])
+def test_client_errors_are_not_retried(owm_stub, city, faults, status):
+    traffic, base_url = owm_stub(faults=faults)
+    with pytest.raises(WeatherAPIError) as error:
+        client_for(base_url, retries=2).fetch_forecast(city)
+    assert error.value.status_code == status
+    assert traffic['requests'][city] == 1
+
+
+def test_timeout_applies_to_each_city(owm_stub):
+    traffic, base_url = owm_stub(delays={'Slow': 1.0})
+    client = client_for(base_url, timeout=0.3, retries=0)
+    start = time.perf_counter()
+    slow, fast = client.fetch_many(['Slow', 'Fast'])
+    elapsed = time.perf_counter() - start
+    assert slow.data is None and 'timeout' in slow.error.lower()
+    assert fast.error is None and len(fast.data['list']) == 40
+    assert elapsed < 1.0
+    client.close()
+
+
+def test_fetch_many_bounds_concurrency(owm_stub):
+    traffic, base_url = owm_stub(latency=0.1)
+    client = client_for(base_url, max_workers=3)
+    cities = [f'City{i}' for i in range(9)]
+    start = time.perf_counter()
+    results = client.fetch_many(cities)
+    elapsed = time.perf_counter() - start
+    assert [result.city for result in results] == cities
+    assert all(result.error is None for result in results)
+    assert traffic['max_in_flight'] == 3
+    # Three rounds of three, not nine requests one after another
+    assert elapsed < 0.6
+    client.close()
+
+
+def test_fetch_many_isolates_failures(owm_stub):
+    traffic, base_url = owm_stub(faults={'Berlin': [500, 500]})
+    client = client_for(base_url, retries=1)
+    results = client.fetch_many(['Paris', 'nowhere', 'Berlin', 'Rome'])
+    assert [result.city for result in results] == ['Paris', 'nowhere', 'Berlin', 'Rome']
+    assert [result.error is None for result in results] == [True, False, False, True]
+    assert results[1].error == 'city not found'
+    assert results[2].error == 'stub fault 500'
+    assert results[0].data['city']['name'] == 'Paris' and results[3].data['city']['name'] == 'Rome'
+    client.close()
+
+
+def test_fetch_many_reports_connection_errors_per_city():
+    # Nothing listens on the discard port
+    client = client_for('http://127.0.0.1:9', retries=0)
+    results = client.fetch_many(['Paris', 'Rome'])
+    assert all(result.data is None and 'Connection error' in result.error for result in results)
+    client.close()
@@ -0,0 +1,128 @@
+"""
+Shared OpenWeatherMap client used by the web apps and the CLI.
+
+Keeps one pooled requests.Session so connections are reused across calls,
+retries transient failures with exponential backoff and can fetch several
+cities concurrently with a bounded worker pool. An optional observe(phase,
+seconds) callback is told how long each HTTP attempt took.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from forecast_parser import decode_json
+
+DEFAULT_BASE_URL = 'https://api.openweathermap.org/data/2.5'
+
+# Worth another attempt: rate limiting and upstream hiccups
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+CityForecast = namedtuple('CityForecast', ['city', 'data', 'error'])
+
+
+class WeatherAPIError(Exception):
+    """OpenWeatherMap returned an error response"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OpenWeatherClient:
+    """Pooled, retrying client for the 5 day / 3 hour forecast API"""
+
+    def __init__(self, api_key=None, base_url=None, timeout=10, retries=2,
+                 backoff=0.5, max_workers=4, observe=None):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv('OPENWEATHER_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_workers = max(1, int(max_workers))
+        self.observe = observe
+        # One session shared by all threads: urllib3's connection pool is thread-safe
+        # and we never rely on per-session cookies or auth state
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='owm-fetch')
+            return self._executor
+
+    def fetch_forecast(self, city, units='metric', api_key=None):
+        """Return the forecast payload for one city, raising WeatherAPIError on API errors"""
+        return decode_json(self.fetch_forecast_response(city, units, api_key).content)
+
+    def fetch_forecast_response(self, city, units='metric', api_key=None, headers=None):
+        """Return the raw 200 (or 304 for conditional requests) response for one city"""
+        params = {'q': city, 'appid': api_key or self.api_key, 'units': units}
+        url = f'{self.base_url}/forecast'
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                self._observe(start)
+                if attempt >= self.retries:
+                    raise
+            else:
+                self._observe(start)
+                if response.status_code in (200, 304):
+                    return response
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    raise WeatherAPIError(_error_message(response), response.status_code)
+            time.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+
+    def _observe(self, start):
+        if self.observe is not None:
+            self.observe('upstream_api', time.perf_counter() - start)
+
+    def fetch_many(self, cities, units='metric', api_key=None, fetch=None):
+        """Fetch several cities concurrently; returns a CityForecast per city in input order
+
+        `fetch` overrides the per-city call (e.g. a caching layer's fetch_forecast).
+        """
+        fetch_one = fetch or self.fetch_forecast
+
+        def fetch_city(city):
+            try:
+                return CityForecast(city, fetch_one(city, units, api_key), None)
+            except requests.exceptions.Timeout:
+                return CityForecast(city, None, 'Request timeout - API server not responding')
+            except requests.exceptions.ConnectionError:
+                return CityForecast(city, None, 'Connection error - please check your internet')
+            except Exception as e:
+                return CityForecast(city, None, str(e))
+
+        cities = list(cities)
+        if len(cities) <= 1:
+            return [fetch_city(city) for city in cities]
+        return list(self._pool().map(fetch_city, cities))
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        self.session.close()
+
+
+def _error_message(response):
+    try:
+        return response.json().get('message', 'Unknown error')
+    except ValueError:
+        return response.text or 'Unknown error'
@@ -1,10 +1,11 @@
 import os
 import sys
-import requests
-import pandas as pd
-import matplotlib.pyplot as plt
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
+from weather_client import OpenWeatherClient, WeatherAPIError
+from forecast_cache import ForecastCache
+from forecast_parser import parse_forecasts
 
 # Load environment variables from .env file if it exists
 load_dotenv()
@@ -18,8 +19,9 @@ API_KEY = os.getenv("OPENWEATHER_API_KEY", "your_api_key_here")  # replace with
 CITY = os.getenv("OPENWEATHER_CITY", "Bengaluru")  # can override by env var
 UNITS = os.getenv("OPENWEATHER_UNITS", "metric")  # metric = Celsius, imperial = Fahrenheit
 
-# OpenWeatherMap 5 day / 3 hour forecast API
-URL = f"https://api.openweathermap.org/data/2.5/forecast?q={CITY}&appid={API_KEY}&units={UNITS}"
+# OpenWeatherMap 5 day / 3 hour forecast API (set OPENWEATHER_BASE_URL to point elsewhere)
+# Set FORECAST_CACHE_PATH to reuse forecasts across runs instead of refetching
+client = ForecastCache(OpenWeatherClient(api_key=API_KEY), path=os.getenv("FORECAST_CACHE_PATH") or None)
 
 # ----------------------------
 # FETCH DATA FROM API
@@ -30,37 +32,27 @@ if not API_KEY or API_KEY == "YOUR_API_KEY_HERE":
     print("Example (PowerShell): $env:OPENWEATHER_API_KEY = 'your_key_here'")
     sys.exit(1)
 
-response = requests.get(URL)
+# pandas (for the parser) and pyplot take most of the startup time; import them while the forecast downloads
+def preload_plotting():
+    import pandas  # noqa: F401
+    import matplotlib.pyplot  # noqa: F401
+
+
+threading.Thread(target=preload_plotting, daemon=True).start()
 
-if response.status_code != 200:
+try:
+    data = client.fetch_forecast(CITY, UNITS)
+except WeatherAPIError as e:
     print("Error fetching data from API!")
-    print("Status Code:", response.status_code)
-    print("Message:", response.text)
+    print("Status Code:", e.status_code)
+    print("Message:", e)
     sys.exit(1)
 
-data = response.json()
-
 # ----------------------------
 # EXTRACT REQUIRED DATA
 # ----------------------------
-forecast_list = data["list"]
-
-weather_data = []
-
-for item in forecast_list:
-    dt_txt = item["dt_txt"]
-    temp = item["main"]["temp"]
-    humidity = item["main"]["humidity"]
-    wind_speed = item["wind"]["speed"]
-    weather_desc = item["weather"][0]["description"]
-
-    weather_data.append([dt_txt, temp, humidity, wind_speed, weather_desc])
-
-# Convert to DataFrame
-df = pd.DataFrame(weather_data, columns=["DateTime", "Temperature", "Humidity", "WindSpeed", "Description"])
-
-# Convert DateTime to actual datetime format
-df["DateTime"] = pd.to_datetime(df["DateTime"])
+# Typed DataFrame (DateTime is UTC, like dt_txt); one city, so drop the City column
+df = parse_forecasts([data]).drop(columns="City")
 
 print("\nFetched Weather Data (Sample):")
 print(df.head())
@@ -68,6 +60,8 @@ print(df.head())
 # ----------------------------
 # VISUALIZATION DASHBOARD
 # ----------------------------
+import matplotlib.pyplot as plt
+
 plt.figure(figsize=(14, 10))
 
 # 1) Temperature Trend
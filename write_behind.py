@@ -0,0 +1,153 @@
+"""
+Write-behind batching for small, frequent inserts.
+
+Committing every POSTed reading on its own costs a transaction and an fsync
+each. WriteBehindQueue acknowledges rows once they're validated and queued,
+and a background thread hands them to a flush callback in batches, whenever
+max_batch rows are waiting or the oldest has waited max_delay seconds.
+Callers that need the commit before answering can wait on the ticket put()
+returns. close() (registered at exit by the app) drains everything still
+queued; only a hard kill can lose rows, at most max_delay seconds' worth.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueueFull(Exception):
+    """Raised by put() when accepting the rows would exceed max_pending"""
+
+
+class WriteBehindQueue:
+    """Thread-safe row buffer committed in batches by flush(rows) on a background thread"""
+
+    def __init__(self, flush, max_batch=500, max_delay=0.5, max_pending=50000, retries=3, backoff=0.5):
+        self._flush = flush
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay = max_delay
+        self.max_pending = max(self.max_batch, int(max_pending))
+        self.retries = retries
+        self.backoff = backoff
+        self._buffer = []
+        self._oldest = 0.0
+        self._cond = threading.Condition()
+        self._queued = 0        # rows ever accepted; tickets count along this sequence
+        self._done = 0          # rows committed or given up on, in order
+        self._flush_through = 0
+        self._failed = []       # (start, end) ranges of rows dropped after retries
+        self._closing = False
+        self._thread = None
+        self._stats = {'committed': 0, 'batches': 0, 'failed': 0, 'last_batch_size': 0,
+                       'last_flush_seconds': None, 'last_error': None}
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def put(self, rows):
+        """Queue rows for the next batch; returns a ticket for wait()"""
+        rows = list(rows)
+        self.start()
+        with self._cond:
+            if self._closing:
+                raise RuntimeError('Write queue is shut down')
+            if len(self._buffer) + len(rows) > self.max_pending:
+                raise WriteQueueFull(f'Write queue is full ({len(self._buffer)} rows pending), retry later')
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.extend(rows)
+            ticket = (self._queued, self._queued + len(rows))
+            self._queued += len(rows)
+            self._cond.notify_all()
+            return ticket
+
+    def wait(self, ticket, timeout=None):
+        """Block until the ticket's rows are committed; False on timeout, raises if they were dropped"""
+        start, end = ticket
+        with self._cond:
+            if self._flush_through < end:
+                # Someone is waiting, so don't sit out the rest of max_delay
+                self._flush_through = end
+                self._cond.notify_all()
+            if not self._cond.wait_for(lambda: self._done >= end, timeout):
+                return False
+            if any(lo < end and start < hi for lo, hi in self._failed):
+                raise RuntimeError(f"Entries could not be saved: {self._stats['last_error']}")
+            return True
+
+    def flush(self, timeout=None):
+        """Commit everything queued so far"""
+        with self._cond:
+            ticket = (0, self._queued)
+        return self.wait(ticket, timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                if self._buffer:
+                    due = (len(self._buffer) >= self.max_batch or self._closing
+                           or self._done < self._flush_through
+                           or time.monotonic() - self._oldest >= self.max_delay)
+                    if due:
+                        break
+                    self._cond.wait(self.max_delay - (time.monotonic() - self._oldest))
+                elif self._closing:
+                    return None, None
+                else:
+                    self._cond.wait()
+            batch = self._buffer[:self.max_batch]
+            del self._buffer[:self.max_batch]
+            # Whatever is left is at least as old, so the next batch goes straight away
+            return batch, self._done
+
+    def _run(self):
+        while True:
+            batch, start = self._next_batch()
+            if batch is None:
+                return
+            began = time.perf_counter()
+            error = None
+            for attempt in range(self.retries + 1):
+                try:
+                    self._flush(batch)
+                    error = None
+                    break
+                except Exception as e:
+                    error = str(e)
+                    logger.warning(f'Write-behind flush of {len(batch)} rows failed (attempt {attempt + 1}): {error}')
+                    if attempt < self.retries:
+                        time.sleep(self.backoff * 2 ** attempt)
+            with self._cond:
+                self._done = start + len(batch)
+                self._stats['batches'] += 1
+                self._stats['last_batch_size'] = len(batch)
+                self._stats['last_flush_seconds'] = round(time.perf_counter() - began, 4)
+                if error:
+                    logger.error(f'Dropped {len(batch)} queued rows: {error}')
+                    self._failed.append((start, start + len(batch)))
+                    del self._failed[:-100]
+                    self._stats['failed'] += len(batch)
+                    self._stats['last_error'] = error
+                else:
+                    self._stats['committed'] += len(batch)
+                self._cond.notify_all()
+
+    def close(self, timeout=30):
+        """Stop accepting rows, commit what's queued and stop the flusher"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.error(f'Write-behind queue did not drain within {timeout}s')
+
+    def stats(self):
+        with self._cond:
+            return {**self._stats, 'pending': len(self._buffer), 'accepted': self._queued,
+                    'max_batch': self.max_batch, 'max_delay_seconds': self.max_delay}